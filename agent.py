@@ -1,9 +1,22 @@
-from crewai import Agent
 from config import Config
 
 class DocumentAgents:
+    # crewai is imported inside each builder so extraction-only runs never load the LLM stack
+
+    @staticmethod
+    def create_llm(stream=False):
+        """The configured OpenAI model, optionally emitting tokens as they are generated"""
+        from crewai import LLM
+        return LLM(model=Config.OPENAI_MODEL, stream=stream, base_url=Config.OPENAI_BASE_URL)
+
+    @staticmethod
+    def _llm_options(llm):
+        # Leave the model to CrewAI's default unless a specific LLM was requested
+        return {'llm': llm} if llm is not None else {}
+
     @staticmethod
-    def create_context_agent():
+    def create_context_agent(llm=None):
+        from crewai import Agent
         return Agent(
             role="Document Contextualizer",
             goal="Accurately identify the type and primary subject of a document from its raw text content.",
@@ -11,11 +24,13 @@ class DocumentAgents:
             to classify documents. You can instantly recognize invoices, receipts, tickets, financial statements, or legal agreements
             and provide a concise summary of the document's core purpose and key entities.""",
             verbose=Config.AGENT_VERBOSE,
-            allow_delegation=False
+            allow_delegation=False,
+            **DocumentAgents._llm_options(llm)
         )
 
     @staticmethod
-    def create_data_analyst_agent():
+    def create_data_analyst_agent(llm=None):
+        from crewai import Agent
         return Agent(
             role="Data Extraction Specialist",
             goal="Extract specific, structured information from a document based on its identified context.",
@@ -23,11 +38,13 @@ class DocumentAgents:
             extracting all relevant details in a clean, structured format. For a ticket, you'd find names, dates, and locations.
             For an invoice, you'd find line items, totals, and due dates.""",
             verbose=Config.AGENT_VERBOSE,
-            allow_delegation=False
+            allow_delegation=False,
+            **DocumentAgents._llm_options(llm)
         )
 
     @staticmethod
-    def create_reporting_agent():
+    def create_reporting_agent(llm=None):
+        from crewai import Agent
         return Agent(
             role="Information Reporting Specialist",
             goal="Synthesize extracted data into a clear, comprehensive report and answer user questions.",
@@ -35,13 +52,14 @@ class DocumentAgents:
             You can generate final reports, summaries, or answer specific user questions based on the structured
             information provided to you, ensuring the output is always clear and directly addresses the user's needs.""",
             verbose=Config.AGENT_VERBOSE,
-            allow_delegation=True
+            allow_delegation=True,
+            **DocumentAgents._llm_options(llm)
         )
 
     @staticmethod
-    def create_all_agents():
+    def create_all_agents(llm=None):
         return {
-            'context_agent': DocumentAgents.create_context_agent(),
-            'analyst_agent': DocumentAgents.create_data_analyst_agent(),
-            'reporting_agent': DocumentAgents.create_reporting_agent()
+            'context_agent': DocumentAgents.create_context_agent(llm),
+            'analyst_agent': DocumentAgents.create_data_analyst_agent(llm),
+            'reporting_agent': DocumentAgents.create_reporting_agent(llm)
         }
\ No newline at end of file
@@ -0,0 +1,230 @@
+import logging
+import re
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Keyword rules for spend categories, checked in order against the normalized merchant
+CATEGORY_KEYWORDS = {
+    "Food & Dining": ["swiggy", "zomato", "restaurant", "cafe", "starbucks", "dominos", "pizza", "mcdonald", "kfc", "food"],
+    "Shopping": ["amazon", "flipkart", "myntra", "ajio", "store", "mart", "retail", "shop"],
+    "Travel & Transport": ["uber", "ola", "irctc", "rail", "airline", "indigo", "metro", "fuel", "petrol", "toll"],
+    "Entertainment & Subscriptions": ["netflix", "spotify", "prime", "hotstar", "youtube", "apple.com", "subscription"],
+    "Bills & Utilities": ["electricity", "bill", "recharge", "broadband", "airtel", "jio", "vodafone", "gas", "water", "insurance"],
+    "Housing": ["rent", "maintenance", "society"],
+    "Income": ["salary", "interest", "refund", "cashback", "dividend"],
+    "Cash & Transfers": ["atm", "cash", "neft", "imps", "rtgs", "transfer"],
+}
+
+REFERENCE_TOKENS = re.compile(r"\b[\w.-]*\d[\w.-]*\b")
+CHANNEL_PREFIXES = re.compile(r"^(?:upi|pos|ecom|neft|imps|rtgs|ach|nach|bil|ib|mb)\b[\s/:-]*", re.I)
+SEPARATORS = re.compile(r"[/|*:#_-]+")
+WHITESPACE = re.compile(r"\s+")
+
+TRANSACTION_WORDS = r"(?:transactions?|spends?|spending|payments?|purchases?|expenses?|debits?|charges?)"
+# Every intent needs one of these nearby: "monthly interest rate" or "which merchant issued this card" is no spend question
+SPEND_WORDS = rf"(?:{TRANSACTION_WORDS}|spent|paid)"
+
+
+def _near(words, gap=30):
+    """Pattern matching words within gap characters of a spend word, on either side"""
+    return rf"\b{words}\b[\w\s]{{0,{gap}}}?\b{SPEND_WORDS}\b|\b{SPEND_WORDS}\b[\w\s]{{0,{gap}}}?\b{words}"
+
+
+INTENT_PATTERNS = [
+    ("recurring", re.compile(_near(r"(?:recurring|repetitive|repeat(?:ed|ing)?|regular|subscriptions?)"), re.I)),
+    ("category", re.compile(_near(r"categor(?:y|ies|ise|ize|ised|ized)"), re.I)),
+    ("merchant", re.compile(_near(r"merchants?") + r"|where (?:do|did) i spend|spent (?:the )?most|spend (?:by|per)|who did i pay", re.I)),
+    ("large", re.compile(r"\b(?:large|larger|largest|big|bigger|biggest|top|highest|high[- ]value|expensive|major)\b"
+                         rf"[\w\s]{{0,30}}?\b{TRANSACTION_WORDS}"
+                         rf"|{TRANSACTION_WORDS}[\w\s]{{0,20}}?(?:above|over|more than|greater than|exceeding)\s*(?:rs\.?|inr|₹|\$)?\s*\d", re.I)),
+    ("monthly", re.compile(_near(r"(?:monthly|per month|each month|every month|by month|month[- ]wise|month by month)"), re.I)),
+]
+# Questions asking for reasons or advice are left to the LLM even when they mention a table intent
+NEEDS_REASONING = re.compile(r"\b(?:why|explain|reason|should|advice|advise|recommend|whether|mean|means)\b", re.I)
+THRESHOLD_PATTERN = re.compile(r"(?:above|over|more than|greater than|exceeding|>)\s*(?:rs\.?|inr|₹|\$)?\s*([\d,]+(?:\.\d+)?)", re.I)
+TOP_N_PATTERN = re.compile(r"\btop\s+(\d+)\b", re.I)
+
+
+def merchant_key(descriptions):
+    """Vectorized merchant normalization: drop channel prefixes, reference numbers and separators"""
+    text = descriptions.fillna("").astype(str).str.lower()
+    text = text.str.replace(CHANNEL_PREFIXES, "", regex=True)
+    text = text.str.replace(SEPARATORS, " ", regex=True)
+    text = text.str.replace(REFERENCE_TOKENS, " ", regex=True)
+    return text.str.replace(WHITESPACE, " ", regex=True).str.strip()
+
+
+def categorize(merchants):
+    """Map normalized merchant names to CATEGORY_KEYWORDS categories, 'Other' when nothing matches"""
+    categories = pd.Series("Other", index=merchants.index, dtype=object)
+    unassigned = pd.Series(True, index=merchants.index)
+    for category, keywords in CATEGORY_KEYWORDS.items():
+        pattern = "|".join(re.escape(keyword) for keyword in keywords)
+        matched = unassigned & merchants.str.contains(pattern, regex=True)
+        categories[matched] = category
+        unassigned &= ~matched
+    return categories
+
+
+def prepare(transactions):
+    """Add merchant and category columns to a transactions frame from FinancialDataLoader.load_transactions"""
+    df = transactions.copy()
+    df["merchant"] = merchant_key(df["description"])
+    df["category"] = categorize(df["merchant"])
+    return df
+
+
+def large_transactions(df, top_n=10, threshold=None, direction="debit"):
+    """Largest transactions by absolute amount, optionally only those at or above a threshold"""
+    selected = df
+    if direction == "debit":
+        selected = selected[selected["amount"] < 0]
+    elif direction == "credit":
+        selected = selected[selected["amount"] > 0]
+    magnitude = selected["amount"].abs()
+    if threshold is not None:
+        selected = selected[magnitude >= threshold]
+        magnitude = magnitude[magnitude >= threshold]
+    order = np.argsort(-magnitude.to_numpy(), kind="stable")
+    result = selected.iloc[order]
+    return result if top_n is None else result.head(top_n)
+
+
+def recurring_transactions(df, min_occurrences=3, amount_tolerance=0.1, interval_tolerance_days=5):
+    """Merchants charged repeatedly with a stable amount and a regular interval between charges"""
+    debits = df[df["amount"] < 0].sort_values(["merchant", "date"])
+    if debits.empty:
+        return pd.DataFrame(columns=["merchant", "occurrences", "typical_amount", "interval_days", "cadence", "total", "last_date"])
+    intervals = debits.groupby("merchant")["date"].diff().dt.days
+    grouped = debits.assign(interval=intervals, magnitude=debits["amount"].abs()).groupby("merchant")
+    summary = grouped.agg(
+        occurrences=("magnitude", "size"),
+        typical_amount=("magnitude", "median"),
+        amount_spread=("magnitude", lambda values: (values - values.median()).abs().median()),
+        interval_days=("interval", "median"),
+        interval_spread=("interval", lambda values: (values - values.median()).abs().median()),
+        total=("magnitude", "sum"),
+        last_date=("date", "max"),
+    ).reset_index()
+    stable = (
+        (summary["occurrences"] >= min_occurrences)
+        & (summary["amount_spread"] <= amount_tolerance * summary["typical_amount"])
+        & (summary["interval_spread"] <= interval_tolerance_days)
+        & (summary["interval_days"] >= 1)
+    )
+    recurring = summary[stable].copy()
+    recurring["cadence"] = pd.cut(
+        recurring["interval_days"], bins=[0, 2, 10, 20, 45, 100, np.inf],
+        labels=["daily", "weekly", "fortnightly", "monthly", "quarterly", "yearly"],
+    ).astype(str)
+    columns = ["merchant", "occurrences", "typical_amount", "interval_days", "cadence", "total", "last_date"]
+    return recurring[columns].sort_values("total", ascending=False).reset_index(drop=True)
+
+
+def totals_by(df, column, top_n=None):
+    """Spend and income per merchant or category, biggest spend first"""
+    spent = (-df["amount"].clip(upper=0)).groupby(df[column]).sum()
+    received = df["amount"].clip(lower=0).groupby(df[column]).sum()
+    counts = df.groupby(column)["amount"].size()
+    totals = pd.DataFrame({"spent": spent, "received": received, "transactions": counts})
+    totals = totals.sort_values("spent", ascending=False).reset_index()
+    return totals.head(top_n) if top_n else totals
+
+
+def monthly_summary(df):
+    """Spend, income, net and transaction count per calendar month"""
+    month = df["date"].dt.to_period("M")
+    summary = pd.DataFrame({
+        "spent": (-df["amount"].clip(upper=0)).groupby(month).sum(),
+        "received": df["amount"].clip(lower=0).groupby(month).sum(),
+        "net": df["amount"].groupby(month).sum(),
+        "transactions": df["amount"].groupby(month).size(),
+    })
+    summary.index = summary.index.astype(str)
+    return summary.rename_axis("month").reset_index()
+
+
+def format_table(df, max_rows=25):
+    """Render a frame as a markdown table without optional dependencies"""
+    if df.empty:
+        return "_No matching transactions._"
+    shown = df.head(max_rows)
+    header = "| " + " | ".join(str(column) for column in shown.columns) + " |"
+    divider = "| " + " | ".join("---" for _ in shown.columns) + " |"
+    lines = [header, divider]
+    for row in shown.itertuples(index=False):
+        cells = []
+        for value in row:
+            if isinstance(value, pd.Timestamp):
+                cells.append(value.strftime("%d %b %Y"))
+            elif isinstance(value, (float, np.floating)):
+                cells.append(f"{value:,.2f}")
+            else:
+                cells.append(str(value).replace("|", "/"))
+        lines.append("| " + " | ".join(cells) + " |")
+    if len(df) > max_rows:
+        lines.append(f"\n_{len(df) - max_rows} more rows not shown._")
+    return "\n".join(lines)
+
+
+class AnalyticsResult:
+    """A question answered from the transaction table, with the computed frame and its rendering"""
+
+    def __init__(self, intent, title, table):
+        self.intent = intent
+        self.title = title
+        self.table = table
+
+    @property
+    def text(self):
+        return f"**{self.title}**\n\n{format_table(self.table)}"
+
+
+def detect_intent(question):
+    """Table question a statement question asks, None when it is not one or the match is too weak to skip the LLM"""
+    if NEEDS_REASONING.search(question):
+        return None
+    for intent, pattern in INTENT_PATTERNS:
+        if pattern.search(question):
+            return intent
+    return None
+
+
+def answer_question(question, transactions):
+    """Answer common statement questions deterministically; None when the question needs the LLM"""
+    if transactions is None or transactions.empty:
+        return None
+    intent = detect_intent(question)
+    if intent is None:
+        return None
+    df = prepare(transactions)
+    display = ["date", "description", "amount", "page"]
+
+    if intent == "large":
+        threshold_match = THRESHOLD_PATTERN.search(question)
+        top_match = TOP_N_PATTERN.search(question)
+        threshold = float(threshold_match.group(1).replace(",", "")) if threshold_match else None
+        top_n = int(top_match.group(1)) if top_match else (None if threshold is not None else 10)
+        table = large_transactions(df, top_n=top_n, threshold=threshold)[display]
+        title = f"Transactions of {threshold:,.2f} or more" if threshold is not None else f"Top {top_n} largest transactions"
+    elif intent == "recurring":
+        table = recurring_transactions(df)
+        title = "Recurring payments (stable amount and interval)"
+    elif intent == "category":
+        table = totals_by(df, "category")
+        title = "Totals by category"
+    elif intent == "merchant":
+        table = totals_by(df, "merchant", top_n=15)
+        title = "Totals by merchant"
+    else:
+        table = monthly_summary(df)
+        title = "Monthly summary"
+    if table.empty:
+        # "No matching transactions" is seldom the answer; the document text may still hold it
+        logger.info(f"Local '{intent}' analysis found nothing, leaving the question to the LLM")
+        return None
+    logger.info(f"Answered '{intent}' question locally from {len(df)} transactions")
+    return AnalyticsResult(intent, title, table)
@@ -1,31 +1,102 @@
 # app.py
 import streamlit as st
+from datetime import datetime
 from pathlib import Path
 import pymupdf
 
 from config import Config
 from main import FinSight
+from telemetry import tracer
 
-def display_file_tree(root_dir):
-    if not root_dir.exists():
-        st.sidebar.warning("Extraction directory not found.")
+def display_extractions(catalog, limit=20):
+    """Sidebar list of cached extractions, read from the catalog instead of walking the directory"""
+    st.sidebar.markdown("---")
+    st.sidebar.subheader("📂 Extracted Files")
+    count, total_bytes = catalog.totals()
+    if not count:
+        st.sidebar.caption("No extractions yet.")
+        return
+    st.sidebar.caption(f"{count} extractions, {total_bytes / 1024 / 1024:.1f} MB "
+                       f"(limit {catalog.max_bytes / 1024 / 1024:.0f} MB)")
+    for entry in catalog.entries(limit=limit):
+        with st.sidebar.expander(f"📁 {entry['source_name'] or entry['name']}", expanded=False):
+            st.markdown(f"📄 {entry['page_count'] or '?'} pages, {entry['size_bytes'] / 1024:.0f} KB")
+            st.caption(f"Last used {datetime.fromtimestamp(entry['accessed_at']):%Y-%m-%d %H:%M} · {entry['name']}")
+
+def display_last_request(trace_id):
+    """Sidebar breakdown of the latest request: wall time per span, tokens and cost"""
+    spans = tracer.latest_trace(trace_id) if trace_id else []
+    if not spans:
         return
     
     st.sidebar.markdown("---")
-    st.sidebar.subheader("📂 Extracted Files")
+    st.sidebar.subheader("⏱️ Last Request")
+    depths = {}
+    rows = []
+    prompt_tokens = completion_tokens = 0
+    cost = None
+    for span in spans:
+        depths[span["span_id"]] = depths.get(span["parent_id"], -1) + 1
+        attributes = span["attributes"]
+        rows.append({
+            "span": "· " * depths[span["span_id"]] + span["name"],
+            "ms": span["duration_ms"],
+            "tokens": (attributes.get("prompt_tokens") or 0) + (attributes.get("completion_tokens") or 0) or None,
+            "cache": "hit" if attributes.get("cache_hit") or attributes.get("response_cache_hit") else "",
+        })
+        if span["name"].startswith("crew."):
+            prompt_tokens += attributes.get("prompt_tokens") or 0
+            completion_tokens += attributes.get("completion_tokens") or 0
+            if attributes.get("cost_usd") is not None:
+                cost = (cost or 0.0) + attributes["cost_usd"]
     
-    for item in sorted(root_dir.iterdir()):
-        if item.is_dir():
-            with st.sidebar.expander(f"📁 {item.name}", expanded=False):
-                for sub_item in sorted(item.rglob('*')):
-                    if sub_item.is_file():
-                        st.markdown(f"📄 {sub_item.name}")
+    root = spans[0]
+    st.sidebar.caption(
+        f"{root['name']}: {root['duration_ms'] / 1000:.2f}s, "
+        f"{prompt_tokens} prompt + {completion_tokens} completion tokens"
+        + (f", ${cost:.4f}" if cost is not None else "")
+    )
+    with st.sidebar.expander("Span breakdown", expanded=False):
+        st.dataframe(rows, hide_index=True, use_container_width=True)
+
+def render_stream(events, label):
+    """Show task progress in a status box and tokens in a placeholder as they arrive; returns the final text"""
+    status = st.status(label, expanded=False)
+    placeholder = st.empty()
+    live_text = ""
+    response = ""
+    for event in events:
+        if event["type"] == "task_started":
+            status.update(label=f"{event['task']} ({event['index']}/{event['total']})...")
+            status.write(f"▶️ {event['task']}")
+            live_text = ""
+        elif event["type"] == "token":
+            live_text += event["text"]
+            placeholder.markdown(live_text + "▌")
+        elif event["type"] == "task_completed":
+            status.write(f"✅ {event['task']}")
+        elif event["type"] == "result":
+            response = event["text"]
+        elif event["type"] == "error":
+            response = f"Error: {event['error']}"
+    status.update(label="Done", state="complete")
+    placeholder.markdown(response)
+    return response
+
+def close_document():
+    """Release the uploaded document; it is parsed once per upload and kept open until extracted"""
+    if st.session_state.get('pdf_document') is not None:
+        st.session_state.pdf_document.close()
+    st.session_state.pdf_document = None
 
 def reset_session():
+    close_document()
     st.session_state.clear()
     st.rerun()
 
 st.set_page_config(page_title="FinSight", page_icon="🧠", layout="centered")
+Config.setup_logging()
+Config.setup_directories()
 
 # --- Initialization ---
 if 'finsight' not in st.session_state:
@@ -34,8 +105,9 @@ if 'messages' not in st.session_state:
     st.session_state.messages = []
 if 'pdf_processed' not in st.session_state:
     st.session_state.pdf_processed = False
-if 'temp_pdf_path' not in st.session_state:
-    st.session_state.temp_pdf_path = None
+if 'pdf_document' not in st.session_state:
+    st.session_state.pdf_document = None
+    st.session_state.pdf_name = None
 if 'password_required' not in st.session_state:
     st.session_state.password_required = False
 
@@ -47,7 +119,8 @@ with st.sidebar:
         if st.button("Process New Document"):
             reset_session()
             
-    display_file_tree(Config.EXTRACTIONS_DIR)
+    display_extractions(st.session_state.finsight.pdf_extractor.cache.catalog)
+    display_last_request(st.session_state.finsight.last_trace_id)
 
     # --- Developer Info Block ---
     st.sidebar.markdown("---")
@@ -73,19 +146,13 @@ if not st.session_state.pdf_processed:
         key="file_uploader"
     )
 
-    if uploaded_file and not st.session_state.temp_pdf_path:
-        temp_dir = Config.BASE_DIR / "temp"
-        temp_dir.mkdir(exist_ok=True)
-        st.session_state.temp_pdf_path = temp_dir / uploaded_file.name
-        
-        with open(st.session_state.temp_pdf_path, "wb") as f:
-            f.write(uploaded_file.getvalue())
-        
+    if uploaded_file and st.session_state.pdf_document is None:
+        # Parsed straight from the upload buffer: no temp file, and the same document is extracted below
         try:
-            doc = pymupdf.open(st.session_state.temp_pdf_path)
-            if doc.needs_pass:
+            st.session_state.pdf_document = pymupdf.open(stream=uploaded_file.getvalue(), filetype="pdf")
+            st.session_state.pdf_name = Path(uploaded_file.name).stem
+            if st.session_state.pdf_document.needs_pass:
                 st.session_state.password_required = True
-            doc.close()
         except Exception as e:
             st.error(f"Could not read the PDF. It may be corrupted. Error: {e}")
             reset_session()
@@ -98,35 +165,38 @@ if not st.session_state.pdf_processed:
             if password:
                 with st.spinner("Processing with password..."):
                     extraction_path = st.session_state.finsight.extract_pdf(
-                        str(st.session_state.temp_pdf_path), 
-                        password=password
+                        st.session_state.pdf_document,
+                        password=password,
+                        name=st.session_state.pdf_name
                     )
                 if extraction_path:
+                    st.session_state.extraction_path = extraction_path
                     st.session_state.pdf_processed = True
                     st.session_state.messages.append({
                         "role": "assistant", 
                         "content": "✅ Successfully processed the document. How can I help?"
                     })
-                    st.session_state.temp_pdf_path.unlink()
+                    close_document()
                     st.session_state.password_required = False
-                    st.session_state.temp_pdf_path = None
                     st.rerun()
                 else:
                     st.error("Incorrect password or failed to process the PDF.")
             else:
                 st.warning("Please enter a password.")
 
-    elif st.session_state.temp_pdf_path and not st.session_state.password_required:
+    elif st.session_state.pdf_document is not None and not st.session_state.password_required:
         with st.spinner("Extracting data..."):
-            extraction_path = st.session_state.finsight.extract_pdf(str(st.session_state.temp_pdf_path))
+            extraction_path = st.session_state.finsight.extract_pdf(
+                st.session_state.pdf_document, name=st.session_state.pdf_name
+            )
         if extraction_path:
+            st.session_state.extraction_path = extraction_path
             st.session_state.pdf_processed = True
             st.session_state.messages.append({
                 "role": "assistant", 
                 "content": "✅ Successfully processed the document. How can I help?"
             })
-            st.session_state.temp_pdf_path.unlink()
-            st.session_state.temp_pdf_path = None
+            close_document()
             st.rerun()
         else:
             st.error("Failed to process the PDF.")
@@ -144,9 +214,9 @@ if st.session_state.pdf_processed:
             st.markdown("Run a comprehensive analysis.")
         
         with st.chat_message("assistant"):
-            with st.spinner("Analyzing..."):
-                response = st.session_state.finsight.analyze_document(st.session_state.extraction_path)
-                st.markdown(response)
+            response = render_stream(
+                st.session_state.finsight.stream_analysis(st.session_state.extraction_path), "Analyzing..."
+            )
         st.session_state.messages.append({"role": "assistant", "content": response})
         st.rerun()
 
@@ -156,9 +226,9 @@ if st.session_state.pdf_processed:
             st.markdown(prompt)
 
         with st.chat_message("assistant"):
-            with st.spinner("Thinking..."):
-                response = st.session_state.finsight.ask_question(prompt, st.session_state.extraction_path)
-                st.markdown(response)
+            response = render_stream(
+                st.session_state.finsight.stream_question(prompt, st.session_state.extraction_path), "Thinking..."
+            )
         
         st.session_state.messages.append({"role": "assistant", "content": response})
         st.rerun()
\ No newline at end of file
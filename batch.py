@@ -0,0 +1,195 @@
+import glob
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from pathlib import Path
+
+from config import Config
+from extraction_cache import read_manifest
+
+logger = logging.getLogger(__name__)
+
+# One FinSight per extraction process and per analysis thread; FinSight keeps per-document state
+_process_finsight = None
+_thread_state = threading.local()
+
+
+def find_pdfs(source):
+    """PDF files under a directory (recursively) or matching a glob pattern, in a stable order"""
+    path = Path(source)
+    if path.is_dir():
+        files = [p for p in path.rglob("*") if p.is_file() and p.suffix.lower() == ".pdf"]
+    else:
+        files = [Path(p) for p in glob.glob(str(source), recursive=True)]
+        files = [p for p in files if p.is_file() and p.suffix.lower() == ".pdf"]
+    return sorted(p.resolve() for p in files)
+
+
+def read_batch_manifest(manifest_path):
+    """Latest record per file from a batch manifest; lines cut short by a crash are ignored"""
+    records = {}
+    path = Path(manifest_path)
+    if not path.exists():
+        return records
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            records[record["file"]] = record
+    return records
+
+
+def _init_extraction_worker():
+    global _process_finsight
+    from main import FinSight
+    _process_finsight = FinSight()
+
+
+def _extract_one(pdf_path, password):
+    """Extract one PDF inside a pool process; never raises so one bad file cannot stop the batch"""
+    started = time.perf_counter()
+    try:
+        # The batch already runs one document per process, so pages are extracted serially
+        extraction_path = _process_finsight.extract_pdf(pdf_path, password=password, workers=1)
+    except Exception as e:
+        return {"extraction_path": None, "error": str(e), "extract_seconds": time.perf_counter() - started}
+    result = {"extraction_path": str(extraction_path) if extraction_path else None,
+              "extract_seconds": time.perf_counter() - started}
+    if extraction_path:
+        manifest = read_manifest(extraction_path) or {}
+        result["pages"] = manifest.get("page_count", 0)
+    else:
+        result["error"] = "Extraction failed (unreadable or password-protected PDF)"
+    return result
+
+
+def _analyze_one(extraction_path, mode):
+    from main import FinSight
+    finsight = getattr(_thread_state, "finsight", None)
+    if finsight is None:
+        finsight = _thread_state.finsight = FinSight()
+    started = time.perf_counter()
+    report = finsight.analyze_document(extraction_path, mode=mode)
+    return report, time.perf_counter() - started
+
+
+class BatchRunner:
+    """Extract a folder of PDFs in a process pool and analyze them with bounded LLM concurrency.
+
+    Every finished file is appended to a JSONL manifest; rerunning with the same manifest
+    skips files already done and retries the ones that failed.
+    """
+
+    def __init__(self, manifest_path=None, workers=None, llm_concurrency=None, analyze=True, mode=None, password=None):
+        self.manifest_path = Path(manifest_path or Config.BATCH_MANIFEST_PATH)
+        self.workers = workers or Config.BATCH_WORKERS or os.cpu_count() or 1
+        self.llm_concurrency = llm_concurrency or Config.BATCH_LLM_CONCURRENCY
+        self.analyze = analyze
+        self.mode = mode
+        self.password = password
+        self.reports_dir = Config.OUTPUT_DIR / "reports"
+        self._manifest_lock = threading.Lock()
+
+    def _record(self, record):
+        with self._manifest_lock:
+            with open(self.manifest_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _write_report(self, extraction_path, report):
+        self.reports_dir.mkdir(parents=True, exist_ok=True)
+        report_path = self.reports_dir / f"{Path(extraction_path).name}.md"
+        report_path.write_text(report, encoding="utf-8")
+        return str(report_path)
+
+    def run(self, source):
+        """Process every PDF in source; returns a summary with counts and throughput"""
+        files = find_pdfs(source)
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+        previous = read_batch_manifest(self.manifest_path)
+        pending = [str(p) for p in files if previous.get(str(p), {}).get("status") != "done"]
+        skipped = len(files) - len(pending)
+        logger.info(f"Batch: {len(files)} PDFs found, {skipped} already done, {len(pending)} to process")
+        print(f"Batch: {len(files)} PDFs found, {skipped} already done, {len(pending)} to process")
+
+        summary = {"files": len(files), "skipped": skipped, "done": 0, "failed": 0, "pages": 0,
+                   "extract_seconds": 0.0, "failures": []}
+        started = time.perf_counter()
+        if pending:
+            self._process(pending, summary)
+        elapsed = time.perf_counter() - started
+
+        summary["elapsed_seconds"] = round(elapsed, 3)
+        summary["pages_per_second"] = round(summary["pages"] / elapsed, 2) if elapsed else 0.0
+        summary["docs_per_minute"] = round((summary["done"] + summary["failed"]) * 60 / elapsed, 2) if elapsed else 0.0
+        logger.info(f"Batch finished: {summary['done']} done, {summary['failed']} failed in {elapsed:.1f}s")
+        print(f"\nBatch finished in {elapsed:.1f}s: {summary['done']} done, {summary['failed']} failed, {skipped} skipped")
+        print(f"Throughput: {summary['pages_per_second']} pages/s, {summary['docs_per_minute']} docs/min")
+        for failure in summary["failures"]:
+            print(f"  ✗ {failure['file']} ({failure['stage']}): {failure['error']}")
+        return summary
+
+    def _finish(self, record, summary):
+        self._record(record)
+        if record["status"] == "done":
+            summary["done"] += 1
+            print(f"  ✓ {record['file']}")
+        else:
+            summary["failed"] += 1
+            summary["failures"].append({"file": record["file"], "stage": record["stage"], "error": record["error"]})
+            logger.error(f"Batch failure in {record['stage']} for {record['file']}: {record['error']}")
+            print(f"  ✗ {record['file']}: {record['error']}")
+
+    def _process(self, pending, summary):
+        with ProcessPoolExecutor(max_workers=min(self.workers, len(pending)),
+                                 initializer=_init_extraction_worker) as extract_pool, \
+                ThreadPoolExecutor(max_workers=self.llm_concurrency, thread_name_prefix="finsight-batch-llm") as llm_pool:
+            futures = {extract_pool.submit(_extract_one, pdf_path, self.password): ("extract", pdf_path, None)
+                       for pdf_path in pending}
+            while futures:
+                finished, _ = wait(futures, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    stage, pdf_path, record = futures.pop(future)
+                    if stage == "extract":
+                        record = self._extracted(pdf_path, future, summary)
+                        if record["status"] == "extracted":
+                            future = llm_pool.submit(_analyze_one, record["extraction_path"], self.mode)
+                            futures[future] = ("analysis", pdf_path, record)
+                        else:
+                            self._finish(record, summary)
+                    else:
+                        self._analyzed(record, future, summary)
+
+    def _extracted(self, pdf_path, future, summary):
+        try:
+            result = future.result()
+        except Exception as e:
+            # The worker process itself died (e.g. a PyMuPDF crash)
+            result = {"extraction_path": None, "error": f"Worker crashed: {e}", "extract_seconds": 0.0}
+        summary["extract_seconds"] += result["extract_seconds"]
+        record = {"file": pdf_path, "extraction_path": result["extraction_path"],
+                  "pages": result.get("pages", 0), "extract_seconds": round(result["extract_seconds"], 3)}
+        if not result["extraction_path"]:
+            record.update(status="failed", stage="extraction", error=result["error"])
+            return record
+        summary["pages"] += record["pages"]
+        if not self.analyze:
+            record["status"] = "done"
+            return record
+        record["status"] = "extracted"
+        return record
+
+    def _analyzed(self, record, future, summary):
+        try:
+            report, seconds = future.result()
+            record.update(status="done", report=self._write_report(record["extraction_path"], report),
+                          analysis_seconds=round(seconds, 3))
+        except Exception as e:
+            record.update(status="failed", stage="analysis", error=str(e))
+        self._finish(record, summary)
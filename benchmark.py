@@ -0,0 +1,364 @@
+# Benchmarks for extraction, loading, prompt sizes and end-to-end answers with a deterministic fake LLM.
+#   python benchmark.py                    run and compare against benchmarks/baseline.json
+#   python benchmark.py --save-baseline    run and store the results as the new baseline
+#   python benchmark.py --startup-only     only check import times and the extract CLI against their budgets
+import argparse
+import json
+import logging
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Telemetry exports would add network time to the end-to-end numbers, and CrewAI's first-run trace prompt would
+# block on input; these must be set before anything imports crewai, including the fresh interpreters timed below
+for name, value in (("CREWAI_DISABLE_TELEMETRY", "true"), ("CREWAI_TRACING_ENABLED", "false"), ("OTEL_SDK_DISABLED", "true")):
+    os.environ.setdefault(name, value)
+
+import pymupdf
+
+from config import Config
+
+BASELINE_PATH = Config.BASE_DIR / "benchmarks" / "baseline.json"
+# Timing metrics that moved by less than this many seconds are never reported as regressions
+MIN_TIME_DELTA = 0.05
+QUESTION = "What is the total amount and when is it due?"
+# Fresh-interpreter import budgets in seconds, with the heavy packages each import must not load
+IMPORT_BUDGETS = {
+    "config": (0.1, ("pandas", "crewai")),
+    "pdf_extractor": (0.5, ("pandas", "crewai", "litellm")),
+    "main": (0.75, ("pandas", "numpy", "crewai", "litellm")),
+}
+# "python main.py extract" on an already extracted PDF, interpreter startup included; it must never load the LLM stack
+CLI_EXTRACT_BUDGET = (2.0, ("crewai", "litellm"))
+HEAVY_MODULES = ("pandas", "numpy", "pyarrow", "crewai", "litellm")
+MERCHANTS = ["UPI/SWIGGY/ORDER", "POS AMAZON RETAIL", "NEFT SALARY ACME LTD", "UPI/UBER/TRIP", "ATM CASH WITHDRAWAL",
+             "ECOM NETFLIX SUBSCRIPTION", "BIL ELECTRICITY BOARD", "IMPS RENT TRANSFER", "POS STARBUCKS CAFE"]
+
+
+def make_synthetic_statement(path, pages, seed=7, ruled=True):
+    """A multi-page bank statement with a repeated letterhead and a terms page every tenth page. Ruled statements
+    draw every cell and repeat the header; borderless ones right-align the amounts and print the header once."""
+    rng = random.Random(seed)
+    doc = pymupdf.open()
+    logo = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 160, 48), False)
+    logo.set_rect(logo.irect, (20, 60, 140))
+    logo_png = logo.tobytes("png")
+    balance = 250000.0
+    day = 0
+    for page_number in range(1, pages + 1):
+        page = doc.new_page()
+        page.insert_image(pymupdf.Rect(36, 24, 196, 72), stream=logo_png)
+        page.insert_text((220, 44), "FINSIGHT DEMO BANK - STATEMENT OF ACCOUNT", fontsize=10)
+        page.insert_text((220, 60), "Account 0000123456789  Period 01-01-2025 to 31-12-2025", fontsize=8)
+        page.insert_text((500, 820), f"Page {page_number} of {pages}", fontsize=8)
+        if page_number % 10 == 0:
+            y = 100
+            for clause in range(40):
+                page.insert_text((36, y), f"{clause + 1}. The bank may revise charges and interest rates with prior notice "
+                                          f"as per the schedule of charges.", fontsize=8)
+                y += 16
+            continue
+        columns = [36, 100, 330, 410, 490, 570]
+        headers = ["Date", "Description", "Debit", "Credit", "Balance"]
+        y = 100
+        rows = [headers] if ruled or page_number == 1 else []
+        for _ in range(30):
+            day += rng.random() < 0.5
+            amount = round(rng.uniform(50, 15000), 2)
+            credit = rng.random() < 0.15
+            balance += amount if credit else -amount
+            date = f"{1 + day % 28:02d}-{1 + (day // 28) % 12:02d}-2025"
+            description = f"{rng.choice(MERCHANTS)}/{rng.randrange(10**9, 10**10)}"
+            rows.append([date, description, "" if credit else f"{amount:,.2f}", f"{amount:,.2f}" if credit else "",
+                         f"{balance:,.2f}"])
+        row_height = 22
+        # One shape per page: drawing cell by cell would rewrite the page contents thousands of times
+        shape = page.new_shape()
+        for row in rows:
+            for position, (left, right, cell) in enumerate(zip(columns, columns[1:], row)):
+                if ruled:
+                    shape.draw_rect(pymupdf.Rect(left, y, right, y + row_height))
+                    shape.insert_text((left + 3, y + 14), cell, fontsize=7)
+                elif position >= 2:
+                    shape.insert_text((right - 3 - pymupdf.get_text_length(cell, fontsize=7), y + 14), cell, fontsize=7)
+                else:
+                    shape.insert_text((left + 3, y + 14), cell, fontsize=7)
+            y += row_height
+        shape.finish(color=(0, 0, 0), width=0.5)
+        shape.commit()
+    doc.save(path, garbage=3, deflate=True)
+    doc.close()
+
+
+def timed(function, *args, **kwargs):
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def measure_extraction_stages(pdf_path, password, work_dir):
+    """Time each extraction stage separately over every page of the document"""
+    from pdf_extractor import PDFExtractor
+    from table_detection import detect_document_type, resolve_table_strategy
+    from text_store import PageBuffer, format_metadata
+
+    extractor = PDFExtractor()
+    doc = extractor.unlock_pdf(str(pdf_path), password=password)
+    buffer = PageBuffer()
+    tables_dir = work_dir / "stage_tables"
+    images_dir = work_dir / "stage_images"
+    tables_dir.mkdir(exist_ok=True)
+    images_dir.mkdir(exist_ok=True)
+    strategy = resolve_table_strategy(detect_document_type(doc[0].get_text() if len(doc) else ""))
+    saved_images = {}
+    ledger_dir = work_dir / "stage_ledger"
+    stages = {"text_s": 0.0, "sorted_text_s": 0.0, "tables_s": 0.0, "ledger_s": 0.0, "images_s": 0.0}
+    try:
+        for page_number, page in enumerate(doc):
+            stages["text_s"] += timed(page.get_text)[1]
+            stages["sorted_text_s"] += timed(page.get_text, sort=True)[1]
+            tables, seconds = timed(extractor._extract_tables, page, page_number, tables_dir, buffer, strategy)
+            stages["tables_s"] += seconds
+            if not tables:
+                stages["ledger_s"] += timed(extractor._extract_ledger, page, page_number, ledger_dir, buffer, strategy)[1]
+            stages["images_s"] += timed(extractor._extract_images, doc, page, page_number, images_dir, buffer, saved_images)[1]
+        stages["metadata_s"] = timed(lambda: format_metadata(doc.metadata, len(doc), doc.is_encrypted))[1]
+        page_count = len(doc)
+    finally:
+        doc.close()
+    return stages, page_count
+
+
+def benchmark_document(pdf_path, password, work_dir):
+    """One round of every measurement for one PDF; returns {metric: value}"""
+    from data_loader import FinancialDataLoader, document_cache
+    from document_assembler import assemble_document
+    from extraction_cache import ExtractionCache
+    from fake_llm import FakeLLM
+    from ledger_parser import read_ledger
+    from main import FinSight
+    from pdf_extractor import PDFExtractor
+    from retrieval import RetrievalIndex
+    from tasks import DocumentTasks
+    from agent import DocumentAgents
+    from token_utils import estimate_tokens
+
+    metrics = {}
+    stages, page_count = measure_extraction_stages(pdf_path, password, work_dir)
+    metrics["pages"] = page_count
+    metrics.update({f"extract_{name}": value for name, value in stages.items()})
+
+    extractor = PDFExtractor(cache=ExtractionCache(root=work_dir / "cache"))
+    extraction_path, metrics["extract_total_s"] = timed(extractor.extract_pdf_content, str(pdf_path), password=password,
+                                                        workers=1, use_cache=False)
+    if extraction_path is None:
+        raise RuntimeError(f"Extraction failed for {pdf_path}")
+    metrics["extract_cached_s"] = timed(extractor.extract_pdf_content, str(pdf_path), password=password)[1]
+
+    document_cache.clear()
+    loader = FinancialDataLoader(extraction_path)
+    metrics["load_all_data_s"] = timed(loader.load_all_data)[1]
+    transactions, metrics["load_transactions_s"] = timed(loader.load_transactions)
+    ledger = read_ledger(extraction_path)
+    metrics["transactions"] = 0 if transactions is None else len(transactions)
+    metrics["ledger_transactions"] = 0 if ledger is None else len(ledger)
+
+    document, metrics["assemble_s"] = timed(assemble_document, loader)
+    index, metrics["retrieval_index_s"] = timed(RetrievalIndex.load_or_build, extraction_path, loader)
+    excerpts = RetrievalIndex.format_chunks(index.retrieve(QUESTION))
+    tasks = DocumentTasks(agents=DocumentAgents.create_all_agents(FakeLLM()))
+    metrics["prompt_analysis_tokens"] = estimate_tokens(tasks.create_contextualization_task(document.text).description)
+    metrics["prompt_fast_analysis_tokens"] = estimate_tokens(tasks.create_fast_analysis_task(document.text).description)
+    metrics["prompt_full_text_question_tokens"] = estimate_tokens(tasks.create_specific_question_task(QUESTION, document.text).description)
+    metrics["prompt_excerpt_question_tokens"] = estimate_tokens(tasks.create_excerpt_question_task(QUESTION, excerpts).description)
+
+    llm = FakeLLM()
+    finsight = FinSight(llm=llm)
+    for mode in ("fast", "full"):
+        calls_before = len(llm.calls)
+        metrics[f"analyze_{mode}_s"] = timed(finsight.analyze_document, extraction_path, use_cache=False, mode=mode)[1]
+        metrics[f"analyze_{mode}_llm_calls"] = len(llm.calls) - calls_before
+        metrics[f"analyze_{mode}_llm_tokens"] = sum(estimate_tokens(call) for call in llm.calls[calls_before:])
+    # Follow-up questions after an analysis are answered from its digest; the raw-text path is measured too
+    calls_before = len(llm.calls)
+    metrics["ask_question_s"] = timed(finsight.ask_question, QUESTION, extraction_path, use_cache=False)[1]
+    metrics["ask_question_llm_tokens"] = sum(estimate_tokens(call) for call in llm.calls[calls_before:])
+    digest_enabled, Config.DIGEST_ENABLED = Config.DIGEST_ENABLED, False
+    try:
+        calls_before = len(llm.calls)
+        metrics["ask_question_without_digest_s"] = timed(finsight.ask_question, QUESTION, extraction_path, use_cache=False)[1]
+        metrics["ask_question_without_digest_llm_tokens"] = sum(estimate_tokens(call) for call in llm.calls[calls_before:])
+    finally:
+        Config.DIGEST_ENABLED = digest_enabled
+    return metrics
+
+
+def run_fresh(code):
+    """Run code in a fresh interpreter; returns (wall seconds, heavy modules it left loaded)"""
+    script = f"{code}\nimport json, sys\nprint(json.dumps([name for name in {HEAVY_MODULES!r} if name in sys.modules]))"
+    completed, seconds = timed(subprocess.run, [sys.executable, "-c", script], cwd=Config.BASE_DIR,
+                               capture_output=True, text=True, check=True)
+    return seconds, json.loads(completed.stdout.splitlines()[-1])
+
+
+def measure_startup(pdf_path, rounds=5):
+    """Best-of-rounds import and extract CLI times; returns (metrics, budget violations)"""
+    metrics = {}
+    violations = []
+    # An empty interpreter is the floor every measurement below includes
+    floor = min(run_fresh("pass")[0] for _ in range(rounds))
+    checks = [(f"import_{module}_s", f"import {module}", budget) for module, budget in IMPORT_BUDGETS.items()]
+    # The same path as "python main.py extract <pdf>"; the first run fills the extraction cache
+    cli = f"import sys, main\nsys.argv = ['main.py', 'extract', {str(pdf_path)!r}]\ntry:\n    main.main()\nexcept SystemExit:\n    pass"
+    run_fresh(cli)
+    checks.append(("cli_extract_cached_s", cli, CLI_EXTRACT_BUDGET))
+    for metric, code, (budget, forbidden) in checks:
+        samples = [run_fresh(code) for _ in range(rounds)]
+        seconds = min(sample[0] for sample in samples)
+        # Imports are measured on top of interpreter startup; the CLI includes it, as a user would see it
+        metrics[metric] = seconds - floor if metric.startswith("import_") else seconds
+        if metrics[metric] > budget:
+            violations.append(f"{metric} = {metrics[metric]:.3f}s exceeds its {budget:.2f}s budget")
+        loaded = sorted(set(forbidden) & {name for sample in samples for name in sample[1]})
+        if loaded:
+            violations.append(f"{metric}: loaded {', '.join(loaded)}")
+    return metrics, violations
+
+
+def warm_up():
+    """Run every code path once on a tiny statement so imports and first-call setup are not measured"""
+    with tempfile.TemporaryDirectory(prefix="finsight-bench-") as work_dir:
+        pdf_path = Path(work_dir) / "warm_up.pdf"
+        make_synthetic_statement(pdf_path, 2)
+        benchmark_document(pdf_path, None, Path(work_dir))
+
+
+def run_benchmarks(documents, repeat):
+    """Per document and metric: the fastest round for timings (least disturbed by noise), the median otherwise"""
+    results = {}
+    for name, pdf_path, password, rounds_wanted in documents:
+        rounds = []
+        for _ in range(rounds_wanted or repeat):
+            with tempfile.TemporaryDirectory(prefix="finsight-bench-") as work_dir:
+                rounds.append(benchmark_document(pdf_path, password, Path(work_dir)))
+        results[name] = {
+            metric: (min if metric.endswith("_s") else statistics.median)(r[metric] for r in rounds)
+            for metric in rounds[0]
+        }
+        print(f"  {name}: {results[name]['pages']} pages, extraction {results[name]['extract_total_s']:.3f}s, "
+              f"fast analysis {results[name]['analyze_fast_s']:.3f}s")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """Rows of (document, metric, baseline, current, change, regressed) for metrics present in both"""
+    rows = []
+    for name, metrics in results.items():
+        for metric, current in metrics.items():
+            previous = baseline.get(name, {}).get(metric)
+            if previous is None or metric == "pages":
+                continue
+            change = (current - previous) / previous if previous else 0.0
+            regressed = change > threshold
+            if metric.endswith("_s") and current - previous < MIN_TIME_DELTA:
+                regressed = False
+            rows.append((name, metric, previous, current, change, regressed))
+    return rows
+
+
+def print_comparison(rows):
+    print(f"\n{'document':<34} {'metric':<34} {'baseline':>12} {'current':>12} {'change':>8}")
+    for name, metric, previous, current, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{name:<34} {metric:<34} {previous:>12.4f} {current:>12.4f} {change:>+8.1%}{flag}")
+
+
+def bundled_documents(password=None):
+    """Sample PDFs shipped with the repo; protected ones are only included when a password is given"""
+    documents = []
+    for pdf_path in sorted(Config.BASE_DIR.glob("*.pdf")):
+        doc = pymupdf.open(pdf_path)
+        needs_pass = doc.needs_pass
+        doc.close()
+        if needs_pass and not password:
+            print(f"  Skipping {pdf_path.name}: password protected (pass --password to include it)")
+            continue
+        documents.append((pdf_path.name, pdf_path, password if needs_pass else None, None))
+    return documents
+
+
+def main():
+    parser = argparse.ArgumentParser(description="FinSight benchmarks")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH), help="Baseline JSON to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="Store these results as the baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown before a metric regresses")
+    parser.add_argument("--repeat", type=int, default=3, help="Rounds per sample PDF")
+    parser.add_argument("--synthetic-repeat", type=int, default=1, help="Rounds per synthetic statement")
+    parser.add_argument("--pages", type=int, nargs="*", default=[300], help="Sizes of synthetic statements to include")
+    parser.add_argument("--borderless-pages", type=int, nargs="*", default=[300],
+                        help="Sizes of synthetic statements without table rulings to include")
+    parser.add_argument("--password", default=None, help="Password for protected sample PDFs")
+    parser.add_argument("--startup-only", action="store_true", help="Only measure import times and the extract CLI")
+    options = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    Config.AGENT_VERBOSE = False
+    Config.RESPONSE_CACHE_ENABLED = False
+
+    with tempfile.TemporaryDirectory(prefix="finsight-synthetic-") as synthetic_dir:
+        documents = bundled_documents(options.password)
+        startup_pdf = next((pdf_path for _, pdf_path, password, _ in documents if password is None), None)
+        if startup_pdf is None:
+            startup_pdf = Path(synthetic_dir) / "startup.pdf"
+            make_synthetic_statement(startup_pdf, 2)
+        print("Measuring startup")
+        startup, violations = measure_startup(startup_pdf)
+        results = {"startup": startup}
+        if not options.startup_only:
+            for pages in options.pages:
+                pdf_path = Path(synthetic_dir) / f"synthetic_statement_{pages}.pdf"
+                make_synthetic_statement(pdf_path, pages)
+                documents.append((f"synthetic_statement_{pages}p", pdf_path, None, options.synthetic_repeat))
+            for pages in options.borderless_pages:
+                pdf_path = Path(synthetic_dir) / f"synthetic_borderless_{pages}.pdf"
+                make_synthetic_statement(pdf_path, pages, ruled=False)
+                documents.append((f"synthetic_borderless_{pages}p", pdf_path, None, options.synthetic_repeat))
+            print(f"Benchmarking {len(documents)} documents")
+            warm_up()
+            results.update(run_benchmarks(documents, options.repeat))
+
+    for violation in violations:
+        print(f"  BUDGET: {violation}")
+    baseline_path = Path(options.baseline)
+    if options.save_baseline:
+        if options.startup_only and baseline_path.exists():
+            results = {**json.loads(baseline_path.read_text(encoding="utf-8")), **results}
+        baseline_path.parent.mkdir(parents=True, exist_ok=True)
+        baseline_path.write_text(json.dumps(results, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+        print(f"\nBaseline saved to {baseline_path}")
+        return 0
+    if not baseline_path.exists():
+        print(f"\nNo baseline at {baseline_path}; run with --save-baseline to create one")
+        print(json.dumps(results, indent=2, sort_keys=True))
+        return 1 if violations else 0
+
+    rows = compare(results, json.loads(baseline_path.read_text(encoding="utf-8")), options.threshold)
+    print_comparison(rows)
+    regressions = [row for row in rows if row[5]]
+    if regressions:
+        print(f"\n{len(regressions)} metrics regressed by more than {options.threshold:.0%}")
+    if violations:
+        print(f"\n{len(violations)} startup budgets exceeded")
+    if regressions or violations:
+        return 1
+    print(f"\nNo regressions beyond {options.threshold:.0%} and startup within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
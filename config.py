@@ -3,12 +3,9 @@ import logging
 from pathlib import Path
 from dotenv import load_dotenv
 
-# Configure logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
 load_dotenv()
-logger.info("Environment variables loaded")
 
 class Config:
     """Configuration settings for FinSight"""
@@ -17,6 +14,8 @@ class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "your-api-key-here")
     # Using a more recent and capable model is recommended
     OPENAI_MODEL = "gpt-4o"
+    # Point the LLM at another OpenAI-compatible endpoint, e.g. stub_llm_server.py in tests
+    OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL")
 
     # File Paths
     BASE_DIR = Path(__file__).parent
@@ -27,15 +26,156 @@ class Config:
     AGENT_VERBOSE = True
     MAX_PASSWORD_ATTEMPTS = 3
 
+    # Extraction Configuration
+    # Number of worker processes used to extract pages (1 = serial, 0 = one per CPU)
+    EXTRACTION_WORKERS = int(os.getenv("FINSIGHT_EXTRACTION_WORKERS", "1"))
+    # Documents shorter than this are always extracted serially
+    PARALLEL_MIN_PAGES = 16
+    # Largest page chunk handed to a worker, which bounds the pages a finished chunk holds in memory
+    PARALLEL_MAX_CHUNK_PAGES = 25
+    # MuPDF's cache of decoded fonts and images is emptied after this many pages
+    EXTRACTION_STORE_RESET_PAGES = 50
+    # Reuse a finished extraction when the same PDF content is extracted again
+    EXTRACTION_CACHE_ENABLED = True
+    # Cached extractions are indexed in this SQLite file inside the extractions directory
+    EXTRACTION_CATALOG_NAME = "catalog.sqlite3"
+    # Eviction: extractions unused for longer than max_age go first, then least recently used ones over max_bytes
+    EXTRACTION_CACHE_MAX_BYTES = int(os.getenv("FINSIGHT_EXTRACTION_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+    EXTRACTION_CACHE_MAX_AGE_SECONDS = 30 * 24 * 3600
+    # ...but never one used within this window, since a session may still be reading it
+    EXTRACTION_CACHE_MIN_IDLE_SECONDS = 3600
+    # Staging directories left by crashed extractions are deleted once they are this old
+    EXTRACTION_STAGING_MAX_AGE_SECONDS = 6 * 3600
+    # "packed" stores all page texts in one memory-mappable file, "files" keeps one .txt per page
+    TEXT_STORE_FORMAT = "packed"
+    # "dedup" writes each distinct image once and indexes where it appears, "all" writes every occurrence,
+    # "lazy" only indexes images (see PDFExtractor.materialize_images), "none" skips them for text-only work
+    IMAGE_MODE = os.getenv("FINSIGHT_IMAGE_MODE", "dedup")
+
+    # Table Detection Configuration
+    # Document type is taken from the first page: the first type with a matching keyword wins, else "default"
+    DOCUMENT_TYPE_KEYWORDS = {
+        "credit_card_statement": ["credit card statement", "minimum amount due", "total amount due"],
+        "bank_statement": ["statement of account", "account statement", "opening balance", "closing balance"],
+        "ticket": ["pnr", "e-ticket", "boarding pass", "electronic reservation slip"],
+        "invoice": ["tax invoice", "invoice no", "invoice number"],
+    }
+    # Per document type overrides of the "default" table strategy:
+    #   enabled          - run table detection at all
+    #   prefilter        - "lines": skip pages with fewer than min_edges horizontal or vertical rulings
+    #                      (find_tables' default line strategy cannot find a table there),
+    #                      "text": skip pages with fewer than min_aligned_rows rows of min_columns word columns,
+    #                      None: always run find_tables
+    #   find_tables      - keyword arguments for page.find_tables, e.g. {"strategy": "text"} for borderless tables
+    #   ledger           - parse dated lines with amounts from word positions on pages where no table was found
+    TABLE_STRATEGIES = {
+        "default": {"enabled": True, "prefilter": "lines", "min_edges": 2,
+                    "min_aligned_rows": 3, "min_columns": 3, "find_tables": {}, "ledger": True},
+    }
+
+    # Retrieval Configuration
+    # Answer questions from the best matching chunks instead of the whole document
+    RETRIEVAL_ENABLED = True
+    RETRIEVAL_TOP_K = 8
+    RETRIEVAL_TOKEN_BUDGET = 3000
+    RETRIEVAL_CHUNK_LINES = 15
+
+    # Document Digest Configuration
+    # Analyses keep their context and extraction results with the extraction; questions are first sent this
+    # digest and go back to the excerpts or the full text only when it cannot answer them
+    DIGEST_ENABLED = True
+    # Longer digests are not used for questions, since the excerpts would be smaller
+    DIGEST_MAX_TOKENS = 4000
+
+    # Response Cache Configuration
+    RESPONSE_CACHE_ENABLED = True
+    RESPONSE_CACHE_PATH = OUTPUT_DIR / "response_cache.sqlite3"
+    RESPONSE_CACHE_MEMORY_ENTRIES = 256
+    RESPONSE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+    RESPONSE_CACHE_TTL_SECONDS = 7 * 24 * 3600
+
+    # Document Assembly Configuration
+    # Which text layout to send to the LLM ("sorted" follows the visual reading order)
+    ASSEMBLY_LAYOUT = "sorted"
+    ASSEMBLY_TOKEN_BUDGET = 60000
+    # Header/footer lines are looked for among this many lines at the top and bottom of each page
+    ASSEMBLY_EDGE_LINES = 3
+    # ...and collapsed when they recur on at least this share of pages
+    ASSEMBLY_REPEAT_RATIO = 0.5
+
+    # Analysis Configuration
+    # "full" runs the context, extraction and reporting agents in turn; "fast" (opt-in) writes the whole report
+    # in one cheaper LLM call; "map_reduce" is for documents longer than the model context
+    ANALYSIS_MODE = os.getenv("FINSIGHT_ANALYSIS_MODE", "full")
+    # "map_reduce" extracts page-aligned chunks of this size concurrently, then merges the partial extractions
+    # into the report; chunk results are cached by their content, so only changed chunks are sent again
+    MAP_REDUCE_CHUNK_TOKENS = 12000
+    MAP_REDUCE_CONCURRENCY = int(os.getenv("FINSIGHT_MAP_REDUCE_CONCURRENCY", "4"))
+    # Partial results longer than this together are merged in groups first, as often as needed
+    MAP_REDUCE_REDUCE_TOKENS = 24000
+
+    # Local Analytics Configuration
+    # Answer common statement questions (large/recurring transactions, totals) from the tables without an LLM
+    ANALYTICS_ENABLED = True
+    # Let the reporting agent phrase the computed result instead of returning the table as is
+    ANALYTICS_PHRASE_WITH_LLM = False
+
+    # Cross-Document Ledger Configuration
+    # Every extracted statement's transactions are appended to one SQLite ledger for questions across documents
+    LEDGER_ENABLED = True
+    LEDGER_PATH = OUTPUT_DIR / "ledger.sqlite3"
+
+    # LLM Rate Limiting (async calls share one limiter per process)
+    LLM_REQUESTS_PER_MINUTE = int(os.getenv("FINSIGHT_LLM_RPM", "500"))
+    LLM_TOKENS_PER_MINUTE = int(os.getenv("FINSIGHT_LLM_TPM", "30000"))
+    LLM_MAX_CONCURRENCY = int(os.getenv("FINSIGHT_LLM_CONCURRENCY", "8"))
+    # Reply tokens reserved per LLM call on top of the estimated prompt
+    LLM_OUTPUT_TOKENS_ESTIMATE = 1000
+    # Backoff on 429 responses: base_delay * 2^attempt seconds, capped at max_delay
+    LLM_MAX_RETRIES = 5
+    LLM_RETRY_BASE_DELAY = 1.0
+    LLM_RETRY_MAX_DELAY = 30.0
+
+    # Batch Configuration
+    # Extraction processes for batch runs (0 = one per CPU) and LLM analyses allowed in flight at once
+    BATCH_WORKERS = int(os.getenv("FINSIGHT_BATCH_WORKERS", "0"))
+    BATCH_LLM_CONCURRENCY = int(os.getenv("FINSIGHT_BATCH_LLM_CONCURRENCY", "4"))
+    BATCH_MANIFEST_PATH = OUTPUT_DIR / "batch_manifest.jsonl"
+
+    # Tracing and Metrics Configuration
+    # Spans for extraction stages, loader calls, crew tasks and LLM calls; each finished trace is appended as JSON lines.
+    # Off unless FINSIGHT_TRACING=1
+    TRACING_ENABLED = os.getenv("FINSIGHT_TRACING", "0") == "1"
+    TRACE_LOG_PATH = OUTPUT_DIR / "traces.jsonl"
+    # The trace log is rotated to traces.jsonl.1, .2, ... once it grows past this size; older logs are deleted
+    TRACE_LOG_MAX_BYTES = 10 * 1024 * 1024
+    TRACE_LOG_BACKUPS = 3
+    # Prometheus text format (e.g. for node_exporter's textfile collector), rewritten at most this often and at exit
+    METRICS_PATH = OUTPUT_DIR / "metrics.prom"
+    METRICS_WRITE_INTERVAL_SECONDS = 30
+    # Also serve the metrics at http://127.0.0.1:<port>/metrics when set
+    METRICS_PORT = int(os.getenv("FINSIGHT_METRICS_PORT", "0")) or None
+    # USD per million (prompt, completion) tokens, for cost figures in traces and metrics
+    LLM_PRICING = {
+        "gpt-4o": (2.50, 10.00),
+        "gpt-4o-mini": (0.15, 0.60),
+    }
+
+    # Memory ceiling for documents kept loaded across all sessions in the process
+    DOCUMENT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+    # Logging and directories are set up by the entry points (main.py, app.py), never on import
+    LOG_FORMAT = '%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+
+    @classmethod
+    def setup_logging(cls, level=logging.INFO):
+        """Configure root logging for a command line or app run"""
+        logging.basicConfig(level=level, format=cls.LOG_FORMAT)
+
     @classmethod
     def setup_directories(cls):
         """Create necessary directories"""
         logger.info("Setting up project directories")
         cls.OUTPUT_DIR.mkdir(exist_ok=True)
         cls.EXTRACTIONS_DIR.mkdir(exist_ok=True)
-        logger.info(f"Directories ensured: {cls.OUTPUT_DIR}, {cls.EXTRACTIONS_DIR}")
-
-# Initialize directories
-logger.info("Initializing configuration")
-Config.setup_directories()
-logger.info("Configuration initialized successfully")
\ No newline at end of file
+        logger.info(f"Directories ensured: {cls.OUTPUT_DIR}, {cls.EXTRACTIONS_DIR}")
\ No newline at end of file
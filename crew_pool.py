@@ -0,0 +1,74 @@
+import logging
+import threading
+
+from agent import DocumentAgents
+from config import Config
+from tasks import DocumentTasks
+
+logger = logging.getLogger(__name__)
+
+# Crew task descriptions are templates; each kickoff fills these placeholders from its inputs
+CREW_KINDS = ("full_analysis", "fast_analysis", "specific_question", "excerpt_question", "digest_question", "phrasing",
+              "chunk_extraction", "merge_extractions", "reduce_analysis")
+
+
+class CrewPool:
+    """Agents and crews built once per LLM and reused across calls.
+
+    Crews are checked out for the length of one kickoff so that two calls never
+    share a crew at the same time; a busy pool simply builds another crew. Each crew
+    owns its agents, since a CrewAI agent keeps the state of the task it is running.
+    """
+
+    def __init__(self, llm=None):
+        self.llm = llm
+        self._idle = {kind: [] for kind in CREW_KINDS}
+        self._lock = threading.Lock()
+        self.stats = {"built": 0, "reused": 0}
+
+    def _build(self, kind):
+        from crewai import Crew
+        tasks = DocumentTasks(agents=DocumentAgents.create_all_agents(self.llm))
+        if kind == "full_analysis":
+            context_task = tasks.create_contextualization_task("{document_content}")
+            extraction_task = tasks.create_data_extraction_task(context_task)
+            crew_tasks = [context_task, extraction_task, tasks.create_reporting_task(extraction_task)]
+        elif kind == "fast_analysis":
+            crew_tasks = [tasks.create_fast_analysis_task("{document_content}")]
+        elif kind == "chunk_extraction":
+            crew_tasks = [tasks.create_chunk_extraction_task("{chunk_content}", "{pages}")]
+        elif kind == "merge_extractions":
+            crew_tasks = [tasks.create_merge_extraction_task("{partial_results}")]
+        elif kind == "reduce_analysis":
+            merge_task = tasks.create_merge_extraction_task("{partial_results}")
+            crew_tasks = [merge_task, tasks.create_reporting_task(merge_task)]
+        elif kind == "specific_question":
+            crew_tasks = [tasks.create_specific_question_task("{question}", "{document_content}")]
+        elif kind == "excerpt_question":
+            crew_tasks = [tasks.create_excerpt_question_task("{question}", "{excerpts}")]
+        elif kind == "digest_question":
+            crew_tasks = [tasks.create_digest_question_task("{question}", "{digest}")]
+        elif kind == "phrasing":
+            crew_tasks = [tasks.create_phrasing_task("{question}", "{computed_result}")]
+        else:
+            raise ValueError(f"Unknown crew kind: {kind}")
+        agents = []
+        for task in crew_tasks:
+            if task.agent not in agents:
+                agents.append(task.agent)
+        return Crew(agents=agents, tasks=crew_tasks, verbose=Config.AGENT_VERBOSE)
+
+    def checkout(self, kind):
+        """Take an idle crew of this kind, building one if none is free"""
+        with self._lock:
+            if self._idle[kind]:
+                self.stats["reused"] += 1
+                return self._idle[kind].pop()
+            self.stats["built"] += 1
+        logger.info(f"Building '{kind}' crew for the pool")
+        return self._build(kind)
+
+    def checkin(self, kind, crew):
+        """Return a crew after its kickoff has finished"""
+        with self._lock:
+            self._idle[kind].append(crew)
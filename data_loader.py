@@ -1,39 +1,268 @@
-import pandas as pd
+import csv
 import logging
+import sys
+import threading
+from collections import OrderedDict
 from pathlib import Path
 import json
+from config import Config
+from extraction_cache import MANIFEST_NAME, read_manifest
+from ledger_parser import LEDGER_DIR_NAME, LEDGER_STORE_NAME, read_ledger
+from text_store import PackedTextReader, PACKED_INDEX_NAME, read_image_refs, read_markers
+from table_store import LazyTableMapping, TableStore, TABLE_INDEX_NAME
+from telemetry import tracer
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+
+class DocumentCache:
+    """Process-wide LRU cache of loaded documents, bounded by their estimated size in bytes"""
+    
+    def __init__(self, max_bytes=None):
+        self.max_bytes = max_bytes or Config.DOCUMENT_CACHE_MAX_BYTES
+        self.current_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+    
+    def get_or_load(self, key, fingerprint, load, measure):
+        """Return the cached value for key, reloading it when the fingerprint no longer matches"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == fingerprint:
+                    self._entries.move_to_end(key)
+                    self.stats['hits'] += 1
+                    tracer.count("cache_requests", cache="document", result="hit")
+                    return entry[1]
+                self._drop(key)
+                self.stats['invalidations'] += 1
+                logger.info(f"Document cache entry changed on disk, reloading: {key}")
+            self.stats['misses'] += 1
+        tracer.count("cache_requests", cache="document", result="miss")
+        
+        # Load outside the lock so one slow document does not block sessions working on others
+        with tracer.span(f"loader.{key[1]}") as span:
+            value = load()
+            size = measure(value)
+            span.set(bytes=size)
+        if size > self.max_bytes:
+            logger.warning(f"Document {key} ({size} bytes) exceeds the cache limit and will not be cached")
+            return value
+        
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = (fingerprint, value, size)
+            self.current_bytes += size
+            while self.current_bytes > self.max_bytes:
+                evicted_key = next(iter(self._entries))
+                self._drop(evicted_key)
+                self.stats['evictions'] += 1
+                logger.info(f"Evicted least recently used document from cache: {evicted_key}")
+        return value
+    
+    def _drop(self, key):
+        _, _, size = self._entries.pop(key)
+        self.current_bytes -= size
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.current_bytes = 0
+
+
+def _text_size(text_data):
+    return sum(sys.getsizeof(name) + sys.getsizeof(text) for name, text in text_data.items())
+
+
+def _table_size_one(table):
+    return int(table['dataframe'].memory_usage(deep=True).sum()) + sys.getsizeof(str(table['summary']))
+
+
+def _table_size(table_data):
+    return sum(sys.getsizeof(name) + _table_size_one(table) for name, table in table_data.items())
+
+
+# Shared by every FinancialDataLoader in the process, including all Streamlit sessions
+document_cache = DocumentCache()
+
 class FinancialDataLoader:
     """Handles loading and preprocessing of extracted PDF data"""
     
     def __init__(self, extraction_path):
         logger.info(f"Initializing FinancialDataLoader with path: {extraction_path}")
         self.base_path = Path(extraction_path)
-        self.loaded_data = {}
+        self._text_reader = None
+        self._table_store = None
+        # Fingerprint of the files the text reader and table store were opened on
+        self._readers_fingerprint = None
         logger.info("FinancialDataLoader initialized successfully")
     
+    @property
+    def loaded_data(self):
+        """All extracted data, served from the shared document cache instead of being held per instance.
+        Every access checks the extraction on disk once; bind it to a local name rather than reading it in a loop."""
+        return self.load_all_data()
+    
     def load_all_data(self):
         """Load all extracted data"""
         logger.info("Loading all extracted data")
-        self.loaded_data = {
-            'text': self.load_text_data(),
-            'tables': self.load_table_data(),
-            'metadata': self.get_metadata()
+        fingerprint = self._resolve()
+        loaded_data = {
+            'text': self._load_text_data(fingerprint),
+            'tables': self._load_table_data(fingerprint),
+            'metadata': self._metadata()
         }
-        logger.info(f"Successfully loaded {len(self.loaded_data['text'])} text files and {len(self.loaded_data['tables'])} table files")
-        return self.loaded_data
+        logger.info(f"Successfully loaded {len(loaded_data['text'])} text files and {len(loaded_data['tables'])} table files")
+        return loaded_data
+    
+    def fingerprint(self):
+        """Identify the current on-disk state of the extraction: content hash plus file identities and modification times"""
+        manifest = read_manifest(self.base_path) or {}
+        stamps = []
+        for path in (self.base_path / MANIFEST_NAME, self.base_path / "text" / PACKED_INDEX_NAME,
+                     self.base_path / "tables" / TABLE_INDEX_NAME, self.base_path / "text", self.base_path / "tables",
+                     self.base_path / LEDGER_DIR_NAME / LEDGER_STORE_NAME):
+            try:
+                stat = path.stat()
+                # The inode changes when a re-extraction replaces a file, even with an identical mtime
+                stamps.append((stat.st_ino, stat.st_mtime_ns))
+            except OSError:
+                stamps.append(None)
+        return (manifest.get("content_hash"), manifest.get("cache_key"), tuple(stamps))
+    
+    def _resolve(self):
+        """Fingerprint the extraction once for a call, dropping the text reader and table store when it changed
+        (e.g. after a re-extraction), so they are reopened on the current files"""
+        fingerprint = self.fingerprint()
+        if fingerprint != self._readers_fingerprint:
+            # Not closed: a caller may still be iterating the old reader, which keeps its own file open
+            self._text_reader = None
+            self._table_store = None
+            self._readers_fingerprint = fingerprint
+        return fingerprint
+    
+    def get_text_reader(self):
+        """Return a memory-mapped reader for a packed text store, or None for the legacy layout"""
+        self._resolve()
+        return self._open_text_reader()
+    
+    def _open_text_reader(self):
+        if self._text_reader is None:
+            text_dir = self.base_path / "text"
+            if PackedTextReader.exists(text_dir):
+                logger.info(f"Opening packed text store: {text_dir}")
+                self._text_reader = PackedTextReader(text_dir)
+        return self._text_reader
+    
+    def text_bytes(self):
+        """Size of every page text in both layouts plus the metadata, taken from the text index or file sizes
+        without reading the texts"""
+        reader = self.get_text_reader()
+        if reader is not None:
+            return reader.index["data_bytes"] + len(reader.metadata_text().encode("utf-8"))
+        text_dir = self.base_path / "text"
+        if not text_dir.exists():
+            return 0
+        return sum(text_file.stat().st_size for text_file in text_dir.glob("*.txt"))
+    
+    def get_page_text(self, page_number, layout="text"):
+        """Load the text of a single page"""
+        return self._page_text(self.get_text_reader(), page_number, layout)
+    
+    def _page_text(self, reader, page_number, layout):
+        if reader is not None:
+            return reader.page_text(page_number, layout)
+        suffix = "text_sorted" if layout == "sorted" else "text"
+        text_file = self.base_path / "text" / f"page_{page_number}_{suffix}.txt"
+        if text_file.exists():
+            with open(text_file, 'r', encoding='utf-8') as f:
+                return f.read()
+        return ""
+    
+    def iter_page_texts(self, layout="text"):
+        """Yield (page_number, text) pairs in page order for either storage layout"""
+        reader = self.get_text_reader()
+        if reader is not None:
+            yield from reader.iter_pages(layout)
+            return
+        text_dir = self.base_path / "text"
+        if not text_dir.exists():
+            return
+        suffix = "_text_sorted.txt" if layout == "sorted" else "_text.txt"
+        page_numbers = []
+        for text_file in text_dir.glob(f"page_*{suffix}"):
+            number = text_file.name[len("page_"):-len(suffix)]
+            if number.isdigit():
+                page_numbers.append(int(number))
+        for page_number in sorted(page_numbers):
+            yield page_number, self._page_text(None, page_number, layout)
+    
+    def iter_pages(self):
+        """Stream the extraction page by page, in the shape PDFExtractor.stream_pdf_content yields.
+        Nothing is cached or kept between pages, so memory stays flat however long the document is."""
+        reader = self.get_text_reader()
+        page_tables = self._page_table_files()
+        if reader is not None:
+            for page_number in reader.page_numbers:
+                yield {
+                    'page': page_number,
+                    'text': reader.read_page_text(page_number, "text"),
+                    'text_sorted': reader.read_page_text(page_number, "sorted"),
+                    'tables': [self._read_table_rows(name) for name in page_tables.get(page_number, [])],
+                    'images': reader.images(page_number),
+                    'markers': reader.markers(page_number),
+                }
+            return
+        image_refs = read_image_refs(self.base_path)
+        for page_number, text in self.iter_page_texts():
+            yield {
+                'page': page_number,
+                'text': text,
+                'text_sorted': self._page_text(None, page_number, "sorted"),
+                'tables': [self._read_table_rows(name) for name in page_tables.get(page_number, [])],
+                'images': image_refs.get(page_number, []),
+                'markers': read_markers(self.base_path, page_number),
+            }
+    
+    def _page_table_files(self):
+        """Page CSV names grouped by page number, listed once for the whole document"""
+        tables_dir = self.base_path / "tables"
+        if not tables_dir.exists():
+            return {}
+        pages = {}
+        for csv_file in tables_dir.glob("page_*_table_*.csv"):
+            page, _, number = csv_file.stem[len("page_"):].partition("_table_")
+            if page.isdigit() and number.isdigit():
+                pages.setdefault(int(page), []).append((int(number), csv_file.name))
+        return {page: [name for _, name in sorted(files)] for page, files in pages.items()}
+    
+    def _read_table_rows(self, name):
+        with open(self.base_path / "tables" / name, 'r', newline='', encoding='utf-8') as f:
+            return {'name': name, 'rows': list(csv.reader(f))}
     
     def load_text_data(self):
-        """Load all extracted text data"""
+        """Load all extracted text data through the shared document cache"""
+        return self._load_text_data(self._resolve())
+    
+    def _load_text_data(self, fingerprint):
+        key = (str(self.base_path.resolve()), 'text')
+        return document_cache.get_or_load(key, fingerprint, self._read_text_data, _text_size)
+    
+    def _read_text_data(self):
         logger.info("Loading text data from extracted files")
         text_data = {}
         text_dir = self.base_path / "text"
         
-        if text_dir.exists():
+        reader = self._open_text_reader()
+        if reader is not None:
+            # Keep the legacy file names as keys so callers see the same shape for both layouts
+            for page_number in reader.page_numbers:
+                text_data[f"page_{page_number}_text.txt"] = reader.page_text(page_number, "text")
+                text_data[f"page_{page_number}_text_sorted.txt"] = reader.page_text(page_number, "sorted")
+            text_data["metadata.txt"] = reader.metadata_text()
+        elif text_dir.exists():
             logger.info(f"Found text directory: {text_dir}")
             for text_file in text_dir.glob("*.txt"):
                 try:
@@ -49,8 +278,73 @@ class FinancialDataLoader:
         logger.info(f"Loaded {len(text_data)} text files")
         return text_data
     
+    def get_table_store(self):
+        """Return the typed table store reader, or None for extractions that only have CSVs"""
+        self._resolve()
+        return self._open_table_store()
+    
+    def _open_table_store(self):
+        if self._table_store is None:
+            tables_dir = self.base_path / "tables"
+            if TableStore.exists(tables_dir):
+                self._table_store = TableStore(tables_dir)
+        return self._table_store
+    
+    def load_table(self, name):
+        """Load a single table from the typed table store"""
+        key = (str(self.base_path.resolve()), 'table', name)
+        return document_cache.get_or_load(key, self._resolve(), lambda: self._read_stored_table(name), _table_size_one)
+    
+    def _read_stored_table(self, name):
+        logger.info(f"Loading table {name} from table store")
+        store = self._open_table_store()
+        df = store.read_table(name)
+        entry = store.tables[name]
+        return {
+            'dataframe': df,
+            'summary': {
+                'rows': len(df),
+                'columns': list(df.columns),
+                'pages': entry['pages'],
+                'sample': df.head().to_dict()
+            }
+        }
+    
+    def load_transactions(self):
+        """Every statement row as one typed date/description/amount frame: the statement tables of the table store
+        plus the ledger parsed from the word layout of pages without tables"""
+        fingerprint = self._resolve()
+        if self._open_table_store() is None and not (self.base_path / LEDGER_DIR_NAME / LEDGER_STORE_NAME).exists():
+            return None
+        key = (str(self.base_path.resolve()), 'transactions')
+        return document_cache.get_or_load(key, fingerprint, self._read_transactions,
+                                          lambda df: int(df.memory_usage(deep=True).sum()))
+    
+    def _read_transactions(self):
+        store = self._open_table_store()
+        parts = [store.read_transactions()] if store is not None else []
+        ledger = read_ledger(self.base_path)
+        if ledger is not None:
+            parts.append(ledger)
+        if len(parts) == 1:
+            return parts[0]
+        import pandas as pd
+        # Ledger pages are exactly the pages without tables, so the two never overlap
+        return pd.concat(parts, ignore_index=True).sort_values("page", kind="stable").reset_index(drop=True)
+    
     def load_table_data(self):
-        """Load all CSV table data"""
+        """Load table data: lazily from the typed table store, or through the shared cache from legacy CSVs"""
+        return self._load_table_data(self._resolve())
+    
+    def _load_table_data(self, fingerprint):
+        store = self._open_table_store()
+        if store is not None:
+            return LazyTableMapping(store, self.load_table)
+        key = (str(self.base_path.resolve()), 'tables')
+        return document_cache.get_or_load(key, fingerprint, self._read_table_data, _table_size)
+    
+    def _read_table_data(self):
+        import pandas as pd
         logger.info("Loading table data from CSV files")
         table_data = {}
         tables_dir = self.base_path / "tables"
@@ -78,9 +372,20 @@ class FinancialDataLoader:
         logger.info(f"Loaded {len(table_data)} table files")
         return table_data
     
+    def get_page_images(self, page_number):
+        """Image references for one page; files are shared between pages that show the same image"""
+        return read_image_refs(self.base_path).get(page_number, [])
+    
     def get_metadata(self):
         """Extract document metadata"""
+        self._resolve()
+        return self._metadata()
+    
+    def _metadata(self):
         logger.info("Loading document metadata")
+        reader = self._open_text_reader()
+        if reader is not None:
+            return reader.metadata_text()
         metadata_file = self.base_path / "text" / "metadata.txt"
         if metadata_file.exists():
             logger.info(f"Found metadata file: {metadata_file}")
@@ -95,15 +400,13 @@ class FinancialDataLoader:
     def get_data_summary(self):
         """Get summary of loaded data"""
         logger.info("Generating data summary")
-        if not self.loaded_data:
-            logger.info("No data loaded yet, loading all data first")
-            self.load_all_data()
+        loaded_data = self.load_all_data()
         
         summary = {
-            'text_files': len(self.loaded_data['text']),
-            'table_files': len(self.loaded_data['tables']),
-            'text_samples': list(self.loaded_data['text'].keys())[:3],
-            'table_samples': list(self.loaded_data['tables'].keys())[:3]
+            'text_files': len(loaded_data['text']),
+            'table_files': len(loaded_data['tables']),
+            'text_samples': list(loaded_data['text'].keys())[:3],
+            'table_samples': list(loaded_data['tables'].keys())[:3]
         }
         
         logger.info(f"Data summary: {summary['text_files']} text files, {summary['table_files']} table files")
@@ -0,0 +1,175 @@
+import logging
+import math
+import re
+from collections import Counter
+from dataclasses import dataclass
+
+from config import Config
+from token_utils import CHARS_PER_TOKEN, estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DIGITS = re.compile(r"\d+")
+WHITESPACE = re.compile(r"\s+")
+
+
+@dataclass
+class DocumentChunk:
+    """A run of whole pages sized for one map step of a map-reduce analysis"""
+    text: str
+    first_page: int
+    last_page: int
+    tokens: int
+
+    @property
+    def pages(self):
+        if self.first_page == self.last_page:
+            return f"page {self.first_page}"
+        return f"pages {self.first_page}-{self.last_page}"
+
+
+@dataclass
+class AssembledDocument:
+    """Prompt-ready document text plus the accounting of what assembly removed"""
+    text: str
+    page_count: int
+    pages_included: int
+    original_tokens: int
+    tokens: int
+    repeated_lines_removed: int
+
+    @property
+    def saved_tokens(self):
+        return max(0, self.original_tokens - self.tokens)
+
+    @property
+    def truncated(self):
+        return self.pages_included < self.page_count
+
+
+def _normalize_line(line):
+    # Page numbers, dates and statement periods change between pages; the letterhead around them does not
+    return DIGITS.sub("#", WHITESPACE.sub(" ", line.strip().lower()))
+
+
+def _edge_lines(lines, edge_lines):
+    """Indexes of the first and last non-empty lines of a page, where headers and footers live"""
+    non_empty = [index for index, line in enumerate(lines) if line.strip()]
+    return set(non_empty[:edge_lines]) | set(non_empty[-edge_lines:])
+
+
+def find_repeated_lines(pages, edge_lines, repeat_ratio):
+    """Normalized header and footer lines that recur on at least repeat_ratio of the pages"""
+    if len(pages) < 2:
+        return set()
+    counts = Counter()
+    for _, text in pages:
+        lines = text.splitlines()
+        counts.update({_normalize_line(lines[index]) for index in _edge_lines(lines, edge_lines)})
+    threshold = max(2, repeat_ratio * len(pages))
+    return {line for line, count in counts.items() if line and count >= threshold}
+
+
+def assemble_pages(data_loader, layout=None):
+    """Page bodies in page order, with repeated headers and footers kept only on their first page.
+    Returns ([(page_number, body)], number of repeated lines removed); pages left empty are dropped."""
+    layout = layout or Config.ASSEMBLY_LAYOUT
+    pages = list(data_loader.iter_page_texts(layout))
+    repeated = find_repeated_lines(pages, Config.ASSEMBLY_EDGE_LINES, Config.ASSEMBLY_REPEAT_RATIO)
+
+    seen = set()
+    removed = 0
+    bodies = []
+    for page_number, text in pages:
+        lines = text.splitlines()
+        edges = _edge_lines(lines, Config.ASSEMBLY_EDGE_LINES)
+        kept = []
+        for index, line in enumerate(lines):
+            normalized = _normalize_line(line)
+            if index in edges and normalized in repeated:
+                if normalized in seen:
+                    removed += 1
+                    continue
+                seen.add(normalized)
+            kept.append(line.rstrip())
+        body = "\n".join(kept).strip()
+        if body:
+            bodies.append((page_number, body))
+    return bodies, removed
+
+
+def _page_section(page_number, body):
+    return f"--- Page {page_number} ---\n{body}"
+
+
+def assemble_document(data_loader, layout=None, token_budget=None, original_tokens=None):
+    """Build one prompt text from an extraction: one layout per page, in page order,
+    repeated headers and footers kept only on their first page, trimmed to the token budget"""
+    token_budget = token_budget or Config.ASSEMBLY_TOKEN_BUDGET
+    bodies, removed = assemble_pages(data_loader, layout)
+
+    sections = []
+    used_tokens = 0
+    content_pages = 0
+    for page_number, body in bodies:
+        content_pages += 1
+        if len(sections) < content_pages - 1:
+            # Budget already exhausted; keep counting the pages that are left out
+            continue
+        section = _page_section(page_number, body)
+        section_tokens = estimate_tokens(section)
+        if sections and used_tokens + section_tokens > token_budget:
+            continue
+        sections.append(section)
+        used_tokens += section_tokens
+
+    pages_included = len(sections)
+    omitted = content_pages - pages_included
+    if omitted:
+        sections.append(f"[... {omitted} further pages omitted to fit the token budget ...]")
+    text = "\n\n".join(sections)
+
+    if original_tokens is None:
+        # Only used to report the savings, so sized from the text index instead of reading every page again
+        original_tokens = math.ceil(data_loader.text_bytes() / CHARS_PER_TOKEN)
+    document = AssembledDocument(
+        text=text,
+        page_count=content_pages,
+        pages_included=pages_included,
+        original_tokens=original_tokens,
+        tokens=estimate_tokens(text),
+        repeated_lines_removed=removed,
+    )
+    logger.info(
+        f"Assembled {document.pages_included}/{document.page_count} pages into ~{document.tokens} tokens "
+        f"(saved ~{document.saved_tokens} tokens, removed {removed} repeated header/footer lines)"
+    )
+    return document
+
+
+def chunk_document(data_loader, chunk_tokens=None, layout=None):
+    """Split the whole assembled document into page-aligned chunks of at most chunk_tokens each
+    (a single page longer than that becomes a chunk of its own); nothing is trimmed"""
+    chunk_tokens = chunk_tokens or Config.MAP_REDUCE_CHUNK_TOKENS
+    bodies, _ = assemble_pages(data_loader, layout)
+    chunks = []
+    sections = []
+    used_tokens = 0
+    first_page = None
+    for page_number, body in bodies:
+        section = _page_section(page_number, body)
+        section_tokens = estimate_tokens(section)
+        if sections and used_tokens + section_tokens > chunk_tokens:
+            text = "\n\n".join(sections)
+            chunks.append(DocumentChunk(text, first_page, last_page, estimate_tokens(text)))
+            sections, used_tokens = [], 0
+        if not sections:
+            first_page = page_number
+        sections.append(section)
+        used_tokens += section_tokens
+        last_page = page_number
+    if sections:
+        text = "\n\n".join(sections)
+        chunks.append(DocumentChunk(text, first_page, last_page, estimate_tokens(text)))
+    logger.info(f"Split {len(bodies)} pages into {len(chunks)} chunks of up to ~{chunk_tokens} tokens")
+    return chunks
@@ -0,0 +1,67 @@
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+
+from token_utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+DIGEST_NAME = "digest.json"
+# Bump when the digest layout or the tasks it is taken from change, so older digests are not used
+DIGEST_VERSION = 1
+# The whole reply to a digest question when the digest does not hold the answer
+INSUFFICIENT_ANSWER = "NOT IN DIGEST"
+
+
+def write_digest(extraction_path, document_hash, mode, context=None, extraction=None):
+    """Atomically store an analysis' context and extraction results with the extraction they describe"""
+    digest = {
+        "version": DIGEST_VERSION,
+        "document_hash": document_hash,
+        "mode": mode,
+        "context": context or "",
+        "extraction": extraction or "",
+        "created_at": time.time(),
+    }
+    digest["digest_hash"] = hashlib.sha256(f"{digest['context']}\x1f{digest['extraction']}".encode("utf-8")).hexdigest()
+    digest["tokens"] = estimate_tokens(format_digest(digest))
+    digest_file = Path(extraction_path) / DIGEST_NAME
+    tmp_file = digest_file.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(digest, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, digest_file)
+    logger.info(f"Saved a {digest['tokens']}-token digest of {Path(extraction_path).name} from the {mode} analysis")
+    return digest
+
+
+def read_digest(extraction_path, document_hash):
+    """The digest of an extraction, or None when there is none or it was made for another document or version"""
+    digest_file = Path(extraction_path) / DIGEST_NAME
+    try:
+        with open(digest_file, "r", encoding="utf-8") as f:
+            digest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if digest.get("version") != DIGEST_VERSION or digest.get("document_hash") != document_hash:
+        return None
+    if not (digest.get("context") or digest.get("extraction")):
+        return None
+    return digest
+
+
+def format_digest(digest):
+    """Prompt-ready digest text"""
+    sections = []
+    if digest.get("context"):
+        sections.append(f"Document Context:\n{digest['context'].strip()}")
+    if digest.get("extraction"):
+        sections.append(f"Extracted Data:\n{digest['extraction'].strip()}")
+    return "\n\n".join(sections)
+
+
+def answered_from_digest(answer):
+    """False when the model said the digest does not hold the answer"""
+    return INSUFFICIENT_ANSWER not in str(answer).upper()
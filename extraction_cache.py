@@ -0,0 +1,151 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+import uuid
+from pathlib import Path
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "manifest.json"
+EXTRACTION_STAGES = ("text", "tables", "images", "metadata")
+
+
+def hash_file(pdf_path, chunk_size=1024 * 1024):
+    """Return the SHA-256 hex digest of a file's content"""
+    digest = hashlib.sha256()
+    with open(pdf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def hash_bytes(data):
+    """Return the SHA-256 hex digest of in-memory content, matching hash_file for the same bytes"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def read_manifest(extraction_path):
+    """Read the manifest of an extraction directory, or None if it is missing or unreadable"""
+    manifest_file = Path(extraction_path) / MANIFEST_NAME
+    try:
+        with open(manifest_file, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_manifest(extraction_path, manifest):
+    """Atomically write the manifest of an extraction directory"""
+    manifest_file = Path(extraction_path) / MANIFEST_NAME
+    tmp_file = manifest_file.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(tmp_file, manifest_file)
+
+
+def is_complete(manifest):
+    """A manifest is only valid when every extraction stage has finished"""
+    if not manifest or not manifest.get("complete"):
+        return False
+    stages = manifest.get("stages", {})
+    return all(stages.get(stage) for stage in EXTRACTION_STAGES)
+
+
+class ExtractionCache:
+    """Content-addressed cache of PDF extractions keyed by file hash and extractor settings"""
+
+    def __init__(self, root=None):
+        self.root = Path(root) if root else Config.EXTRACTIONS_DIR
+        self.hits = 0
+        self.misses = 0
+        self._catalog = None
+
+    @property
+    def catalog(self):
+        """The ExtractionCatalog indexing this cache's root, opened on first use"""
+        if self._catalog is None:
+            from extraction_catalog import ExtractionCatalog
+            self._catalog = ExtractionCatalog.for_root(self.root)
+        return self._catalog
+
+    @staticmethod
+    def make_key(content_hash, settings):
+        """Combine the content hash with the extractor settings into a cache key"""
+        fingerprint = json.dumps(settings, sort_keys=True)
+        return hashlib.sha256(f"{content_hash}:{fingerprint}".encode("utf-8")).hexdigest()[:16]
+
+    def _candidates(self, key):
+        if not self.root.exists():
+            return []
+        return sorted(self.root.glob(f"*_{key}"))
+
+    def _find_complete(self, key):
+        for candidate in self._candidates(key):
+            if not candidate.is_dir():
+                continue
+            if is_complete(read_manifest(candidate)):
+                return candidate
+            logger.warning(f"Discarding incomplete extraction: {candidate}")
+            shutil.rmtree(candidate, ignore_errors=True)
+            self.catalog.forget(candidate)
+        return None
+
+    def lookup(self, key):
+        """Return the extraction directory for a key if a complete extraction exists"""
+        cached_dir = self._find_complete(key)
+        if cached_dir is not None:
+            self.hits += 1
+            self.catalog.touch(cached_dir)
+            logger.info(f"Extraction cache hit: {cached_dir}")
+        else:
+            self.misses += 1
+            logger.info(f"Extraction cache miss for key {key}")
+        return cached_dir
+
+    def final_dir(self, key, source_name):
+        """Directory a finished extraction for this key is published under"""
+        return self.root / f"{source_name}_{key}"
+
+    def staging_dir(self, key, source_name):
+        """Private directory a new extraction is written to before it is published"""
+        return self.root / f".{source_name}_{key}.partial-{uuid.uuid4().hex[:8]}"
+
+    def publish(self, staging_dir, key, source_name):
+        """Move a finished staging directory into place, keeping an existing complete copy if one won the race"""
+        existing = self._find_complete(key)
+        if existing is not None:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            return existing
+        target = self.final_dir(key, source_name)
+        if target.exists():
+            shutil.rmtree(target, ignore_errors=True)
+        os.replace(staging_dir, target)
+        logger.info(f"Extraction cached at: {target}")
+        self.catalog.record(target)
+        self.catalog.evict(keep=[target])
+        return target
+
+    def record_size(self, extraction_dir):
+        """Re-measure a cached extraction after files were added to it (digest, retrieval index, images),
+        so they count towards the size limit; extractions outside the cache root are left alone"""
+        if Path(extraction_dir).resolve().parent == self.root.resolve():
+            self.catalog.record(extraction_dir)
+
+
+def new_manifest(key, content_hash, source_name, settings, page_count):
+    """Build the initial manifest for an extraction that is about to start"""
+    return {
+        "cache_key": key,
+        "content_hash": content_hash,
+        "source_name": source_name,
+        "settings": settings,
+        "page_count": page_count,
+        "stages": {stage: False for stage in EXTRACTION_STAGES},
+        "complete": False,
+        "created_at": time.time(),
+    }
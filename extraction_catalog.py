@@ -0,0 +1,205 @@
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import uuid
+from pathlib import Path
+
+from config import Config
+from extraction_cache import is_complete, read_manifest
+
+logger = logging.getLogger(__name__)
+
+# Directory name markers of work in progress under the extractions root (see ExtractionCache.staging_dir)
+STAGING_MARKER = ".partial-"
+EVICTING_MARKER = ".evicting-"
+
+
+def directory_size(path):
+    """Total bytes of the files under a directory"""
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+class ExtractionCatalog:
+    """SQLite index of the published extractions under one root, with age, size and LRU eviction.
+
+    Listing the cache reads the index instead of walking the directory tree. Entries used
+    within Config.EXTRACTION_CACHE_MIN_IDLE_SECONDS are never evicted, since a session or
+    another process may still be reading them.
+    """
+
+    _instances = {}
+    _instances_lock = threading.Lock()
+
+    def __init__(self, root=None, max_bytes=None, max_age_seconds=None, min_idle_seconds=None):
+        self.root = Path(root) if root else Config.EXTRACTIONS_DIR
+        self.max_bytes = Config.EXTRACTION_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self.max_age_seconds = Config.EXTRACTION_CACHE_MAX_AGE_SECONDS if max_age_seconds is None else max_age_seconds
+        self.min_idle_seconds = Config.EXTRACTION_CACHE_MIN_IDLE_SECONDS if min_idle_seconds is None else min_idle_seconds
+        self._lock = threading.Lock()
+        # path -> last time this process wrote its accessed_at, to keep reads from turning into writes
+        self._touched = {}
+        self.stats = {"recorded": 0, "evicted": 0, "evicted_bytes": 0, "leftovers_removed": 0}
+        self.root.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.root / Config.EXTRACTION_CATALOG_NAME), timeout=30, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS extractions ("
+            "path TEXT PRIMARY KEY, cache_key TEXT, content_hash TEXT, source_name TEXT, "
+            "size_bytes INTEGER NOT NULL, page_count INTEGER, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS extractions_accessed ON extractions (accessed_at)")
+        self._conn.commit()
+
+    @classmethod
+    def for_root(cls, root=None):
+        """The process-wide catalog of a root; the first use in a process also prunes it"""
+        root = Path(root) if root else Config.EXTRACTIONS_DIR
+        key = str(root.resolve())
+        with cls._instances_lock:
+            catalog = cls._instances.get(key)
+            if catalog is None:
+                catalog = cls._instances[key] = cls(root)
+                try:
+                    catalog.prune()
+                except Exception as e:
+                    logger.error(f"Pruning the extraction cache failed: {e}")
+            return catalog
+
+    def record(self, extraction_dir, manifest=None):
+        """Add or refresh an extraction, measuring its size on disk"""
+        extraction_dir = Path(extraction_dir)
+        manifest = manifest or read_manifest(extraction_dir) or {}
+        now = time.time()
+        size = directory_size(extraction_dir)
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO extractions (path, cache_key, content_hash, source_name, size_bytes, page_count, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT(path) DO UPDATE SET size_bytes = excluded.size_bytes, "
+                "accessed_at = excluded.accessed_at",
+                (extraction_dir.name, manifest.get("cache_key"), manifest.get("content_hash"), manifest.get("source_name"),
+                 size, manifest.get("page_count"), manifest.get("created_at") or now, now),
+            )
+            self._conn.commit()
+            self._touched[extraction_dir.name] = now
+            self.stats["recorded"] += 1
+
+    def touch(self, extraction_dir):
+        """Mark an extraction as used now (at most one write per minute per extraction)"""
+        name = Path(extraction_dir).name
+        now = time.time()
+        with self._lock:
+            if now - self._touched.get(name, 0) < 60:
+                return
+            self._touched[name] = now
+            self._conn.execute("UPDATE extractions SET accessed_at = ? WHERE path = ?", (now, name))
+            self._conn.commit()
+
+    def forget(self, extraction_dir):
+        with self._lock:
+            self._conn.execute("DELETE FROM extractions WHERE path = ?", (Path(extraction_dir).name,))
+            self._conn.commit()
+            self._touched.pop(Path(extraction_dir).name, None)
+
+    def entries(self, limit=None):
+        """Catalogued extractions, most recently used first"""
+        query = ("SELECT path, source_name, content_hash, size_bytes, page_count, created_at, accessed_at "
+                 "FROM extractions ORDER BY accessed_at DESC")
+        with self._lock:
+            rows = self._conn.execute(query + (" LIMIT ?" if limit else ""), (limit,) if limit else ()).fetchall()
+        columns = ("name", "source_name", "content_hash", "size_bytes", "page_count", "created_at", "accessed_at")
+        return [dict(zip(columns, row), path=self.root / row[0]) for row in rows]
+
+    def totals(self):
+        """(number of extractions, total bytes)"""
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM extractions").fetchone()
+
+    def evict(self, keep=()):
+        """Remove idle extractions older than the maximum age, then least recently used ones while over the size limit"""
+        now = time.time()
+        keep = {Path(path).name for path in keep}
+        with self._lock:
+            rows = self._conn.execute("SELECT path, size_bytes, accessed_at FROM extractions ORDER BY accessed_at").fetchall()
+        total = sum(size for _, size, _ in rows)
+        removed = []
+        for name, size, accessed_at in rows:
+            idle = now - accessed_at
+            if name in keep or idle < self.min_idle_seconds:
+                continue
+            if idle > self.max_age_seconds or total > self.max_bytes:
+                self._remove(name)
+                total -= size
+                removed.append((name, size))
+        if removed:
+            self.stats["evicted"] += len(removed)
+            self.stats["evicted_bytes"] += sum(size for _, size in removed)
+            logger.info(f"Evicted {len(removed)} extractions ({sum(size for _, size in removed)} bytes); "
+                        f"{total} bytes remain")
+        return removed
+
+    def _remove(self, name):
+        # Renaming first takes the extraction out of cache lookups at once, and only one process wins the rename
+        target = self.root / name
+        doomed = self.root / f".{name}{EVICTING_MARKER}{uuid.uuid4().hex[:8]}"
+        try:
+            os.replace(target, doomed)
+        except FileNotFoundError:
+            doomed = None
+        except OSError as e:
+            logger.warning(f"Could not evict {target}: {e}")
+            return
+        self.forget(name)
+        if doomed is not None:
+            shutil.rmtree(doomed, ignore_errors=True)
+
+    def sync(self):
+        """Catalog complete extractions missing from the index and drop entries whose directory is gone"""
+        with self._lock:
+            known = {row[0] for row in self._conn.execute("SELECT path FROM extractions")}
+        present = set()
+        for entry in self.root.iterdir():
+            if entry.name.startswith(".") or not entry.is_dir():
+                continue
+            present.add(entry.name)
+            if entry.name not in known:
+                manifest = read_manifest(entry)
+                if is_complete(manifest):
+                    self.record(entry, manifest)
+        for name in known - present:
+            self.forget(name)
+
+    def remove_leftovers(self, max_age_seconds=None):
+        """Delete staging directories of crashed extractions and interrupted evictions once they are old enough"""
+        if max_age_seconds is None:
+            max_age_seconds = Config.EXTRACTION_STAGING_MAX_AGE_SECONDS
+        now = time.time()
+        removed = 0
+        for entry in self.root.iterdir():
+            if not entry.name.startswith(".") or not (STAGING_MARKER in entry.name or EVICTING_MARKER in entry.name):
+                continue
+            try:
+                if now - entry.stat().st_mtime < max_age_seconds:
+                    continue
+            except FileNotFoundError:
+                continue
+            shutil.rmtree(entry, ignore_errors=True)
+            removed += 1
+        if removed:
+            self.stats["leftovers_removed"] += removed
+            logger.info(f"Removed {removed} leftover staging directories from {self.root}")
+        return removed
+
+    def prune(self):
+        """Bring the index up to date, clear leftovers and apply the eviction policy"""
+        self.sync()
+        self.remove_leftovers()
+        return self.evict()
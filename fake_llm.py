@@ -0,0 +1,66 @@
+import time
+
+from crewai.events import LLMCallCompletedEvent, LLMCallStartedEvent, LLMStreamChunkEvent, crewai_event_bus
+from crewai.events.types.llm_events import LLMCallType
+from crewai.llms.base_llm import BaseLLM
+
+
+def _prompt_text(messages):
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(message.get("content", "")) for message in messages)
+
+
+class FakeLLM(BaseLLM):
+    """Deterministic offline stand-in for the OpenAI model, for tests and benchmarks.
+
+    Replies are a pure function of the prompt, so runs are repeatable. Calls emit the same
+    started/completed events as a real LLM, and with stream=True the reply is also emitted
+    as LLMStreamChunkEvent chunks exactly like a streaming LLM.
+    """
+
+    def __init__(self, model="fake-llm", response=None, stream=False, chunk_size=12, delay=0.0, latency=0.0):
+        super().__init__(model=model, temperature=0)
+        self.response = response
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.latency = latency
+        self.calls = []
+
+    def reply_for(self, prompt):
+        if callable(self.response):
+            return self.response(prompt)
+        if self.response is not None:
+            return self.response
+        return f"Deterministic answer for a prompt of {len(prompt)} characters."
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None, from_task=None, from_agent=None):
+        crewai_event_bus.emit(self, event=LLMCallStartedEvent(
+            messages=messages, from_task=from_task, from_agent=from_agent, model=self.model,
+        ))
+        prompt = _prompt_text(messages)
+        self.calls.append(prompt)
+        if self.latency:
+            time.sleep(self.latency)
+        answer = self.reply_for(prompt)
+        # CrewAI's agent parser expects the ReAct-style final answer marker
+        text = answer if "Final Answer:" in answer else f"Thought: I now know the final answer\nFinal Answer: {answer}"
+        if self.stream:
+            for start in range(0, len(text), self.chunk_size):
+                crewai_event_bus.emit(self, event=LLMStreamChunkEvent(
+                    chunk=text[start:start + self.chunk_size], from_task=from_task, from_agent=from_agent,
+                ))
+                if self.delay:
+                    time.sleep(self.delay)
+        crewai_event_bus.emit(self, event=LLMCallCompletedEvent(
+            messages=messages, response=text, call_type=LLMCallType.LLM_CALL,
+            from_task=from_task, from_agent=from_agent, model=self.model,
+        ))
+        return text
+
+    def supports_function_calling(self):
+        return False
+
+    def get_context_window_size(self):
+        return 128000
@@ -0,0 +1,269 @@
+import json
+import logging
+import os
+import re
+from pathlib import Path
+
+from table_detection import COLUMN_GAP
+from table_store import AMOUNT_VALUE, DATE_VALUE, DECIMAL_AMOUNT, ROLE_PATTERNS
+
+# numpy and pandas are imported inside the functions that need them, so importing the extractor does not pay for them
+
+logger = logging.getLogger(__name__)
+
+LEDGER_DIR_NAME = "ledger"
+LEDGER_STORE_NAME = "ledger.parquet"
+LEDGER_PAGE_PATTERN = re.compile(r"page_(\d+)\.json$")
+
+# Words whose vertical centres are closer than this (in points) are on the same line
+LINE_TOLERANCE = 3
+# Header cells and amount columns this close (in points) are taken to line up
+COLUMN_TOLERANCE = 15
+# A page needs this many dated lines with an amount before its lines are treated as a ledger
+MIN_LEDGER_ROWS = 2
+# Continuation lines of a description are at most this many line heights below the line they continue
+CONTINUATION_LINES = 1.6
+
+DATE_PREFIX = re.compile(DATE_VALUE.pattern.rstrip("$") + r"(?=\s|$)", re.I)
+DIRECTION_SUFFIX = re.compile(r"^(?:cr|dr)\.?$", re.I)
+SERIAL_NUMBER = re.compile(r"^\d{1,4}\.?$")
+AMOUNT_COLUMN_ROLES = ("debit", "credit", "balance", "amount")
+# Roles of amount columns on a page without a header, by number of columns
+DEFAULT_ROLES = {1: ["amount"], 2: ["amount", "balance"], 3: ["debit", "credit", "balance"]}
+
+
+def _is_amount(text):
+    # Plain integers are far more often reference numbers, quantities or years than money
+    return bool(AMOUNT_VALUE.match(text)) and bool(DECIMAL_AMOUNT.search(text) or "," in text)
+
+
+def page_lines(words):
+    """Group page.get_text("words") tuples into lines of cells with vectorized NumPy operations.
+
+    Words are sorted by their vertical centre, and a new line starts wherever the next centre is more than
+    LINE_TOLERANCE lower. Within a line, a gap wider than COLUMN_GAP starts a new cell.
+    Returns [(y centre, line height, [(x0, x1, text), ...])] top to bottom, cells left to right.
+    """
+    if not words:
+        return []
+    import numpy as np
+    boxes = np.array([word[:4] for word in words], dtype=float)
+    texts = np.array([word[4] for word in words], dtype=object)
+    centers = (boxes[:, 1] + boxes[:, 3]) / 2
+    order = np.argsort(centers, kind="stable")
+    line_ids = np.empty(len(words), dtype=np.int64)
+    line_ids[order] = np.concatenate(([0], np.cumsum(np.diff(centers[order]) > LINE_TOLERANCE)))
+
+    order = np.lexsort((boxes[:, 0], line_ids))
+    boxes, texts, line_ids, centers = boxes[order], texts[order], line_ids[order], centers[order]
+    new_line = np.concatenate(([True], line_ids[1:] != line_ids[:-1]))
+    gaps = np.concatenate(([np.inf], boxes[1:, 0] - boxes[:-1, 2]))
+    cell_starts = np.flatnonzero(new_line | (gaps > COLUMN_GAP))
+    cell_ends = np.append(cell_starts[1:], len(texts))
+    cell_x0 = boxes[cell_starts, 0]
+    cell_x1 = np.maximum.reduceat(boxes[:, 2], cell_starts)
+    cell_lines = line_ids[cell_starts]
+
+    line_starts = np.flatnonzero(new_line)
+    line_centers = np.add.reduceat(centers, line_starts) / np.diff(np.append(line_starts, len(centers)))
+    line_heights = np.maximum.reduceat(boxes[:, 3] - boxes[:, 1], line_starts)
+    lines = {line: (float(line_centers[index]), float(line_heights[index]), [])
+             for index, line in enumerate(line_ids[line_starts])}
+    for start, end, x0, x1, line in zip(cell_starts, cell_ends, cell_x0, cell_x1, cell_lines):
+        lines[line][2].append((float(x0), float(x1), " ".join(texts[start:end])))
+    return list(lines.values())
+
+
+def _split_date(cells):
+    """(date text, remaining cells) when the line starts with a date, optionally after a serial number"""
+    if len(cells) > 1 and SERIAL_NUMBER.match(cells[0][2]):
+        cells = cells[1:]
+    x0, x1, text = cells[0]
+    if DATE_VALUE.match(text):
+        return text, cells[1:]
+    match = DATE_PREFIX.match(text)
+    if match:
+        # The date ran into the description: keep the rest of the cell as text
+        return match.group(0), [(x0, x1, text[match.end():].strip())] + cells[1:]
+    return None, cells
+
+
+def _ledger_row(y, cells):
+    date, rest = _split_date(cells)
+    if date is None:
+        return None
+    description = []
+    amounts = []
+    for x0, x1, text in rest:
+        if _is_amount(text):
+            amounts.append([x0, x1, text])
+        elif amounts and DIRECTION_SUFFIX.match(text):
+            amounts[-1][2] += f" {text}"
+        elif not amounts:
+            description.append(text)
+    if not amounts:
+        return None
+    return {"y": y, "date": date, "description": " ".join(description), "amounts": amounts}
+
+
+def _header_cells(lines, before_y):
+    """Cells of the last line above before_y that names at least two columns, e.g. Date / Debit / Balance"""
+    header = None
+    for y, _, cells in lines:
+        if y >= before_y:
+            break
+        named = sum(1 for _, _, text in cells if any(pattern.search(text) for pattern in ROLE_PATTERNS.values()))
+        if named >= 2:
+            header = cells
+    return header
+
+
+def parse_page_words(words):
+    """Candidate ledger lines of one page: {"rows": [...], "header": cells or None}, or None when the page
+    has fewer than MIN_LEDGER_ROWS dated lines with an amount. Column roles are assigned per document
+    (see assign_roles), since continuation pages usually repeat no header."""
+    lines = page_lines(words)
+    rows = []
+    previous = None
+    for y, height, cells in lines:
+        row = _ledger_row(y, cells)
+        if row is not None:
+            rows.append(row)
+            previous = (row, y, height)
+            continue
+        if previous is None:
+            continue
+        # A wrapped description: text only, directly below a ledger line and left of its amounts
+        row, previous_y, previous_height = previous
+        first_amount_x0 = min(x0 for x0, _, _ in row["amounts"])
+        if (y - previous_y <= CONTINUATION_LINES * max(height, previous_height)
+                and not any(_is_amount(text) for _, _, text in cells)
+                and all(x1 <= first_amount_x0 for _, x1, _ in cells)):
+            row["description"] = f"{row['description']} {' '.join(text for _, _, text in cells)}".strip()
+            previous = (row, y, height)
+        else:
+            previous = None
+    if len(rows) < MIN_LEDGER_ROWS:
+        return None
+    header = _header_cells(lines, rows[0]["y"])
+    return {"rows": rows, "header": [list(cell) for cell in header] if header else None}
+
+
+def amount_columns(spans):
+    """Cluster amount cells into columns by their horizontal extent, whether the column is left or right aligned:
+    sorted by left edge, a new column starts where a cell begins right of every cell before it.
+    Returns the columns as an (n, 2) array of [left, right], left to right."""
+    import numpy as np
+    spans = np.asarray(spans, dtype=float).reshape(-1, 2)
+    if not len(spans):
+        return spans
+    spans = spans[np.argsort(spans[:, 0], kind="stable")]
+    reach = np.maximum.accumulate(spans[:, 1])
+    starts = np.flatnonzero(np.concatenate(([True], spans[1:, 0] > reach[:-1])))
+    return np.column_stack((spans[starts, 0], np.maximum.reduceat(spans[:, 1], starts)))
+
+
+def _nearest_column(columns, x0, x1):
+    """Index of the column that overlaps [x0, x1] most"""
+    import numpy as np
+    return int(np.argmax(np.minimum(columns[:, 1], x1) - np.maximum(columns[:, 0], x0)))
+
+
+def _header_roles(header, columns):
+    """Role of each amount column from the header cell closest to it, None where no header cell names one"""
+    named = []
+    for x0, x1, text in header:
+        for role in AMOUNT_COLUMN_ROLES:
+            if ROLE_PATTERNS[role].search(text):
+                named.append((x0, x1, role))
+                break
+    roles = []
+    for left, right in columns:
+        # Headers sit over their column but are often wider or narrower than the amounts below them
+        near = [(max(left, x0) - min(right, x1), role) for x0, x1, role in named
+                if x0 - COLUMN_TOLERANCE <= right and left <= x1 + COLUMN_TOLERANCE]
+        roles.append(min(near)[1] if near else None)
+    return roles
+
+
+def assign_roles(pages):
+    """Turn the candidate lines of each page, in page order, into ledger rows with debit/credit/amount/balance
+    text. A page without a header is read with the last header seen, as statements print it on the first page only."""
+    header = None
+    ledger = []
+    for page_number, page in pages:
+        columns = amount_columns([(x0, x1) for row in page["rows"] for x0, x1, _ in row["amounts"]])
+        header = page.get("header") or header
+        roles = _header_roles(header, columns) if header else [None]
+        if None in roles:
+            roles = DEFAULT_ROLES.get(len(columns)) or ["amount"] * (len(columns) - 1) + ["balance"]
+        for row in page["rows"]:
+            values = {"page": page_number, "date": row["date"], "description": row["description"]}
+            for x0, x1, text in row["amounts"]:
+                values.setdefault(roles[_nearest_column(columns, x0, x1)], text)
+            ledger.append(values)
+    return ledger
+
+
+def ledger_frame(rows):
+    """Typed ledger in the shape of TableStore.read_transactions: date, description, signed amount, balance, page.
+    table_id is 0 for every row, since these come from the page layout rather than a detected table."""
+    import pandas as pd
+    from table_store import parse_amounts, parse_dates
+    raw = pd.DataFrame(rows, columns=["page", "date", "description", "debit", "credit", "amount", "balance"])
+    if raw.empty:
+        amount = pd.Series(dtype=float)
+    elif raw["debit"].notna().any() or raw["credit"].notna().any():
+        debit = parse_amounts(raw["debit"])[0].abs().fillna(0)
+        credit = parse_amounts(raw["credit"])[0].abs().fillna(0)
+        amount = (credit - debit).where(raw["debit"].notna() | raw["credit"].notna(), parse_amounts(raw["amount"])[0])
+    else:
+        amount, direction = parse_amounts(raw["amount"])
+        amount = amount.mask(direction == "debit", -amount.abs()).mask(direction == "credit", amount.abs())
+    ledger = pd.DataFrame({
+        "date": parse_dates(raw["date"]),
+        "description": raw["description"].fillna("").astype(str),
+        "amount": amount.astype(float),
+        "balance": parse_amounts(raw["balance"])[0].astype(float),
+        "page": raw["page"].astype("int32"),
+        "table_id": pd.Series(0, index=raw.index, dtype="int32"),
+    })
+    return ledger.dropna(subset=["date", "amount"]).reset_index(drop=True)
+
+
+def write_page_ledger(ledger_dir, page_number, page):
+    ledger_dir.mkdir(parents=True, exist_ok=True)
+    with open(ledger_dir / f"page_{page_number}.json", "w", encoding="utf-8") as f:
+        json.dump(page, f)
+
+
+def build_ledger(output_dir):
+    """Merge the per-page candidate lines written during extraction into one typed Parquet ledger;
+    returns the number of transactions, or None when no page looked like a ledger"""
+    ledger_dir = Path(output_dir) / LEDGER_DIR_NAME
+    if not ledger_dir.exists():
+        return None
+    pages = []
+    for page_file in ledger_dir.glob("page_*.json"):
+        match = LEDGER_PAGE_PATTERN.search(page_file.name)
+        if match:
+            with open(page_file, "r", encoding="utf-8") as f:
+                pages.append((int(match.group(1)), json.load(f)))
+    if not pages:
+        return None
+    ledger = ledger_frame(assign_roles(sorted(pages, key=lambda page: page[0])))
+    store_file = ledger_dir / LEDGER_STORE_NAME
+    tmp_file = store_file.with_suffix(f".{os.getpid()}.tmp")
+    ledger.to_parquet(tmp_file, index=False)
+    os.replace(tmp_file, store_file)
+    logger.info(f"Parsed {len(ledger)} ledger transactions from the layout of {len(pages)} pages")
+    return len(ledger)
+
+
+def read_ledger(output_dir):
+    """The typed ledger of an extraction, or None when it has none"""
+    store_file = Path(output_dir) / LEDGER_DIR_NAME / LEDGER_STORE_NAME
+    if not store_file.exists():
+        return None
+    import pandas as pd
+    return pd.read_parquet(store_file)
@@ -0,0 +1,302 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from config import Config
+from extraction_cache import read_manifest
+
+# pandas and the analytics helpers are imported inside the methods that need them, so checking whether
+# a document is already in the ledger does not pay for them
+
+logger = logging.getLogger(__name__)
+
+# Account or card number printed on a statement; masked digits (X or *) are common
+ACCOUNT_PATTERN = re.compile(
+    r"\b(?:account|a/c|card)\s*(?:no\.?|number|num|#)?\s*[:.-]?\s*([0-9xX*][0-9xX* -]{4,}[0-9])", re.I
+)
+MERCHANT_PHRASE = re.compile(
+    r"\b(?:at|on|to|from|with|for)\s+([a-z0-9&.' ]+?)"
+    r"(?=\s+(?:over|in|during|since|for|the|last|past|this|between|by|per|each|across)\b|\s*[?.!,]|\s*$)", re.I
+)
+LAST_PERIOD = re.compile(r"\b(?:last|past|previous|over(?: the)?(?: last| past)?)\s+(\d+|a|one|twelve|six|three)\s+(month|year)s?\b", re.I)
+YEAR_PATTERN = re.compile(r"\b(?:in|during|for)\s+((?:19|20)\d{2})\b", re.I)
+GROUP_WORDS = [
+    ("account", re.compile(r"\b(?:by|per|each)\s+(?:account|card)s?\b", re.I)),
+    ("document", re.compile(r"\b(?:by|per|each)\s+(?:statement|document|file)s?\b", re.I)),
+]
+NUMBER_WORDS = {"a": 1, "one": 1, "three": 3, "six": 6, "twelve": 12}
+# Words caught by MERCHANT_PHRASE that never name a merchant
+NOT_MERCHANTS = {"the", "me", "my", "it", "them", "all", "each", "every", "what", "which", "whom", "that", "this",
+                 "month", "months", "year", "years", "average", "total", "transactions", "statements"}
+GROUP_COLUMNS = {"merchant": "merchant", "category": "category", "month": "substr(date, 1, 7)",
+                 "account": "account", "document": "source_name"}
+
+
+def mask_account(number):
+    """Keep the last four characters of an account or card number"""
+    cleaned = re.sub(r"[\s-]", "", number)
+    return f"XXXX{cleaned[-4:]}"
+
+
+def find_account(text):
+    """Masked account or card number from a statement's first page, None when none is printed"""
+    for match in ACCOUNT_PATTERN.finditer(text or ""):
+        number = match.group(1).strip()
+        # A date or a phone-length run of plain digits is no account number; require some length
+        if len(re.sub(r"\D", "", number)) >= 2 and len(re.sub(r"[\s-]", "", number)) >= 8:
+            return mask_account(number)
+    return None
+
+
+class LedgerStore:
+    """Persistent transaction ledger across every extracted statement, for questions spanning documents.
+
+    Documents are keyed by their content hash, so extracting the same PDF again replaces its rows
+    instead of adding them twice. Transactions are indexed by date, merchant, account and document,
+    and every aggregate is a single GROUP BY over the matching rows.
+    """
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, path=None):
+        self.path = Path(path) if path else Config.LEDGER_PATH
+        self._lock = threading.Lock()
+        self.stats = {"documents_added": 0, "documents_skipped": 0, "transactions_added": 0, "queries": 0}
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), timeout=30, check_same_thread=False)
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            "document_id TEXT PRIMARY KEY, cache_key TEXT, source_name TEXT, account TEXT, first_date TEXT, "
+            "last_date TEXT, transactions INTEGER NOT NULL, added_at REAL NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS transactions ("
+            "document_id TEXT NOT NULL, source_name TEXT, account TEXT, date TEXT NOT NULL, description TEXT, "
+            "merchant TEXT COLLATE NOCASE, category TEXT, amount REAL NOT NULL, balance REAL, page INTEGER);"
+            "CREATE INDEX IF NOT EXISTS transactions_date ON transactions (date);"
+            "CREATE INDEX IF NOT EXISTS transactions_merchant ON transactions (merchant, date);"
+            "CREATE INDEX IF NOT EXISTS transactions_account ON transactions (account, date);"
+            "CREATE INDEX IF NOT EXISTS transactions_document ON transactions (document_id);"
+        )
+        self._conn.commit()
+
+    @classmethod
+    def shared(cls):
+        """Process-wide ledger shared by every FinSight instance"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def has_document(self, extraction_path):
+        """True when this extraction (same PDF, same extractor output) is already in the ledger"""
+        manifest = read_manifest(extraction_path) or {}
+        if not manifest.get("content_hash"):
+            return False
+        with self._lock:
+            row = self._conn.execute("SELECT cache_key FROM documents WHERE document_id = ?",
+                                     (manifest["content_hash"],)).fetchone()
+        return row is not None and row[0] == manifest.get("cache_key")
+
+    def add_document(self, data_loader, account=None):
+        """Append an extraction's transactions, replacing any earlier rows of the same PDF; returns the row count,
+        or None when the extraction is already in the ledger. Extractions without a content hash (made before
+        manifests) cannot be keyed and are skipped."""
+        manifest = read_manifest(data_loader.base_path) or {}
+        document_id = manifest.get("content_hash")
+        if not document_id:
+            logger.warning(f"Not adding {data_loader.base_path} to the ledger: it has no content hash")
+            return 0
+        if self.has_document(data_loader.base_path):
+            self.stats["documents_skipped"] += 1
+            return None
+        import analytics
+        transactions = data_loader.load_transactions()
+        if account is None:
+            first_page = next(data_loader.iter_page_texts(), (None, ""))[1]
+            account = find_account(first_page)
+        source_name = manifest.get("source_name") or data_loader.base_path.name
+        rows = []
+        if transactions is not None and not transactions.empty:
+            df = analytics.prepare(transactions.dropna(subset=["date", "amount"]))
+            balance = df["balance"].astype(object).where(df["balance"].notna(), None)
+            rows = list(zip(
+                [document_id] * len(df), [source_name] * len(df), [account] * len(df),
+                df["date"].dt.strftime("%Y-%m-%d").tolist(), df["description"].astype(str).tolist(),
+                df["merchant"].tolist(), df["category"].tolist(), df["amount"].astype(float).tolist(),
+                balance.tolist(), df["page"].astype(int).tolist(),
+            ))
+        first_date = min((row[3] for row in rows), default=None)
+        last_date = max((row[3] for row in rows), default=None)
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM transactions WHERE document_id = ?", (document_id,))
+                self._conn.executemany(
+                    "INSERT INTO transactions (document_id, source_name, account, date, description, merchant, category, "
+                    "amount, balance, page) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", rows
+                )
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (document_id, cache_key, source_name, account, first_date, last_date, "
+                    "transactions, added_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (document_id, manifest.get("cache_key"), source_name, account, first_date, last_date, len(rows), time.time()),
+                )
+            self.stats["documents_added"] += 1
+            self.stats["transactions_added"] += len(rows)
+        logger.info(f"Added {len(rows)} transactions from {source_name} to the ledger")
+        return len(rows)
+
+    def remove_document(self, document_id):
+        with self._lock:
+            with self._conn:
+                self._conn.execute("DELETE FROM transactions WHERE document_id = ?", (document_id,))
+                self._conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+
+    def documents(self):
+        """Documents in the ledger, oldest statement period first"""
+        columns = ("document_id", "source_name", "account", "first_date", "last_date", "transactions", "added_at")
+        with self._lock:
+            rows = self._conn.execute(f"SELECT {', '.join(columns)} FROM documents ORDER BY first_date, source_name").fetchall()
+        return [dict(zip(columns, row)) for row in rows]
+
+    def find_merchant(self, phrase):
+        """The most frequent merchant starting with phrase (case-insensitive, served by the merchant index), or None"""
+        phrase = phrase.strip().lower()
+        if not phrase:
+            return None
+        pattern = phrase.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%"
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT merchant FROM transactions WHERE merchant LIKE ? ESCAPE '\\' GROUP BY merchant "
+                "ORDER BY COUNT(*) DESC LIMIT 1", (pattern,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def latest_date(self):
+        with self._lock:
+            row = self._conn.execute("SELECT MAX(date) FROM transactions").fetchone()
+        return row[0]
+
+    def _where(self, merchant=None, category=None, start=None, end=None, account=None, document_id=None):
+        """SQL condition and parameters for the common filters; merchant matches by prefix, dates are inclusive"""
+        conditions = []
+        params = []
+        if merchant:
+            conditions.append("merchant LIKE ? ESCAPE '\\'")
+            params.append(merchant.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_") + "%")
+        for column, value in (("category", category), ("account", account), ("document_id", document_id)):
+            if value:
+                conditions.append(f"{column} = ?")
+                params.append(value)
+        if start:
+            conditions.append("date >= ?")
+            params.append(str(start)[:10])
+        if end:
+            conditions.append("date <= ?")
+            params.append(str(end)[:10])
+        return (" WHERE " + " AND ".join(conditions)) if conditions else "", params
+
+    def totals(self, group_by="category", **filters):
+        """Spend, income and transaction counts per merchant, category, month, account or document in one pass,
+        biggest spend first"""
+        import pandas as pd
+        if group_by not in GROUP_COLUMNS:
+            raise ValueError(f"Unknown ledger grouping: {group_by}")
+        where, params = self._where(**filters)
+        query = (
+            f"SELECT {GROUP_COLUMNS[group_by]} AS {group_by}, "
+            "SUM(CASE WHEN amount < 0 THEN -amount ELSE 0 END) AS spent, "
+            "SUM(CASE WHEN amount > 0 THEN amount ELSE 0 END) AS received, "
+            "COUNT(*) AS transactions, COUNT(DISTINCT document_id) AS statements "
+            f"FROM transactions{where} GROUP BY 1 ORDER BY {'1' if group_by == 'month' else 'spent DESC'}"
+        )
+        with self._lock:
+            self.stats["queries"] += 1
+            return pd.read_sql_query(query, self._conn, params=params)
+
+    def transactions(self, limit=None, **filters):
+        """Matching transactions as a frame with parsed dates, in date order"""
+        import pandas as pd
+        where, params = self._where(**filters)
+        query = ("SELECT date, description, merchant, category, amount, balance, account, source_name, page "
+                 f"FROM transactions{where} ORDER BY date")
+        if limit:
+            query += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            self.stats["queries"] += 1
+            df = pd.read_sql_query(query, self._conn, params=params)
+        df["date"] = pd.to_datetime(df["date"])
+        return df
+
+    def answer_question(self, question):
+        """Answer an aggregate question over every statement in the ledger; None when it is not one"""
+        import analytics
+        filters, period = self._question_filters(question)
+        intent = analytics.detect_intent(question)
+        group_by = next((group for group, pattern in GROUP_WORDS if pattern.search(question)), None)
+        scope = " ".join(part for part in (f"in {filters['category']}" if filters.get("category") else "",
+                                           f"at {filters['merchant']}" if filters.get("merchant") else "", period) if part)
+
+        if intent == "large" and group_by is None:
+            df = self.transactions(**filters)
+            table = analytics.large_transactions(df, top_n=10)[["date", "description", "amount", "source_name"]]
+            if table.empty:
+                return None
+            return analytics.AnalyticsResult("ledger_large", f"Largest transactions across statements {scope}".strip(), table)
+        if intent == "recurring" and group_by is None:
+            table = analytics.recurring_transactions(self.transactions(**filters))
+            if table.empty:
+                return None
+            return analytics.AnalyticsResult("ledger_recurring", f"Recurring payments across statements {scope}".strip(), table)
+        if group_by is None:
+            group_by = {"category": "category", "merchant": "merchant", "monthly": "month"}.get(intent)
+        if group_by is None and filters.get("merchant"):
+            group_by = "month"
+        if group_by is None:
+            return None
+        table = self.totals(group_by, **filters)
+        if table.empty:
+            return None
+        title = (f"Totals by {' '.join(part for part in (group_by, scope) if part)}: spent {table['spent'].sum():,.2f} and received "
+                 f"{table['received'].sum():,.2f} in {int(table['transactions'].sum())} transactions")
+        logger.info(f"Answered ledger question by {group_by} over {int(table['transactions'].sum())} transactions")
+        return analytics.AnalyticsResult(f"ledger_{group_by}", title, table)
+
+    def _question_filters(self, question):
+        """Merchant and date filters named in a question, with a description of the period"""
+        filters = {}
+        for match in MERCHANT_PHRASE.finditer(question):
+            phrase = match.group(1).strip()
+            if phrase.lower() in NOT_MERCHANTS or phrase.isdigit():
+                continue
+            merchant = self.find_merchant(phrase)
+            if merchant:
+                filters["merchant"] = phrase.lower()
+                break
+        import analytics
+        for category in analytics.CATEGORY_KEYWORDS:
+            # "food", "shopping", "travel", ... name the category they begin
+            if re.search(rf"\b{re.escape(category.split()[0].lower())}\b", question, re.I):
+                filters["category"] = category
+                break
+        period = ""
+        last = LAST_PERIOD.search(question)
+        year = YEAR_PATTERN.search(question)
+        if last:
+            import pandas as pd
+            count = NUMBER_WORDS.get(last.group(1).lower()) or int(last.group(1))
+            months = count * (12 if last.group(2).lower() == "year" else 1)
+            # Statements describe the past: the period ends at the newest transaction, not today
+            latest = self.latest_date()
+            if latest:
+                end = pd.Timestamp(latest)
+                filters["start"] = (end - pd.DateOffset(months=months) + pd.Timedelta(days=1)).strftime("%Y-%m-%d")
+                filters["end"] = end.strftime("%Y-%m-%d")
+                period = f"from {filters['start']} to {filters['end']}"
+        elif year:
+            filters["start"] = f"{year.group(1)}-01-01"
+            filters["end"] = f"{year.group(1)}-12-31"
+            period = f"in {year.group(1)}"
+        return filters, period
@@ -1,81 +1,559 @@
 import sys
+import asyncio
+import contextvars
+import argparse
+import threading
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
 from pathlib import Path
-from crewai import Crew
 
 from config import Config
-from pdf_extractor import PDFExtractor
+from pdf_extractor import PDFExtractor, source_name
 from data_loader import FinancialDataLoader
 from agent import DocumentAgents
-from tasks import DocumentTasks
+from crew_pool import CrewPool
+from batch import BatchRunner
+from retrieval import RetrievalIndex
+from response_cache import ResponseCache
+from rate_limiter import RateLimiter
+from token_utils import estimate_tokens
+from extraction_cache import read_manifest
+from ledger_store import LedgerStore
+from document_assembler import assemble_document, chunk_document
+from document_digest import answered_from_digest, format_digest, read_digest, write_digest
+from map_reduce import chunk_job, format_partials, job_cache_key, merge_groups, merge_job
+from streaming import stream_crew, collect_text
+from telemetry import install_crew_handlers, trace_crew, tracer
 import logging
-logging.basicConfig(level=logging.INFO)
+# crewai, pandas and numpy are only imported once an LLM call or the local analytics need them
+# (see agent.py, tasks.py, crew_pool.py, streaming.py and answer_locally), keeping CLI startup fast
 logger = logging.getLogger(__name__)
 
+# Analysis mode -> pooled crew that runs it
+# ("map_reduce" runs many crews: see FinSight._map_reduce)
+ANALYSIS_MODES = {"fast": "fast_analysis", "full": "full_analysis", "map_reduce": "map_reduce"}
+# Progress labels for each task of a pooled crew, in order
+STREAM_LABELS = {
+    "full_analysis": ["Identifying document", "Extracting data", "Writing report"],
+    "fast_analysis": ["Writing report"],
+    "specific_question": ["Answering question"],
+    "excerpt_question": ["Answering question"],
+    "digest_question": ["Answering question"],
+    "phrasing": ["Answering question"],
+    "chunk_extraction": ["Extracting data"],
+    "merge_extractions": ["Merging extractions"],
+    "reduce_analysis": ["Merging extractions", "Writing report"],
+}
+# Analysis crew -> positions of its (context, extraction) task outputs, kept as the document digest;
+# a fast analysis has only its report, which carries the extracted data
+DIGEST_TASKS = {"full_analysis": (0, 1), "fast_analysis": (None, 0), "reduce_analysis": (None, 0)}
+
 class FinSight:
-    def __init__(self):
+    def __init__(self, response_cache=None, llm=None, rate_limiter=None, ledger=None):
         self.pdf_extractor = PDFExtractor()
         self.data_loader = None
+        # None keeps CrewAI's default model; tests and benchmarks pass a FakeLLM
+        self.llm = llm
+        self.response_cache = response_cache
+        if self.response_cache is None and Config.RESPONSE_CACHE_ENABLED:
+            self.response_cache = ResponseCache.shared()
+        # Opened on first use: LedgerStore.shared() unless one is passed in
+        self._ledger = ledger
+        self._crew_pools = {}
+        # Shared with every other FinSight in the process unless a limiter is passed in
+        self.rate_limiter = rate_limiter or RateLimiter.shared()
+        self._plan_lock = threading.Lock()
+        # Trace of the last request made through this instance, see telemetry.tracer.latest_trace
+        self.last_trace_id = None
+        if Config.METRICS_PORT:
+            tracer.serve_prometheus(Config.METRICS_PORT)
 
-    def extract_pdf(self, pdf_path, password=None):
-        """Extract content from PDF, passing an optional password."""
-        logger.info(f"Starting PDF extraction: {pdf_path}")
-        print(f"Starting PDF extraction: {pdf_path}")
-        extraction_path = self.pdf_extractor.extract_pdf_content(pdf_path, password=password)
-        
-        if extraction_path:
-            logger.info(f"PDF extraction successful, setting up data loader for: {extraction_path}")
-            self.data_loader = FinancialDataLoader(extraction_path)
-            return extraction_path
-        else:
-            logger.error(f"PDF extraction failed for: {pdf_path}")
+    @contextmanager
+    def _request_span(self, name, **attributes):
+        with tracer.span(name, **attributes) as span:
+            self.last_trace_id = span.trace_id
+            yield span
+
+    def extract_pdf(self, pdf, password=None, workers=None, name=None):
+        """Extract content from a PDF path, its bytes or an open pymupdf.Document, passing an optional password and worker count."""
+        pdf_name = source_name(pdf, name)
+        logger.info(f"Starting PDF extraction: {pdf_name}")
+        print(f"Starting PDF extraction: {pdf_name}")
+        with self._request_span("request.extract", pdf=pdf_name) as span:
+            extraction_path = self.pdf_extractor.extract_pdf_content(pdf, password=password, workers=workers, name=name)
+            
+            if extraction_path:
+                logger.info(f"PDF extraction successful, setting up data loader for: {extraction_path}")
+                self.data_loader = FinancialDataLoader(extraction_path)
+                self.add_to_ledger(self.data_loader)
+                if Config.RETRIEVAL_ENABLED:
+                    with tracer.span("retrieval.index"):
+                        RetrievalIndex.load_or_build(extraction_path, self.data_loader, self.pdf_extractor.cache)
+                return extraction_path
+            else:
+                logger.error(f"PDF extraction failed for: {pdf_name}")
+                span.set(result="failed")
+                return None
+
+    @property
+    def ledger(self):
+        """The cross-document transaction ledger, or None when Config.LEDGER_ENABLED is off"""
+        if self._ledger is None and Config.LEDGER_ENABLED:
+            self._ledger = LedgerStore.shared()
+        return self._ledger
+
+    def add_to_ledger(self, data_loader, account=None):
+        """Append an extraction's transactions to the ledger unless it is already there; returns the rows added"""
+        if self.ledger is None or self.ledger.has_document(data_loader.base_path):
+            return None
+        try:
+            with tracer.span("ledger.add") as span:
+                added = self.ledger.add_document(data_loader, account=account)
+                span.set(transactions=added)
+            return added
+        except Exception as e:
+            logger.error(f"Adding {data_loader.base_path} to the ledger failed: {e}")
+            return None
+
+    def query_ledger(self, question):
+        """Answer an aggregate question across every statement in the ledger, e.g. "total spent at Swiggy over
+        12 months", without an LLM call; None when the question is not one the ledger can answer"""
+        if self.ledger is None:
             return None
+        with self._request_span("request.ledger") as span:
+            result = self.ledger.answer_question(question)
+            span.set(intent=result.intent if result is not None else None)
+        return result
+
+    def _use_extraction(self, extraction_path):
+        """Point the data loader at extraction_path unless it is already loaded"""
+        if self.data_loader is None or self.data_loader.base_path != Path(extraction_path):
+            self.data_loader = FinancialDataLoader(extraction_path)
+        # Keeps the extraction out of cache eviction while questions are still being asked about it
+        self.pdf_extractor.cache.catalog.touch(extraction_path)
 
     def get_full_text_content(self):
+        """Prompt-ready document text: one layout per page, in order, without repeated letterheads"""
         if not self.data_loader:
             return ""
-        text_data = self.data_loader.load_text_data()
-        return "\n\n".join(text_data.values())
+        with tracer.span("assemble") as span:
+            document = assemble_document(self.data_loader)
+            span.set(chars=len(document.text))
+        return document.text
 
-    def analyze_document(self, extraction_path):
-        print("Starting comprehensive document analysis...")
-        
-        full_content = self.get_full_text_content()
-        if not full_content:
-            return "Could not read content from the extracted files."
+    def get_relevant_excerpts(self, question, extraction_path):
+        """Retrieve the chunks most relevant to a question, with page citations, within the token budget"""
+        with tracer.span("retrieval.search") as span:
+            index = RetrievalIndex.load_or_build(extraction_path, self.data_loader, self.pdf_extractor.cache)
+            chunks = index.retrieve(question)
+            span.set(chunks=len(chunks))
+        logger.info(f"Retrieved {len(chunks)} chunks for question")
+        return RetrievalIndex.format_chunks(chunks)
 
-        tasks_manager = DocumentTasks(str(extraction_path))
-        
-        context_task = tasks_manager.create_contextualization_task(full_content)
-        extraction_task = tasks_manager.create_data_extraction_task(context_task)
-        report_task = tasks_manager.create_reporting_task(extraction_task)
+    def document_hash(self, extraction_path):
+        """Content hash of the source PDF, used to key cached LLM responses"""
+        manifest = read_manifest(extraction_path)
+        if manifest and manifest.get("content_hash"):
+            return manifest["content_hash"]
+        # Extractions made before manifests existed: hash the extracted text instead
+        return hashlib.sha256(self.get_full_text_content().encode("utf-8")).hexdigest()
+
+    def _cached_response(self, extraction_path, question, template, use_cache):
+        """Look up a cached response; returns (cache_key, response), with response None on a miss or bypass"""
+        if self.response_cache is None:
+            return None, None
+        cache_key = ResponseCache.make_key(self.document_hash(extraction_path), question, template)
+        if not use_cache:
+            logger.info("Response cache bypassed for this call")
+            return cache_key, None
+        response = self.response_cache.get(cache_key)
+        tracer.count("cache_requests", cache="response", result="miss" if response is None else "hit")
+        if tracer.current() is not None:
+            tracer.current().set(response_cache_hit=response is not None)
+        if response is not None:
+            logger.info(f"Response cache hit ({self.response_cache.stats['hits']} hits, {self.response_cache.stats['misses']} misses)")
+        return cache_key, response
+
+    def _store_response(self, cache_key, response):
+        if self.response_cache is not None and cache_key is not None:
+            self.response_cache.put(cache_key, response)
+
+    def crew_pool(self, stream=False):
+        """The long-lived agents and crews for this instance; streaming calls get their own pool with a streaming LLM"""
+        key = stream and self.llm is None
+        if key not in self._crew_pools:
+            install_crew_handlers()
+            llm = self.llm
+            if key:
+                llm = DocumentAgents.create_llm(stream=True)
+            elif llm is None and Config.OPENAI_BASE_URL:
+                llm = DocumentAgents.create_llm()
+            self._crew_pools[key] = CrewPool(llm)
+        return self._crew_pools[key]
+
+    def _run_crew(self, kind, inputs, task_outputs=None):
+        """Kick off a pooled crew and return its final output; task_outputs, if given, receives every task's output"""
+        pool = self.crew_pool()
+        crew = pool.checkout(kind)
+        try:
+            with trace_crew(kind, crew):
+                result = crew.kickoff(inputs=inputs)
+        finally:
+            pool.checkin(kind, crew)
+        if task_outputs is not None:
+            task_outputs[:] = [output.raw for output in result.tasks_output]
+        return str(result)
+
+    def _analysis_plan(self, extraction_path, use_cache, mode=None):
+        """Prepare an analysis: returns (answer, None, None) when no LLM call is needed, else (None, (crew kind, inputs), cache_key)"""
+        self._use_extraction(extraction_path)
+        mode = mode or Config.ANALYSIS_MODE
+        if mode not in ANALYSIS_MODES:
+            raise ValueError(f"Unknown analysis mode '{mode}', expected one of {', '.join(ANALYSIS_MODES)}")
         
-        document_crew = Crew(
-            agents=list(DocumentAgents.create_all_agents().values()),
-            tasks=[context_task, extraction_task, report_task],
-            verbose=True
-        )
+        template = "comprehensive_analysis" if mode == "full" else f"comprehensive_analysis:{mode}"
+        if mode == "map_reduce":
+            template += f":{Config.MAP_REDUCE_CHUNK_TOKENS}:{Config.MAP_REDUCE_REDUCE_TOKENS}"
+        cache_key, cached = self._cached_response(extraction_path, "", template, use_cache)
+        if cached is not None:
+            return cached, None, None
         
-        result = document_crew.kickoff()
-        return result
-
-    def ask_question(self, question, extraction_path):
-        if self.data_loader is None:
-            self.data_loader = FinancialDataLoader(extraction_path)
+        if mode == "map_reduce":
+            with tracer.span("assemble.chunks") as span:
+                chunks = chunk_document(self.data_loader)
+                span.set(chunks=len(chunks))
+            if not chunks:
+                return "Could not read content from the extracted files.", None, None
+            return None, ("map_reduce", {"chunks": chunks, "use_cache": use_cache}), cache_key
         
         full_content = self.get_full_text_content()
         if not full_content:
-            return "Could not read content to answer the question."
+            return "Could not read content from the extracted files.", None, None
+        return None, (ANALYSIS_MODES[mode], {"document_content": full_content}), cache_key
+
+    def _run_job(self, kind, inputs, task_outputs=None):
+        if kind == "map_reduce":
+            return self._run_crew("reduce_analysis", self._map_reduce(inputs["chunks"], inputs["use_cache"]), task_outputs)
+        if kind == "digest_question":
+            answer = self._run_crew(kind, {"question": inputs["question"], "digest": inputs["digest"]})
+            if self._digest_answered(answer):
+                return answer
+            return self._run_crew(*inputs["fallback"])
+        return self._run_crew(kind, inputs, task_outputs)
+
+    def _digest_answered(self, answer):
+        answered = answered_from_digest(answer)
+        tracer.count("digest_questions", result="answered" if answered else "fallback")
+        if not answered:
+            logger.info("The digest could not answer the question; falling back to the document text")
+        return answered
+
+    def document_digest(self, extraction_path):
+        """The digest left by an earlier analysis of this document, if it is usable for questions"""
+        if not Config.DIGEST_ENABLED:
+            return None
+        digest = read_digest(extraction_path, self.document_hash(extraction_path))
+        if digest is None or digest["tokens"] > Config.DIGEST_MAX_TOKENS:
+            return None
+        return digest
+
+    def _save_digest(self, extraction_path, kind, task_outputs):
+        """Keep the context and extraction results of an analysis crew with its extraction"""
+        if not Config.DIGEST_ENABLED or kind not in DIGEST_TASKS or not task_outputs:
+            return
+        context_index, extraction_index = DIGEST_TASKS[kind]
+        try:
+            write_digest(extraction_path, self.document_hash(extraction_path), kind,
+                         context=task_outputs[context_index] if context_index is not None else None,
+                         extraction=task_outputs[extraction_index])
+            self.pdf_extractor.cache.record_size(extraction_path)
+        except Exception as e:
+            logger.error(f"Saving the document digest failed: {e}")
+
+    def _map_reduce(self, chunks, use_cache):
+        """Map and intermediate merge steps of a map-reduce analysis; returns the inputs of the final reduce crew"""
+        partials = self._run_partial_jobs([chunk_job(chunk) for chunk in chunks], use_cache, "map_reduce.map")
+        groups = merge_groups(partials)
+        while groups is not None:
+            partials = self._run_partial_jobs([merge_job(group) for group in groups], use_cache, "map_reduce.merge")
+            groups = merge_groups(partials)
+        return {"partial_results": format_partials(partials)}
+
+    def _cached_partials(self, jobs, use_cache):
+        """Partial results already in the response cache; returns (results with None gaps, indexes still to run)"""
+        results = [None] * len(jobs)
+        pending = []
+        for index, job in enumerate(jobs):
+            text = None
+            if self.response_cache is not None and use_cache:
+                text = self.response_cache.get(job_cache_key(job[0], job[1]))
+                tracer.count("cache_requests", cache="partial", result="miss" if text is None else "hit")
+            if text is None:
+                pending.append(index)
+            else:
+                results[index] = {"first_page": job[2][0], "last_page": job[2][1], "text": text}
+        return results, pending
+
+    def _store_partial(self, job, text):
+        self._store_response(job_cache_key(job[0], job[1]), text)
+        return {"first_page": job[2][0], "last_page": job[2][1], "text": text}
+
+    def _run_partial_jobs(self, jobs, use_cache, span_name):
+        """Run map or merge jobs, up to Config.MAP_REDUCE_CONCURRENCY at once, reusing cached partial results.
+        Every job that succeeds is cached before a failure is raised, so a retry only repeats the failed ones."""
+        with tracer.span(span_name, jobs=len(jobs)) as span:
+            results, pending = self._cached_partials(jobs, use_cache)
+            span.set(cached=len(jobs) - len(pending))
+            if pending:
+                errors = []
+                with ThreadPoolExecutor(max_workers=min(Config.MAP_REDUCE_CONCURRENCY, len(pending)),
+                                        thread_name_prefix="finsight-map") as pool:
+                    # Each job runs in a copy of this context, so its crew spans nest under this span
+                    futures = [(index, pool.submit(contextvars.copy_context().run, self._run_crew, *jobs[index][:2]))
+                               for index in pending]
+                    for index, future in futures:
+                        try:
+                            results[index] = self._store_partial(jobs[index], future.result())
+                        except Exception as e:
+                            errors.append(e)
+                if errors:
+                    raise errors[0]
+        return results
+
+    def analyze_document(self, extraction_path, use_cache=True, mode=None):
+        """Analyze the document in "fast" (one LLM call), "full" (three agents) or "map_reduce" (chunked, for documents
+        longer than the model context) mode, defaulting to Config.ANALYSIS_MODE.
+        use_cache=False skips the cache lookup but still refreshes the stored result."""
+        print("Starting comprehensive document analysis...")
+        with self._request_span("request.analyze", mode=mode or Config.ANALYSIS_MODE):
+            answer, job, cache_key = self._analysis_plan(extraction_path, use_cache, mode)
+            if answer is not None:
+                return answer
+            
+            task_outputs = []
+            result = self._run_job(*job, task_outputs)
+            self._store_response(cache_key, result)
+            self._save_digest(extraction_path, "reduce_analysis" if job[0] == "map_reduce" else job[0], task_outputs)
+            return result
 
-        tasks_manager = DocumentTasks(str(extraction_path))
-        question_task = tasks_manager.create_specific_question_task(question, full_content)
+    def answer_locally(self, question):
+        """Answer common statement questions from the transaction tables; None when the LLM is needed"""
+        if not Config.ANALYTICS_ENABLED or self.data_loader is None:
+            return None
+        import analytics
+        try:
+            transactions = self.data_loader.load_transactions()
+            with tracer.span("analytics") as span:
+                result = analytics.answer_question(question, transactions)
+                span.set(intent=result.intent if result is not None else None)
+            return result
+        except Exception as e:
+            logger.error(f"Local analytics failed, falling back to the LLM: {e}")
+            return None
+
+    def _question_plan(self, question, extraction_path, use_cache, phrase_with_llm):
+        """Prepare a question: returns (answer, None, None) when no LLM call is needed, else (None, (crew kind, inputs), cache_key)"""
+        self._use_extraction(extraction_path)
         
-        qa_crew = Crew(
-            agents=[DocumentAgents.create_reporting_agent()],
-            tasks=[question_task],
-            verbose=True
-        )
+        local_result = self.answer_locally(question)
+        if local_result is not None:
+            if phrase_with_llm is None:
+                phrase_with_llm = Config.ANALYTICS_PHRASE_WITH_LLM
+            if not phrase_with_llm:
+                return local_result.text, None, None
+            template = f"analytics_phrase:{local_result.intent}"
+        elif Config.RETRIEVAL_ENABLED:
+            template = f"excerpt_question:{Config.RETRIEVAL_TOP_K}:{Config.RETRIEVAL_TOKEN_BUDGET}"
+        else:
+            template = "specific_question"
+        # The digest of an earlier analysis is tried first; the answer depends on which digest was used
+        digest = self.document_digest(extraction_path) if local_result is None else None
+        if digest is not None:
+            template = f"digest_question:{digest['digest_hash'][:16]}:{template}"
+        cache_key, cached = self._cached_response(extraction_path, question, template, use_cache)
+        if cached is not None:
+            return cached, None, None
         
-        return qa_crew.kickoff()
+        if local_result is not None:
+            return None, ("phrasing", {"question": question, "computed_result": local_result.text}), cache_key
+        if Config.RETRIEVAL_ENABLED:
+            excerpts = self.get_relevant_excerpts(question, extraction_path)
+            if not excerpts:
+                return "Could not read content to answer the question.", None, None
+            job = ("excerpt_question", {"question": question, "excerpts": excerpts})
+        else:
+            full_content = self.get_full_text_content()
+            if not full_content:
+                return "Could not read content to answer the question.", None, None
+            job = ("specific_question", {"question": question, "document_content": full_content})
+        if digest is not None:
+            # The fallback is prepared here, while this plan holds the data loader
+            job = ("digest_question", {"question": question, "digest": format_digest(digest), "fallback": job})
+        return None, job, cache_key
+
+    def ask_question(self, question, extraction_path, use_cache=True, phrase_with_llm=None):
+        """Answer a question about the document. use_cache=False skips the cache lookup but still refreshes the stored answer."""
+        with self._request_span("request.question"):
+            answer, job, cache_key = self._question_plan(question, extraction_path, use_cache, phrase_with_llm)
+            if answer is not None:
+                return answer
+            
+            answer = self._run_job(*job)
+            self._store_response(cache_key, answer)
+            return answer
+
+    async def _plan_async(self, plan, *args):
+        # Plans switch self.data_loader, so concurrent calls prepare them one at a time off the event loop
+        def prepare():
+            with self._plan_lock:
+                return plan(*args)
+        return await asyncio.to_thread(prepare)
+
+    async def _run_crew_async(self, kind, inputs, task_outputs=None):
+        pool = self.crew_pool()
+        crew = pool.checkout(kind)
+        calls = len(crew.tasks)
+        tokens = sum(estimate_tokens(str(value)) for value in inputs.values()) + calls * Config.LLM_OUTPUT_TOKENS_ESTIMATE
+        try:
+            with trace_crew(kind, crew):
+                result = await self.rate_limiter.run(lambda: crew.kickoff_async(inputs=inputs), requests=calls, tokens=tokens)
+        except asyncio.CancelledError:
+            # The kickoff thread keeps running after cancellation, so its crew stays out of the pool
+            raise
+        except Exception:
+            pool.checkin(kind, crew)
+            raise
+        pool.checkin(kind, crew)
+        if task_outputs is not None:
+            task_outputs[:] = [output.raw for output in result.tasks_output]
+        return str(result)
+
+    async def _run_job_async(self, kind, inputs, task_outputs=None):
+        if kind == "map_reduce":
+            return await self._run_crew_async("reduce_analysis", await self._map_reduce_async(inputs["chunks"], inputs["use_cache"]),
+                                              task_outputs)
+        if kind == "digest_question":
+            answer = await self._run_crew_async(kind, {"question": inputs["question"], "digest": inputs["digest"]})
+            if self._digest_answered(answer):
+                return answer
+            return await self._run_crew_async(*inputs["fallback"])
+        return await self._run_crew_async(kind, inputs, task_outputs)
+
+    async def _map_reduce_async(self, chunks, use_cache):
+        """Async _map_reduce: the jobs are awaited together, through the shared rate limiter"""
+        partials = await self._run_partial_jobs_async([chunk_job(chunk) for chunk in chunks], use_cache, "map_reduce.map")
+        groups = merge_groups(partials)
+        while groups is not None:
+            partials = await self._run_partial_jobs_async([merge_job(group) for group in groups], use_cache, "map_reduce.merge")
+            groups = merge_groups(partials)
+        return {"partial_results": format_partials(partials)}
+
+    async def _run_partial_jobs_async(self, jobs, use_cache, span_name):
+        with tracer.span(span_name, jobs=len(jobs)) as span:
+            results, pending = self._cached_partials(jobs, use_cache)
+            span.set(cached=len(jobs) - len(pending))
+            semaphore = asyncio.Semaphore(Config.MAP_REDUCE_CONCURRENCY)
+            
+            async def run(index):
+                async with semaphore:
+                    text = await self._run_crew_async(*jobs[index][:2])
+                results[index] = self._store_partial(jobs[index], text)
+            
+            outcomes = await asyncio.gather(*(run(index) for index in pending), return_exceptions=True)
+            errors = [outcome for outcome in outcomes if isinstance(outcome, BaseException)]
+            if errors:
+                raise errors[0]
+        return results
+
+    async def analyze_document_async(self, extraction_path, use_cache=True, mode=None):
+        """Async analyze_document: LLM calls go through the shared rate limiter, so many can be awaited at once"""
+        with self._request_span("request.analyze", mode=mode or Config.ANALYSIS_MODE):
+            answer, job, cache_key = await self._plan_async(self._analysis_plan, extraction_path, use_cache, mode)
+            if answer is not None:
+                return answer
+            
+            task_outputs = []
+            result = await self._run_job_async(*job, task_outputs)
+            self._store_response(cache_key, result)
+            self._save_digest(extraction_path, "reduce_analysis" if job[0] == "map_reduce" else job[0], task_outputs)
+            return result
+
+    async def ask_question_async(self, question, extraction_path, use_cache=True, phrase_with_llm=None):
+        """Async ask_question, e.g. asyncio.gather over several questions about the same document"""
+        with self._request_span("request.question"):
+            answer, job, cache_key = await self._plan_async(self._question_plan, question, extraction_path, use_cache, phrase_with_llm)
+            if answer is not None:
+                return answer
+            
+            answer = await self._run_job_async(*job)
+            self._store_response(cache_key, answer)
+            return answer
+
+    def _stream_plan(self, plan, extraction_path=None):
+        answer, job, cache_key = plan
+        if answer is not None:
+            yield {"type": "result", "text": answer}
+            return
+        kind, inputs = job
+        # Map-reduce runs its map step first and then streams the final reduce crew as steps 2 and 3
+        offset = 0
+        if kind == "digest_question":
+            # The digest answer is not streamed, since it may turn out to be the request for the document text
+            step = {"task": "Checking the document digest", "index": 1, "total": 2}
+            yield dict(step, type="task_started")
+            try:
+                answer = self._run_crew(kind, {"question": inputs["question"], "digest": inputs["digest"]})
+            except Exception as e:
+                logger.error(f"Digest question failed: {e}")
+                yield {"type": "error", "error": str(e)}
+                return
+            yield dict(step, type="task_completed", output="")
+            if self._digest_answered(answer):
+                self._store_response(cache_key, answer)
+                yield {"type": "result", "text": answer}
+                return
+            (kind, inputs), offset = inputs["fallback"], 1
+        if kind == "map_reduce":
+            step = {"task": f"Extracting data from {len(inputs['chunks'])} parts", "index": 1, "total": 3}
+            yield dict(step, type="task_started")
+            try:
+                inputs = self._map_reduce(inputs["chunks"], inputs["use_cache"])
+            except Exception as e:
+                logger.error(f"Map step failed: {e}")
+                yield {"type": "error", "error": str(e)}
+                return
+            yield dict(step, type="task_completed", output="")
+            kind, offset = "reduce_analysis", 1
+        pool = self.crew_pool(stream=True)
+        crew = pool.checkout(kind)
+        finished = False
+        task_outputs = [None] * len(crew.tasks)
+        with trace_crew(kind, crew):
+            for event in stream_crew(crew, STREAM_LABELS[kind], inputs):
+                if event["type"] == "task_completed":
+                    task_outputs[event["index"] - 1] = event["output"]
+                if offset and "index" in event:
+                    event = dict(event, index=event["index"] + offset, total=event["total"] + offset)
+                if event["type"] == "result":
+                    self._store_response(cache_key, event["text"])
+                    if extraction_path is not None and None not in task_outputs:
+                        self._save_digest(extraction_path, kind, task_outputs)
+                finished = event["type"] in ("result", "error")
+                yield event
+        # A stream abandoned part way leaves its crew running, so only finished crews go back to the pool
+        if finished:
+            pool.checkin(kind, crew)
+
+    def stream_analysis(self, extraction_path, use_cache=True, mode=None):
+        """Like analyze_document, but yields task progress and tokens as they are produced (see streaming.stream_crew)"""
+        with self._request_span("request.analyze", mode=mode or Config.ANALYSIS_MODE, stream=True):
+            yield from self._stream_plan(self._analysis_plan(extraction_path, use_cache, mode), extraction_path)
+
+    def stream_question(self, question, extraction_path, use_cache=True, phrase_with_llm=None):
+        """Like ask_question, but yields task progress and tokens as they are produced (see streaming.stream_crew)"""
+        with self._request_span("request.question", stream=True):
+            yield from self._stream_plan(self._question_plan(question, extraction_path, use_cache, phrase_with_llm))
 
     def run_interactive(self):
         print("🤖 Welcome to FinSight - Your AI Document Assistant!")
@@ -102,30 +580,38 @@ class FinSight:
                 print("\nOptions for the current document:")
                 print("1. Run comprehensive analysis")
                 print("2. Ask a specific question")
-                print("3. Process another document")
-                print("4. Exit")
+                print("3. Ask across all extracted statements")
+                print("4. Process another document")
+                print("5. Exit")
                 
-                choice = input("\nChoose an option (1-4): ").strip()
+                choice = input("\nChoose an option (1-5): ").strip()
                 
                 if choice == "1":
-                    result = self.analyze_document(extraction_path)
                     print("\n" + "="*50)
                     print("DOCUMENT ANALYSIS RESULTS:")
                     print("="*50)
-                    print(result)
+                    print_stream(self.stream_analysis(extraction_path))
                     
                 elif choice == "2":
                     question = input("\nEnter your question: ").strip()
-                    answer = self.ask_question(question, extraction_path)
                     print("\n" + "="*50)
                     print("ANSWER:")
                     print("="*50)
-                    print(answer)
+                    print_stream(self.stream_question(question, extraction_path))
                     
                 elif choice == "3":
-                    break
+                    question = input("\nEnter your question: ").strip()
+                    result = self.query_ledger(question)
+                    print("\n" + "="*50)
+                    print("ANSWER:")
+                    print("="*50)
+                    print(result.text if result is not None else
+                          "The ledger answers totals by merchant, category, month, account or statement; try rephrasing.")
                 
                 elif choice == "4":
+                    break
+                
+                elif choice == "5":
                     print("Thank you for using FinSight! 👋")
                     return
                 
@@ -134,7 +620,136 @@ class FinSight:
 
         print("Thank you for using FinSight! 👋")
 
+def print_stream(events):
+    """Print task progress and tokens as they arrive; the final text is printed once more if nothing streamed"""
+    streamed = False
+
+    def show(event):
+        nonlocal streamed
+        if event["type"] == "task_started":
+            print(f"\n[{event['index']}/{event['total']}] {event['task']}...", flush=True)
+        elif event["type"] == "token":
+            streamed = True
+            print(event["text"], end="", flush=True)
+        elif event["type"] == "task_completed":
+            print(flush=True)
+
+    text = collect_text(events, show)
+    if not streamed:
+        print(text)
+    return text
+
+def run_batch_command(args):
+    """python main.py batch <directory or glob> [options]: extract and analyze many PDFs, resumable"""
+    parser = argparse.ArgumentParser(prog="main.py batch", description="Process a folder of PDFs")
+    parser.add_argument("source", help="Directory (searched recursively) or glob pattern of PDF files")
+    parser.add_argument("--manifest", default=None, help="JSONL manifest used to record and resume progress")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: one per CPU)")
+    parser.add_argument("--llm-concurrency", type=int, default=None, help="Analyses allowed to call the LLM at once")
+    parser.add_argument("--mode", choices=sorted(ANALYSIS_MODES), default=None, help="Analysis mode")
+    parser.add_argument("--no-analysis", action="store_true", help="Only extract the documents")
+    parser.add_argument("--password", default=None, help="Password shared by protected PDFs")
+    options = parser.parse_args(args)
+    
+    runner = BatchRunner(
+        manifest_path=options.manifest,
+        workers=options.workers,
+        llm_concurrency=options.llm_concurrency,
+        analyze=not options.no_analysis,
+        mode=options.mode,
+        password=options.password,
+    )
+    summary = runner.run(options.source)
+    return 1 if summary["failed"] else 0
+
+def run_extract_command(args):
+    """python main.py extract <pdf> [options]: extract a PDF without loading the LLM stack, printing the extraction path"""
+    parser = argparse.ArgumentParser(prog="main.py extract", description="Extract text, tables and images from a PDF")
+    parser.add_argument("pdf", help="PDF file to extract")
+    parser.add_argument("--password", default=None, help="Password for a protected PDF")
+    parser.add_argument("--workers", type=int, default=None, help="Extraction processes (default: Config.EXTRACTION_WORKERS)")
+    parser.add_argument("--no-cache", action="store_true", help="Extract again even if a cached extraction exists")
+    options = parser.parse_args(args)
+    
+    if not Path(options.pdf).exists():
+        print(f"Error: PDF file not found: {options.pdf}")
+        return 1
+    extraction_path = PDFExtractor().extract_pdf_content(
+        options.pdf, password=options.password, workers=options.workers, use_cache=False if options.no_cache else None
+    )
+    if not extraction_path:
+        print("PDF extraction failed!")
+        return 1
+    print(extraction_path)
+    return 0
+
+def run_prune_command(args):
+    """python main.py prune [options]: apply the extraction cache eviction policy now and report what was removed"""
+    from extraction_catalog import ExtractionCatalog
+    parser = argparse.ArgumentParser(prog="main.py prune", description="Evict old and least recently used extractions")
+    parser.add_argument("--max-mb", type=float, default=None, help="Size limit in MB (default: Config.EXTRACTION_CACHE_MAX_BYTES)")
+    parser.add_argument("--max-age-days", type=float, default=None, help="Maximum days since last use (default: Config.EXTRACTION_CACHE_MAX_AGE_SECONDS)")
+    options = parser.parse_args(args)
+    
+    catalog = ExtractionCatalog(
+        Config.EXTRACTIONS_DIR,
+        max_bytes=int(options.max_mb * 1024 * 1024) if options.max_mb is not None else None,
+        max_age_seconds=options.max_age_days * 24 * 3600 if options.max_age_days is not None else None,
+    )
+    removed = catalog.prune()
+    for name, size in removed:
+        print(f"Evicted {name} ({size / 1024 / 1024:.1f} MB)")
+    count, total_bytes = catalog.totals()
+    print(f"{count} extractions cached, {total_bytes / 1024 / 1024:.1f} MB")
+    return 0
+
+def run_ledger_command(args):
+    """python main.py ledger [question] [options]: list, fill or query the cross-document transaction ledger"""
+    from analytics import format_table
+    parser = argparse.ArgumentParser(prog="main.py ledger", description="Query transactions across every extracted statement")
+    parser.add_argument("question", nargs="*", help='Question such as "total spent at swiggy over 12 months"')
+    parser.add_argument("--add", nargs="+", default=None, metavar="EXTRACTION", help="Add extraction directories to the ledger")
+    parser.add_argument("--by", choices=["merchant", "category", "month", "account", "document"], default=None,
+                        help="Print totals grouped this way instead of answering a question")
+    parser.add_argument("--merchant", default=None, help="Only merchants starting with this name")
+    parser.add_argument("--category", default=None, help="Only this category")
+    parser.add_argument("--account", default=None, help="Only this (masked) account, e.g. XXXX6789")
+    parser.add_argument("--from", dest="start", default=None, help="First date, YYYY-MM-DD")
+    parser.add_argument("--to", dest="end", default=None, help="Last date, YYYY-MM-DD")
+    options = parser.parse_args(args)
+    
+    ledger = LedgerStore.shared()
+    for extraction_path in options.add or []:
+        added = ledger.add_document(FinancialDataLoader(extraction_path))
+        print(f"{extraction_path}: {'already in the ledger' if added is None else f'{added} transactions added'}")
+    if options.by:
+        filters = {"merchant": options.merchant, "category": options.category, "account": options.account,
+                   "start": options.start, "end": options.end}
+        print(format_table(ledger.totals(options.by, **filters), max_rows=100))
+    elif options.question:
+        result = ledger.answer_question(" ".join(options.question))
+        if result is None:
+            print("The ledger answers totals by merchant, category, month, account or statement; try rephrasing.")
+            return 1
+        print(result.text)
+    elif not options.add:
+        for document in ledger.documents():
+            print(f"{document['source_name']}  {document['account'] or '-'}  {document['first_date']} to "
+                  f"{document['last_date']}  {document['transactions']} transactions")
+    return 0
+
 def main():
+    Config.setup_logging()
+    Config.setup_directories()
+    if len(sys.argv) > 1 and sys.argv[1] == "extract":
+        sys.exit(run_extract_command(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "batch":
+        sys.exit(run_batch_command(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "prune":
+        sys.exit(run_prune_command(sys.argv[2:]))
+    if len(sys.argv) > 1 and sys.argv[1] == "ledger":
+        sys.exit(run_ledger_command(sys.argv[2:]))
+    
     finsight = FinSight()
     
     if len(sys.argv) > 1:
@@ -143,11 +758,9 @@ def main():
         
         if extraction_path and len(sys.argv) > 2:
             question = " ".join(sys.argv[2:])
-            answer = finsight.ask_question(question, extraction_path)
-            print(answer)
+            print_stream(finsight.stream_question(question, extraction_path))
         elif extraction_path:
-            result = finsight.analyze_document(extraction_path)
-            print(result)
+            print_stream(finsight.stream_analysis(extraction_path))
     else:
         finsight.run_interactive()
 
@@ -0,0 +1,70 @@
+import hashlib
+import json
+import logging
+
+from config import Config
+from response_cache import ResponseCache
+from token_utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Bump when the chunk or merge prompts change so cached partial results are not reused
+PARTIAL_RESULTS_VERSION = 1
+
+
+def page_label(first_page, last_page):
+    return f"page {first_page}" if first_page == last_page else f"pages {first_page}-{last_page}"
+
+
+def chunk_job(chunk):
+    """Map step for one DocumentChunk: (crew kind, inputs, pages covered)"""
+    return "chunk_extraction", {"chunk_content": chunk.text, "pages": chunk.pages}, (chunk.first_page, chunk.last_page)
+
+
+def merge_job(partials):
+    """Intermediate reduce step for a group of partial results"""
+    pages = (partials[0]["first_page"], partials[-1]["last_page"])
+    return "merge_extractions", {"partial_results": format_partials(partials)}, pages
+
+
+def job_cache_key(kind, inputs):
+    """Response cache key for a partial result: the prompt inputs themselves, not the document they came from,
+    so an unchanged chunk of a changed document is not sent again"""
+    content_hash = hashlib.sha256(json.dumps(inputs, sort_keys=True).encode("utf-8")).hexdigest()
+    return ResponseCache.make_key(content_hash, "", f"{kind}:v{PARTIAL_RESULTS_VERSION}")
+
+
+def format_partials(partials):
+    """Render partial results in page order with the pages each one covers"""
+    return "\n\n".join(
+        f"### Part {number} ({page_label(partial['first_page'], partial['last_page'])})\n{partial['text']}"
+        for number, partial in enumerate(partials, start=1)
+    )
+
+
+def group_partials(partials, token_budget=None):
+    """Split partial results, in order, into groups that each fit one reduce prompt"""
+    token_budget = token_budget or Config.MAP_REDUCE_REDUCE_TOKENS
+    groups = []
+    used_tokens = 0
+    for partial in partials:
+        tokens = estimate_tokens(partial["text"])
+        if groups and used_tokens + tokens <= token_budget:
+            groups[-1].append(partial)
+            used_tokens += tokens
+        else:
+            groups.append([partial])
+            used_tokens = tokens
+    return groups
+
+
+def merge_groups(partials, token_budget=None):
+    """Group partial results for the next merge round, or None once they fit a single reduce prompt
+    (or cannot be combined any further)"""
+    groups = group_partials(partials, token_budget)
+    if len(groups) <= 1:
+        return None
+    if len(groups) == len(partials):
+        logger.warning(f"{len(partials)} partial results are each too long to merge in pairs; reducing them as they are")
+        return None
+    return groups
@@ -2,24 +2,132 @@
 import pymupdf
 import os
 import csv
+import shutil
+import hashlib
+import time
+import itertools
 import logging
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from config import Config
+from extraction_cache import ExtractionCache, hash_bytes, hash_file, new_manifest, read_manifest, write_manifest
+from text_store import PageBuffer, open_text_store, read_image_refs, write_image_refs
+from table_store import TABLE_STORE_VERSION, build_table_store
+from ledger_parser import LEDGER_DIR_NAME, build_ledger, parse_page_words, write_page_ledger
+from table_detection import detect_document_type, has_table_structure, resolve_table_strategy
+from telemetry import tracer
 
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Bump whenever the on-disk extraction output changes so stale cache entries are not reused
+EXTRACTOR_VERSION = 2
+
+# "all" writes every image occurrence, "dedup" each distinct image once, "lazy" only indexes them, "none" skips them
+IMAGE_MODES = ("all", "dedup", "lazy", "none")
+
+# A PDF can be given as a path, as its bytes (e.g. an upload) or as an already open pymupdf.Document
+BYTES_TYPES = (bytes, bytearray, memoryview)
+
+
+def source_data(pdf):
+    """The path or bytes a PDF can be (re)opened from"""
+    if isinstance(pdf, pymupdf.Document):
+        # pymupdf keeps the buffer a document was opened from
+        return pdf.stream if pdf.stream is not None else pdf.name
+    return pdf
+
+
+def source_name(pdf, name=None):
+    """Name used for logs and the extraction directory"""
+    if name:
+        return name
+    data = source_data(pdf)
+    if isinstance(data, BYTES_TYPES) or not data:
+        return "document"
+    return Path(data).stem
+
+
+def source_hash(pdf):
+    """Content hash of a PDF however it was given, so bytes and files of the same PDF share cache entries"""
+    data = source_data(pdf)
+    return hash_bytes(data) if isinstance(data, BYTES_TYPES) else hash_file(data)
+
+
+def source_size(pdf):
+    data = source_data(pdf)
+    return len(data) if isinstance(data, BYTES_TYPES) else os.path.getsize(data)
+
+
+def open_pdf(pdf):
+    """Open a path or bytes; an open document is returned as is"""
+    if isinstance(pdf, pymupdf.Document):
+        return pdf
+    if isinstance(pdf, BYTES_TYPES):
+        return pymupdf.open(stream=bytes(pdf) if isinstance(pdf, memoryview) else pdf, filetype="pdf")
+    return pymupdf.open(pdf)
+
+
+def page_result(page_num, records, tables):
+    """One extracted page as a stream item: both text layouts, table rows, image references and markers"""
+    result = {"page": page_num + 1, "text": "", "text_sorted": "", "tables": tables, "images": [], "markers": {}}
+    for method, args in records:
+        if method == "add_page":
+            result["text"], result["text_sorted"] = args[1], args[2]
+        elif method == "add_marker":
+            result["markers"][args[1]] = args[2]
+        elif method == "add_images":
+            result["images"] = args[1]
+    return result
+
+
+class ExtractionStream:
+    """Pages of an extraction in page order as they are written.
+
+    path is the extraction directory once iteration has finished (None if extraction failed);
+    closing the stream early abandons the extraction without publishing it.
+    """
+
+    def __init__(self, pages):
+        self._pages = pages
+        self.path = None
+
+    def __iter__(self):
+        self.path = yield from self._pages
+
+    def close(self):
+        self._pages.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
 class PDFExtractor:
-    def __init__(self):
+    def __init__(self, cache=None):
         logger.info("Initializing PDFExtractor")
         self.extraction_count = 0
+        self.cache = cache or ExtractionCache()
         logger.info("PDFExtractor initialized successfully")
     
-    def unlock_pdf(self, pdf_path, password=None):
-        logger.info(f"Attempting to open PDF: {pdf_path}")
+    def settings(self, table_strategy=None):
+        """Extractor settings that affect the output and therefore the cache key"""
+        return {
+            "table_strategy": table_strategy,
+            "extractor_version": EXTRACTOR_VERSION,
+            "text_format": Config.TEXT_STORE_FORMAT,
+            "table_store": TABLE_STORE_VERSION,
+            "image_mode": Config.IMAGE_MODE,
+        }
+    
+    def unlock_pdf(self, pdf, password=None):
+        """Open (if needed) and authenticate a PDF given as a path, bytes or an open document"""
+        logger.info(f"Attempting to open PDF: {source_name(pdf)}")
         try:
-            doc = pymupdf.open(pdf_path)
-            if doc.needs_pass:
+            doc = open_pdf(pdf)
+            # An open document that was already authenticated is no longer encrypted
+            if doc.needs_pass and doc.is_encrypted:
                 logger.info("PDF is password protected.")
                 if not password:
                     logger.error("Password required but not provided.")
@@ -36,80 +144,305 @@ class PDFExtractor:
             logger.error(f"Error opening PDF: {e}")
             return None
     
-    # This function signature is the one that needs to be updated.
-    def extract_pdf_content(self, pdf_path, output_dir=None, password=None):
-        logger.info(f"Starting PDF content extraction: {pdf_path}")
-        
-        doc = self.unlock_pdf(pdf_path, password=password)
+    def extract_pdf_content(self, pdf, output_dir=None, password=None, workers=None, use_cache=None, document_type=None, name=None):
+        """Extract a PDF given as a path, bytes or an open pymupdf.Document; name labels in-memory documents.
+        A document passed in open stays open for the caller."""
+        stream = ExtractionStream(self._stream_pdf_content(pdf, source_name(pdf, name), output_dir, password, workers,
+                                                           use_cache, document_type, replay_cached=False))
+        for _ in stream:
+            pass
+        return stream.path
+    
+    def stream_pdf_content(self, pdf, output_dir=None, password=None, workers=None, use_cache=None, document_type=None, name=None):
+        """Extract a PDF page by page: the returned ExtractionStream yields each page (see page_result) as soon as it
+        is written, so memory stays flat however long the document is. A cached extraction is streamed from disk."""
+        return ExtractionStream(self._stream_pdf_content(pdf, source_name(pdf, name), output_dir, password, workers,
+                                                         use_cache, document_type, replay_cached=True))
+    
+    def _stream_pdf_content(self, pdf, pdf_name, output_dir, password, workers, use_cache, document_type, replay_cached):
+        logger.info(f"Starting PDF content extraction: {pdf_name}")
+        with tracer.span("extract", pdf=pdf_name) as span:
+            return (yield from self._extract_pdf_content(span, pdf, pdf_name, output_dir, password, workers, use_cache,
+                                                         document_type, replay_cached))
+    
+    def _extract_pdf_content(self, span, pdf, pdf_name, output_dir, password, workers, use_cache, document_type, replay_cached):
+        # Always unlock first so a cached extraction is never served without the password
+        doc = self.unlock_pdf(pdf, password=password)
         if doc is None:
             logger.error("Failed to open or unlock the PDF document.")
+            span.set(result="unreadable")
             return None
+        owns_doc = doc is not pdf
+        span.set(pages=len(doc), bytes=source_size(pdf))
 
-        if output_dir is None:
-            pdf_name = Path(pdf_path).stem
-            output_dir = Config.EXTRACTIONS_DIR / f"{pdf_name}_extracted"
+        if use_cache is None:
+            use_cache = Config.EXTRACTION_CACHE_ENABLED
+        
+        if Config.IMAGE_MODE not in IMAGE_MODES:
+            if owns_doc:
+                doc.close()
+            raise ValueError(f"Unknown image mode '{Config.IMAGE_MODE}', expected one of {', '.join(IMAGE_MODES)}")
+        
+        if document_type is None:
+            document_type = detect_document_type(doc[0].get_text() if len(doc) else "")
+        table_strategy = resolve_table_strategy(document_type)
+        
+        settings = self.settings(table_strategy)
+        with tracer.span("extract.hash"):
+            content_hash = source_hash(doc)
+        key = ExtractionCache.make_key(content_hash, settings)
+        
+        publish = output_dir is None
+        if publish:
+            if use_cache:
+                cached_dir = self.cache.lookup(key)
+                tracer.count("cache_requests", cache="extraction", result="miss" if cached_dir is None else "hit")
+                if cached_dir is not None:
+                    span.set(cache_hit=True)
+                    if owns_doc:
+                        doc.close()
+                    if replay_cached:
+                        from data_loader import FinancialDataLoader
+                        yield from FinancialDataLoader(cached_dir).iter_pages()
+                    return cached_dir
+            output_dir = self.cache.staging_dir(key, pdf_name)
+        output_dir = Path(output_dir)
+        span.set(cache_hit=False, document_type=document_type)
         
         text_dir = output_dir / "text"
         tables_dir = output_dir / "tables"
         images_dir = output_dir / "images"
         
         for directory in [text_dir, tables_dir, images_dir]:
+            if directory is images_dir and Config.IMAGE_MODE == "none":
+                continue
             directory.mkdir(parents=True, exist_ok=True)
         
+        manifest = new_manifest(key, content_hash, pdf_name, settings, len(doc))
+        write_manifest(output_dir, manifest)
+        
+        store = open_text_store(output_dir, Config.TEXT_STORE_FORMAT)
         try:
-            for page_num in range(len(doc)):
-                page = doc[page_num]
-                self._extract_text(page, page_num, text_dir)
-                self._extract_tables(page, page_num, tables_dir)
-                self._extract_images(doc, page, page_num, images_dir)
+            workers = self._resolve_workers(workers, len(doc))
+            table_stats = {"pages": 0, "scanned": 0, "skipped": 0, "tables": 0}
+            stage_seconds = {"text": 0.0, "tables": 0.0, "ledger": 0.0, "images": 0.0}
+            with tracer.span("extract.pages", pages=len(doc), workers=workers):
+                if workers > 1:
+                    pages = self._iter_pages_parallel(doc, password, len(doc), output_dir, workers, table_strategy,
+                                                      table_stats, stage_seconds)
+                else:
+                    pages = self._iter_pages(doc, range(len(doc)), output_dir, table_strategy, table_stats, stage_seconds)
+                # Each page goes to the store as it arrives and is handed on; nothing is kept per page but its index entry
+                for page_num, records, tables in pages:
+                    PageBuffer.replay_records(records, store)
+                    yield page_result(page_num, records, tables)
+                # Per-page stage times summed over the document (and over workers when parallel)
+                for stage, seconds in stage_seconds.items():
+                    tracer.record(f"extract.{stage}", seconds, workers=workers)
+            span.set(tables=table_stats["tables"], table_pages_scanned=table_stats["scanned"])
+            table_stats["document_type"] = document_type
+            manifest["table_detection"] = table_stats
+            logger.info(
+                f"Table detection ({document_type}): scanned {table_stats['scanned']} of {table_stats['pages']} pages, "
+                f"skipped {table_stats['skipped']}, found {table_stats['tables']} tables"
+            )
+            with tracer.span("extract.table_store"):
+                self._build_table_store(output_dir)
+            with tracer.span("extract.ledger_store") as ledger_span:
+                ledger_span.set(transactions=self._build_ledger(output_dir))
+            self._mark_stages(output_dir, manifest, "text", "tables", "images")
+            
+            with tracer.span("extract.metadata"):
+                self._extract_metadata(doc, store)
+                store.close()
+            self._mark_stages(output_dir, manifest, "metadata")
             
-            self._extract_metadata(doc, text_dir)
+            manifest["complete"] = True
+            write_manifest(output_dir, manifest)
+            if publish:
+                with tracer.span("extract.publish"):
+                    output_dir = self.cache.publish(output_dir, key, pdf_name)
             logger.info(f"✓ Extraction complete! Results saved in: {output_dir}")
             return output_dir
             
+        except GeneratorExit:
+            # The consumer stopped reading the stream: the extraction is incomplete, so it is never published
+            logger.info(f"Extraction of {pdf_name} abandoned by the consumer")
+            span.set(result="abandoned")
+            if publish:
+                shutil.rmtree(output_dir, ignore_errors=True)
+            raise
         except Exception as e:
             logger.error(f"Error during extraction: {e}")
+            span.error = str(e)
+            if publish:
+                shutil.rmtree(output_dir, ignore_errors=True)
             return None
         finally:
-            if doc:
+            if owns_doc:
                 doc.close()
                 logger.info("PDF document closed")
 
-    def _extract_text(self, page, page_num, text_dir):
-        text = page.get_text()
-        text_file = text_dir / f"page_{page_num + 1}_text.txt"
-        with open(text_file, "w", encoding="utf-8") as f:
-            f.write(text)
+    def _mark_stages(self, output_dir, manifest, *stages):
+        """Record finished stages so a crashed extraction is never mistaken for a valid one"""
+        for stage in stages:
+            manifest["stages"][stage] = True
+        write_manifest(output_dir, manifest)
+
+    def _build_table_store(self, output_dir):
+        """Merge the page CSVs into the typed table store; the raw CSVs remain usable if this fails"""
+        try:
+            build_table_store(output_dir)
+        except Exception as e:
+            logger.error(f"Error building table store: {e}")
+
+    def _build_ledger(self, output_dir):
+        """Assign columns to the ledger lines found on table-less pages and store them typed; returns the row count"""
+        try:
+            return build_ledger(output_dir)
+        except Exception as e:
+            logger.error(f"Error building ledger: {e}")
+            return None
+
+    def _resolve_workers(self, workers, page_count):
+        """Decide how many worker processes to use for a document"""
+        if workers is None:
+            workers = Config.EXTRACTION_WORKERS
+        if workers <= 0:
+            workers = os.cpu_count() or 1
+        if page_count < Config.PARALLEL_MIN_PAGES:
+            return 1
+        return max(1, min(workers, page_count))
+
+    def _iter_pages(self, doc, page_numbers, output_dir, table_strategy, table_stats, stage_seconds):
+        """Extract the given pages of an open document one at a time, yielding (page_num, store records, tables).
+        Table detection counts and the seconds spent in each stage are added to table_stats and stage_seconds."""
+        # xref -> saved image file, so an image repeated on every page is decoded and written once
+        saved_images = {}
+        for done, page_num in enumerate(page_numbers, start=1):
+            yield (page_num, *self._extract_page(doc, page_num, output_dir, table_strategy, table_stats,
+                                                 stage_seconds, saved_images))
+            # MuPDF caches decoded fonts and images across pages; emptying it keeps long documents from growing
+            if done % Config.EXTRACTION_STORE_RESET_PAGES == 0:
+                pymupdf.TOOLS.store_shrink(100)
+
+    def _extract_page(self, doc, page_num, output_dir, table_strategy, table_stats, stage_seconds, saved_images):
+        """Extract one page into a PageBuffer; the page object is released when this returns"""
+        buffer = PageBuffer()
+        page = doc[page_num]
+        started = time.perf_counter()
+        self._extract_text(page, page_num, buffer)
+        text_done = time.perf_counter()
+        tables = self._extract_tables(page, page_num, output_dir / "tables", buffer, table_strategy, table_stats)
+        tables_done = time.perf_counter()
+        if not tables:
+            self._extract_ledger(page, page_num, output_dir / LEDGER_DIR_NAME, buffer, table_strategy)
+        ledger_done = time.perf_counter()
+        self._extract_images(doc, page, page_num, output_dir / "images", buffer, saved_images)
+        stage_seconds["text"] += text_done - started
+        stage_seconds["tables"] += tables_done - text_done
+        stage_seconds["ledger"] += ledger_done - tables_done
+        stage_seconds["images"] += time.perf_counter() - ledger_done
+        return buffer.records, tables
+
+    def _iter_pages_parallel(self, doc, password, page_count, output_dir, workers, table_strategy, table_stats, stage_seconds):
+        """Split the page range into contiguous chunks, extract them in a process pool and yield pages in order"""
+        # A few chunks per worker keeps the pool busy when some pages are much slower than others;
+        # the cap bounds how many pages a finished chunk holds in memory
+        chunk_size = max(1, min(Config.PARALLEL_MAX_CHUNK_PAGES, -(-page_count // (workers * 4))))
+        ranges = ((start, min(start + chunk_size, page_count)) for start in range(0, page_count, chunk_size))
+        logger.info(f"Extracting {page_count} pages with {workers} workers in chunks of {chunk_size}")
         
+        # Each worker receives the path or bytes once and opens its own copy of the document
+        source = source_data(doc)
+        if not isinstance(source, BYTES_TYPES):
+            source = str(source)
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_page_worker, initargs=(source,)) as pool:
+            def submit(page_range):
+                return pool.submit(_extract_page_range, password, *page_range, str(output_dir), table_strategy)
+            # Only a couple of chunks per worker are in flight, so a slow consumer never has the whole document
+            # waiting in finished futures
+            pending = deque(submit(page_range) for page_range in itertools.islice(ranges, workers * 2))
+            try:
+                while pending:
+                    pages, chunk_stats, chunk_seconds = pending.popleft().result()
+                    next_range = next(ranges, None)
+                    if next_range is not None:
+                        pending.append(submit(next_range))
+                    for name, count in chunk_stats.items():
+                        table_stats[name] += count
+                    for stage, seconds in chunk_seconds.items():
+                        stage_seconds[stage] += seconds
+                    # Replaying in submission order keeps the text store in page order
+                    yield from pages
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def _extract_text(self, page, page_num, store):
+        text = page.get_text()
         text_sorted = page.get_text(sort=True)
-        text_sorted_file = text_dir / f"page_{page_num + 1}_text_sorted.txt"
-        with open(text_sorted_file, "w", encoding="utf-8") as f:
-            f.write(text_sorted)
+        store.add_page(page_num, text, text_sorted)
     
-    def _extract_tables(self, page, page_num, tables_dir):
+    def _extract_tables(self, page, page_num, tables_dir, store, table_strategy=None, table_stats=None):
+        """Write the page's tables as CSVs; returns them as [{"name": csv file name, "rows": [[cell, ...], ...]}]"""
+        if table_strategy is None:
+            table_strategy = resolve_table_strategy("default")
+        if table_stats is None:
+            table_stats = {"pages": 0, "scanned": 0, "skipped": 0, "tables": 0}
+        table_stats["pages"] += 1
+        written = []
         try:
-            tables = page.find_tables()
+            # find_tables dominates extraction time, so pages without table structure never reach it
+            if not table_strategy.get("enabled", True) or not has_table_structure(page, table_strategy):
+                table_stats["skipped"] += 1
+                store.add_marker(page_num, "no_tables", "No tables detected on this page.")
+                return written
+            table_stats["scanned"] += 1
+            tables = page.find_tables(**table_strategy.get("find_tables", {}))
+            table_stats["tables"] += len(tables.tables)
             if tables.tables:
                 for table_num, table in enumerate(tables.tables):
                     table_data = table.extract()
                     if table_data:
                         csv_file = tables_dir / f"page_{page_num + 1}_table_{table_num + 1}.csv"
+                        rows = [[str(cell).strip() if cell is not None else "" for cell in row] for row in table_data]
                         with open(csv_file, "w", newline="", encoding="utf-8") as f:
-                            writer = csv.writer(f)
-                            for row in table_data:
-                                cleaned_row = [str(cell).strip() if cell is not None else "" for cell in row]
-                                writer.writerow(cleaned_row)
+                            csv.writer(f).writerows(rows)
+                        written.append({"name": csv_file.name, "rows": rows})
             else:
-                with open(tables_dir / f"page_{page_num + 1}_no_tables.txt", "w") as f:
-                    f.write("No tables detected on this page.")
+                store.add_marker(page_num, "no_tables", "No tables detected on this page.")
         except Exception as e:
-            with open(tables_dir / f"page_{page_num + 1}_table_error.txt", "w") as f:
-                f.write(f"Error extracting tables: {e}")
+            store.add_marker(page_num, "table_error", f"Error extracting tables: {e}")
+        return written
     
-    def _extract_images(self, doc, page, page_num, images_dir):
+    def _extract_ledger(self, page, page_num, ledger_dir, store, table_strategy=None):
+        """Find transaction lines in the word positions of a page without tables (borderless statements);
+        candidate lines are written per page and typed once the whole document is seen"""
+        if table_strategy is None:
+            table_strategy = resolve_table_strategy("default")
+        if not table_strategy.get("ledger", False):
+            return None
+        try:
+            parsed = parse_page_words(page.get_text("words"))
+            if parsed:
+                write_page_ledger(ledger_dir, page_num + 1, parsed)
+            return parsed
+        except Exception as e:
+            store.add_marker(page_num, "ledger_error", f"Error parsing ledger lines: {e}")
+            return None
+
+    def _extract_images(self, doc, page, page_num, images_dir, store, saved_images=None):
+        if Config.IMAGE_MODE == "none":
+            return
+        if saved_images is None:
+            saved_images = {}
         try:
             image_list = page.get_images()
-            if image_list:
+            if not image_list:
+                store.add_marker(page_num, "no_images", "No images detected on this page.")
+                return
+            if Config.IMAGE_MODE == "all":
                 for img_index, img in enumerate(image_list):
                     xref = img[0]
                     extracted_image = doc.extract_image(xref)
@@ -119,22 +452,97 @@ class PDFExtractor:
                         image_file = images_dir / f"page_{page_num + 1}_image_{img_index + 1}.{image_ext}"
                         with open(image_file, "wb") as f:
                             f.write(image_bytes)
-            else:
-                with open(images_dir / f"page_{page_num + 1}_no_images.txt", "w") as f:
-                    f.write("No images detected on this page.")
+                return
+            
+            refs = []
+            for img in image_list:
+                xref, width, height = img[0], img[2], img[3]
+                image_file = None
+                if Config.IMAGE_MODE == "dedup":
+                    if xref not in saved_images:
+                        saved_images[xref] = self._save_image(doc, xref, images_dir)
+                    image_file = saved_images[xref]
+                refs.append({"xref": xref, "width": width, "height": height, "file": image_file})
+            store.add_images(page_num, refs)
         except Exception as e:
-            with open(images_dir / f"page_{page_num + 1}_image_error.txt", "w") as f:
-                f.write(f"Error extracting images: {e}")
+            store.add_marker(page_num, "image_error", f"Error extracting images: {e}")
+    
+    def _save_image(self, doc, xref, images_dir):
+        """Write an image once under its content hash; returns its path relative to the extraction"""
+        extracted_image = doc.extract_image(xref)
+        if not extracted_image:
+            return None
+        image_bytes = extracted_image["image"]
+        digest = hashlib.sha256(image_bytes).hexdigest()[:16]
+        image_file = images_dir / f"{digest}.{extracted_image['ext']}"
+        # Different xrefs (or parallel workers) can carry identical bytes; the first writer wins
+        if not image_file.exists():
+            images_dir.mkdir(parents=True, exist_ok=True)
+            tmp_file = image_file.with_name(f".{image_file.name}.{os.getpid()}.tmp")
+            with open(tmp_file, "wb") as f:
+                f.write(image_bytes)
+            os.replace(tmp_file, image_file)
+        return f"images/{image_file.name}"
     
-    def _extract_metadata(self, doc, text_dir):
-        metadata = doc.metadata
-        metadata_file = text_dir / "metadata.txt"
-        with open(metadata_file, "w", encoding="utf-8") as f:
-            f.write("PDF Metadata:\n")
-            f.write("=" * 50 + "\n")
-            for key, value in metadata.items():
-                f.write(f"{key}: {value}\n")
-            f.write(f"\nDocument Properties:\n")
-            f.write("=" * 50 + "\n")
-            f.write(f"Total pages: {len(doc)}\n")
-            f.write(f"PDF is encrypted: {doc.is_encrypted}\n")
\ No newline at end of file
+    def materialize_images(self, extraction_path, pdf, password=None, pages=None):
+        """Extract the images of a lazily indexed extraction on demand.
+
+        Returns {page number: [refs]} with each ref's "file" filled in. The PDF (a path, bytes
+        or open document) must be the one the extraction was made from.
+        """
+        manifest = read_manifest(extraction_path)
+        if manifest and manifest.get("content_hash") and source_hash(pdf) != manifest["content_hash"]:
+            raise ValueError(f"{source_name(pdf)} is not the document extracted to {extraction_path}")
+        doc = self.unlock_pdf(pdf, password=password)
+        if doc is None:
+            raise ValueError(f"Could not open or unlock {source_name(pdf)}")
+        images_dir = Path(extraction_path) / "images"
+        saved_images = {}
+        materialized = {}
+        try:
+            for page_number, refs in read_image_refs(extraction_path).items():
+                if pages is not None and page_number not in pages:
+                    continue
+                for ref in refs:
+                    if not ref.get("file"):
+                        if ref["xref"] not in saved_images:
+                            saved_images[ref["xref"]] = self._save_image(doc, ref["xref"], images_dir)
+                        ref["file"] = saved_images[ref["xref"]]
+                materialized[page_number] = refs
+        finally:
+            if doc is not pdf:
+                doc.close()
+        logger.info(f"Materialized {len(saved_images)} distinct images for {len(materialized)} pages")
+        if saved_images:
+            # Later reads (get_page_images, another materialize call) see the files instead of extracting them again
+            write_image_refs(extraction_path, materialized)
+            self.cache.record_size(extraction_path)
+        return materialized
+    
+    def _extract_metadata(self, doc, store):
+        store.set_metadata(doc.metadata, len(doc), doc.is_encrypted)
+
+
+# Path or bytes of the document a page worker process extracts from, set once per process
+_worker_source = None
+
+
+def _init_page_worker(source):
+    global _worker_source
+    _worker_source = source
+
+
+def _extract_page_range(password, start, end, output_dir, table_strategy=None):
+    """Worker entry point: open the PDF in this process, extract pages [start, end) and return the pages as
+    (page_num, store records, tables) with the table detection counts and stage times"""
+    extractor = PDFExtractor()
+    doc = extractor.unlock_pdf(_worker_source, password=password)
+    if doc is None:
+        raise RuntimeError(f"Worker could not open or unlock {source_name(_worker_source)}")
+    table_stats = {"pages": 0, "scanned": 0, "skipped": 0, "tables": 0}
+    stage_seconds = {"text": 0.0, "tables": 0.0, "ledger": 0.0, "images": 0.0}
+    try:
+        pages = list(extractor._iter_pages(doc, range(start, end), Path(output_dir), table_strategy, table_stats, stage_seconds))
+    finally:
+        doc.close()
+    return pages, table_stats, stage_seconds
@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import random
+import threading
+import time
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucket:
+    """Refills at rate_per_minute up to capacity; reservations may go into debt and wait it off.
+
+    Thread-safe and independent of any event loop, so one bucket can be shared by every
+    session in the process.
+    """
+
+    def __init__(self, rate_per_minute, capacity=None):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity or rate_per_minute
+        self.level = float(self.capacity)
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount):
+        """Take amount from the bucket; returns how many seconds to wait before using it"""
+        # A single request larger than the whole bucket would otherwise wait forever
+        amount = min(amount, self.capacity)
+        with self._lock:
+            now = time.monotonic()
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+            self.updated = now
+            self.level -= amount
+            return 0.0 if self.level >= 0 else -self.level / self.rate
+
+
+def is_rate_limit_error(error):
+    """True for provider 429s, whether raised by litellm, the OpenAI client or a plain HTTP error.
+
+    Errors re-raised by CrewAI are followed to their cause. Only the status code and the
+    RateLimitError type count, never digits in the message.
+    """
+    seen = set()
+    while error is not None and id(error) not in seen:
+        seen.add(id(error))
+        if getattr(error, "status_code", None) == 429:
+            return True
+        if getattr(getattr(error, "response", None), "status_code", None) == 429:
+            return True
+        # openai.RateLimitError and litellm's subclass of it, matched by name so neither has to be imported
+        if any(cls.__name__ == "RateLimitError" for cls in type(error).__mro__):
+            return True
+        error = error.__cause__ or error.__context__
+    return False
+
+
+def retry_after(error):
+    """Seconds the provider asked us to wait, if the error carries a Retry-After header"""
+    headers = getattr(error, "litellm_response_headers", None)
+    if not headers:
+        headers = getattr(getattr(error, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class RateLimiter:
+    """Requests/min and tokens/min token buckets plus a cap on LLM calls in flight, with 429 backoff"""
+
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(self, requests_per_minute=None, tokens_per_minute=None, max_concurrency=None,
+                 max_retries=None, base_delay=None, max_delay=None):
+        self.requests = TokenBucket(requests_per_minute or Config.LLM_REQUESTS_PER_MINUTE)
+        self.tokens = TokenBucket(tokens_per_minute or Config.LLM_TOKENS_PER_MINUTE)
+        self.max_concurrency = max_concurrency or Config.LLM_MAX_CONCURRENCY
+        self.max_retries = Config.LLM_MAX_RETRIES if max_retries is None else max_retries
+        self.base_delay = base_delay or Config.LLM_RETRY_BASE_DELAY
+        self.max_delay = max_delay or Config.LLM_RETRY_MAX_DELAY
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self.stats = {"calls": 0, "retries": 0, "throttled_seconds": 0.0, "max_in_flight": 0}
+
+    @classmethod
+    def shared(cls):
+        """The process-wide limiter, so every FinSight instance draws on the same provider quota"""
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    async def _enter(self):
+        delay = 0.005
+        while True:
+            with self._lock:
+                if self._in_flight < self.max_concurrency:
+                    self._in_flight += 1
+                    self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+                    return
+            # Polling keeps the cap valid across event loops (e.g. one per Streamlit session thread)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.1)
+
+    def _exit(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    async def _throttle(self, requests, tokens):
+        wait = max(self.requests.reserve(requests), self.tokens.reserve(tokens))
+        if wait > 0:
+            self.stats["throttled_seconds"] += wait
+            logger.info(f"Rate limit: waiting {wait:.2f}s for {requests} requests / {tokens} tokens of quota")
+            await asyncio.sleep(wait)
+
+    async def run(self, call, requests=1, tokens=0):
+        """Await call() within the limits, retrying 429s with exponential backoff and jitter"""
+        attempt = 0
+        while True:
+            await self._throttle(requests, tokens)
+            await self._enter()
+            try:
+                self.stats["calls"] += 1
+                return await call()
+            except Exception as e:
+                if not is_rate_limit_error(e) or attempt >= self.max_retries:
+                    raise
+                delay = retry_after(e) or min(self.max_delay, self.base_delay * 2 ** attempt)
+                delay *= random.uniform(1.0, 1.5)
+                attempt += 1
+                self.stats["retries"] += 1
+                logger.warning(f"Rate limited by the provider, retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            finally:
+                self._exit()
+            await asyncio.sleep(delay)
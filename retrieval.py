@@ -0,0 +1,163 @@
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+
+from config import Config
+from data_loader import document_cache
+from extraction_cache import read_manifest
+from token_utils import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+INDEX_NAME = "retrieval_index.json"
+INDEX_VERSION = 1
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+
+
+def tokenize(text):
+    """Lowercase word and number tokens; amounts like 1,234.50 stay one token"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+def chunk_pages(page_texts, chunk_lines):
+    """Split page texts into chunks of at most chunk_lines non-empty lines, never crossing a page"""
+    chunks = []
+    for page_number, text in page_texts:
+        lines = [(number, line) for number, line in enumerate(text.splitlines(), start=1) if line.strip()]
+        for start in range(0, len(lines), chunk_lines):
+            window = lines[start:start + chunk_lines]
+            chunks.append({
+                "page": page_number,
+                "lines": [window[0][0], window[-1][0]],
+                "text": "\n".join(line for _, line in window),
+            })
+    return chunks
+
+
+class RetrievalIndex:
+    """Offline BM25 index over page and line chunks of one extraction"""
+
+    def __init__(self, chunks, postings, avgdl, source_key=None, k1=1.5, b=0.75):
+        self.chunks = chunks
+        self.postings = postings
+        self.avgdl = avgdl
+        self.source_key = source_key
+        self.k1 = k1
+        self.b = b
+
+    @classmethod
+    def build(cls, page_texts, chunk_lines=None, source_key=None):
+        """Build an index from (page_number, text) pairs"""
+        chunks = chunk_pages(page_texts, chunk_lines or Config.RETRIEVAL_CHUNK_LINES)
+        postings = {}
+        total_length = 0
+        for chunk_id, chunk in enumerate(chunks):
+            terms = Counter(tokenize(chunk["text"]))
+            chunk["length"] = sum(terms.values())
+            total_length += chunk["length"]
+            for term, frequency in terms.items():
+                postings.setdefault(term, []).append([chunk_id, frequency])
+        avgdl = total_length / len(chunks) if chunks else 0.0
+        logger.info(f"Built retrieval index with {len(chunks)} chunks and {len(postings)} terms")
+        return cls(chunks, postings, avgdl, source_key=source_key)
+
+    def search(self, query, top_k=None):
+        """Return (score, chunk) pairs for the best matching chunks, highest score first"""
+        top_k = top_k or Config.RETRIEVAL_TOP_K
+        chunk_count = len(self.chunks)
+        scores = Counter()
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            idf = math.log(1 + (chunk_count - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for chunk_id, frequency in term_postings:
+                length_norm = 1 - self.b + self.b * self.chunks[chunk_id]["length"] / (self.avgdl or 1)
+                scores[chunk_id] += idf * frequency * (self.k1 + 1) / (frequency + self.k1 * length_norm)
+        return [(score, self.chunks[chunk_id]) for chunk_id, score in scores.most_common(top_k)]
+
+    def retrieve(self, query, top_k=None, token_budget=None):
+        """Pick the best chunks that fit the token budget and return them in document order"""
+        token_budget = token_budget or Config.RETRIEVAL_TOKEN_BUDGET
+        ranked = [chunk for _, chunk in self.search(query, top_k)]
+        if not ranked:
+            # Nothing matched the question's terms, so fall back to the start of the document
+            ranked = self.chunks[:top_k or Config.RETRIEVAL_TOP_K]
+        selected = []
+        used = 0
+        for chunk in ranked:
+            cost = estimate_tokens(chunk["text"])
+            if used + cost > token_budget:
+                continue
+            selected.append(chunk)
+            used += cost
+        return sorted(selected, key=lambda chunk: (chunk["page"], chunk["lines"][0]))
+
+    @staticmethod
+    def format_chunks(chunks):
+        """Render chunks with page and line citations for a prompt"""
+        return "\n\n".join(
+            f"[Page {chunk['page']}, lines {chunk['lines'][0]}-{chunk['lines'][1]}]\n{chunk['text']}"
+            for chunk in chunks
+        )
+
+    def save(self, extraction_path):
+        index_file = Path(extraction_path) / INDEX_NAME
+        tmp_file = index_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "source_key": self.source_key,
+                "k1": self.k1,
+                "b": self.b,
+                "avgdl": self.avgdl,
+                "chunks": self.chunks,
+                "postings": self.postings,
+            }, f)
+        os.replace(tmp_file, index_file)
+        logger.info(f"Saved retrieval index: {index_file}")
+
+    @classmethod
+    def load(cls, extraction_path):
+        """Load a saved index, or None when it is missing or was built for a different extraction"""
+        index_file = Path(extraction_path) / INDEX_NAME
+        try:
+            with open(index_file, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        manifest = read_manifest(extraction_path) or {}
+        if data.get("version") != INDEX_VERSION or data.get("source_key") != manifest.get("cache_key"):
+            logger.info(f"Ignoring stale retrieval index: {index_file}")
+            return None
+        return cls(data["chunks"], data["postings"], data["avgdl"], data["source_key"], data["k1"], data["b"])
+
+    def memory_size(self):
+        """Rough in-memory size in bytes, for the document cache's limit"""
+        postings = sum(len(entries) for entries in self.postings.values())
+        return sum(len(chunk["text"]) + 200 for chunk in self.chunks) + 100 * postings + 80 * len(self.postings)
+
+    @classmethod
+    def load_or_build(cls, extraction_path, data_loader, cache=None):
+        """The index of an extraction from the shared document cache, loaded from disk or built and saved on a miss
+        (and counted towards the size of the ExtractionCache holding the extraction, if given)"""
+        manifest = read_manifest(extraction_path) or {}
+        key = (str(Path(extraction_path).resolve()), "retrieval")
+        return document_cache.get_or_load(key, (manifest.get("cache_key"), INDEX_VERSION),
+                                          lambda: cls._load_or_build(extraction_path, data_loader, manifest, cache),
+                                          cls.memory_size)
+
+    @classmethod
+    def _load_or_build(cls, extraction_path, data_loader, manifest, cache):
+        index = cls.load(extraction_path)
+        if index is None:
+            index = cls.build(data_loader.iter_page_texts("sorted"), source_key=manifest.get("cache_key"))
+            index.save(extraction_path)
+            if cache is not None:
+                cache.record_size(extraction_path)
+        return index
@@ -0,0 +1,116 @@
+import contextvars
+import logging
+import queue
+import threading
+
+logger = logging.getLogger(__name__)
+
+# task id -> (event queue, task label, task position, task count)
+_routes = {}
+_routes_lock = threading.Lock()
+_installed = False
+
+
+def _route(task_id):
+    if task_id is None:
+        return None
+    with _routes_lock:
+        return _routes.get(str(task_id))
+
+
+def _on_task_started(source, event):
+    route = _route(event.task.id if event.task else None)
+    if route:
+        events, label, position, total = route
+        events.put({"type": "task_started", "task": label, "index": position, "total": total})
+
+
+def _on_task_completed(source, event):
+    route = _route(event.task.id if event.task else None)
+    if route:
+        events, label, position, total = route
+        events.put({"type": "task_completed", "task": label, "index": position, "total": total,
+                    "output": event.output.raw if event.output else ""})
+
+
+def _on_task_failed(source, event):
+    route = _route(event.task.id if event.task else None)
+    if route:
+        events, label, position, total = route
+        events.put({"type": "task_failed", "task": label, "index": position, "total": total, "error": event.error})
+
+
+def _on_stream_chunk(source, event):
+    # LLM events only carry the task id; the task object itself is cleared when the event is built
+    route = _route(event.task_id)
+    if route and event.chunk and not event.tool_call:
+        events, label, _, _ = route
+        events.put({"type": "token", "task": label, "text": event.chunk})
+
+
+def _install_handlers():
+    """Register one set of event bus handlers for the process; they route events to whichever stream owns the task"""
+    global _installed
+    from crewai.events import (
+        LLMStreamChunkEvent,
+        TaskCompletedEvent,
+        TaskFailedEvent,
+        TaskStartedEvent,
+        crewai_event_bus,
+    )
+    with _routes_lock:
+        if _installed:
+            return
+        crewai_event_bus.on(TaskStartedEvent)(_on_task_started)
+        crewai_event_bus.on(TaskCompletedEvent)(_on_task_completed)
+        crewai_event_bus.on(TaskFailedEvent)(_on_task_failed)
+        crewai_event_bus.on(LLMStreamChunkEvent)(_on_stream_chunk)
+        _installed = True
+
+
+def stream_crew(crew, labels, inputs=None):
+    """Run a crew on a background thread and yield progress events as they happen.
+
+    Yields dicts with a "type" of task_started, token, task_completed, task_failed,
+    and finally either result (with the final "text") or error.
+    """
+    _install_handlers()
+    events = queue.Queue()
+    task_ids = [str(task.id) for task in crew.tasks]
+    with _routes_lock:
+        for position, (task_id, label) in enumerate(zip(task_ids, labels), start=1):
+            _routes[task_id] = (events, label, position, len(task_ids))
+
+    def run():
+        try:
+            events.put({"type": "result", "text": str(crew.kickoff(inputs=inputs))})
+        except Exception as e:
+            logger.error(f"Streaming crew failed: {e}")
+            events.put({"type": "error", "error": str(e)})
+
+    # The caller's context goes with the kickoff, so its task and LLM spans nest under the caller's span
+    worker = threading.Thread(target=contextvars.copy_context().run, args=(run,), name="finsight-stream", daemon=True)
+    worker.start()
+    try:
+        while True:
+            event = events.get()
+            yield event
+            if event["type"] in ("result", "error"):
+                break
+    finally:
+        with _routes_lock:
+            for task_id in task_ids:
+                _routes.pop(task_id, None)
+
+
+def collect_text(events, on_event=None):
+    """Drain a stream of events and return the final text, calling on_event for each one"""
+    text = ""
+    for event in events:
+        if on_event:
+            on_event(event)
+        if event["type"] == "result":
+            text = event["text"]
+        elif event["type"] == "error":
+            text = f"Error: {event['error']}"
+    return text
@@ -0,0 +1,144 @@
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Replies use the ReAct final answer marker that CrewAI agents expect from the model
+REPLY_TEMPLATE = "Thought: I now know the final answer\nFinal Answer: Stub answer for a prompt of {chars} characters."
+
+
+class StubLLMServer:
+    """Local OpenAI-compatible chat completions endpoint for exercising concurrency and rate limiting.
+
+    Point the app at it with OPENAI_BASE_URL=<server.url>. Requests beyond max_concurrent in flight,
+    and the first fail_first requests, get a 429 with a Retry-After header.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.0, max_concurrent=None, fail_first=0, retry_after=0.1):
+        self.latency = latency
+        self.max_concurrent = max_concurrent
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+        self.stats = {"requests": 0, "completed": 0, "rejected": 0, "max_in_flight": 0}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def _admit(self):
+        with self._lock:
+            self.stats["requests"] += 1
+            over_limit = self.max_concurrent is not None and self._in_flight >= self.max_concurrent
+            if self.stats["requests"] <= self.fail_first or over_limit:
+                self.stats["rejected"] += 1
+                return False
+            self._in_flight += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self._in_flight)
+            return True
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+            self.stats["completed"] += 1
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status, body, headers=None):
+                payload = json.dumps(body).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def do_POST(self):
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if not server._admit():
+                    self._send_json(429, {"error": {"message": "Rate limit reached", "type": "requests", "code": "rate_limit_exceeded"}},
+                                    {"Retry-After": str(server.retry_after)})
+                    return
+                try:
+                    time.sleep(server.latency)
+                    prompt = "\n".join(str(message.get("content", "")) for message in request.get("messages", []))
+                    reply = REPLY_TEMPLATE.format(chars=len(prompt))
+                    if request.get("stream"):
+                        self._send_stream(request, reply)
+                    else:
+                        self._send_json(200, {
+                            "id": f"chatcmpl-{uuid.uuid4().hex}",
+                            "object": "chat.completion",
+                            "created": int(time.time()),
+                            "model": request.get("model", "stub"),
+                            "choices": [{"index": 0, "message": {"role": "assistant", "content": reply}, "finish_reason": "stop"}],
+                            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(reply) // 4,
+                                      "total_tokens": (len(prompt) + len(reply)) // 4},
+                        })
+                finally:
+                    server._release()
+
+            def _send_stream(self, request, reply):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+                for start in range(0, len(reply), 16):
+                    chunk = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                             "model": request.get("model", "stub"),
+                             "choices": [{"index": 0, "delta": {"content": reply[start:start + 16]}, "finish_reason": None}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.write(b"data: [DONE]\n\n")
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-llm-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local OpenAI-compatible stub LLM server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds each completion takes")
+    parser.add_argument("--max-concurrent", type=int, default=None, help="Reply 429 above this many requests in flight")
+    parser.add_argument("--fail-first", type=int, default=0, help="Reply 429 to this many initial requests")
+    options = parser.parse_args()
+    server = StubLLMServer(port=options.port, latency=options.latency,
+                           max_concurrent=options.max_concurrent, fail_first=options.fail_first)
+    print(f"Stub LLM server listening on {server.url} (set OPENAI_BASE_URL to this)")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+import logging
+
+import pymupdf
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Lines closer than this (in points) count as the same ruling, as in PyMuPDF's own snapping
+SNAP_TOLERANCE = 3
+# Horizontal gap between words that separates two columns
+COLUMN_GAP = 12
+
+
+def detect_document_type(text):
+    """Classify a document from its first page text using Config.DOCUMENT_TYPE_KEYWORDS"""
+    lowered = text.lower()
+    for document_type, keywords in Config.DOCUMENT_TYPE_KEYWORDS.items():
+        if any(keyword in lowered for keyword in keywords):
+            return document_type
+    return "default"
+
+
+def resolve_table_strategy(document_type):
+    """The table strategy for a document type: its Config.TABLE_STRATEGIES entry layered over "default" """
+    strategy = dict(Config.TABLE_STRATEGIES["default"])
+    strategy.update(Config.TABLE_STRATEGIES.get(document_type, {}))
+    return strategy
+
+
+def count_rulings(page):
+    """Distinct horizontal and vertical ruling positions drawn on a page"""
+    horizontal = set()
+    vertical = set()
+    for path in page.get_cdrawings():
+        for item in path["items"]:
+            if item[0] == "l":
+                (x0, y0), (x1, y1) = item[1], item[2]
+                if abs(y0 - y1) <= 1:
+                    horizontal.add(round(y0 / SNAP_TOLERANCE))
+                elif abs(x0 - x1) <= 1:
+                    vertical.add(round(x0 / SNAP_TOLERANCE))
+            elif item[0] in ("re", "qu"):
+                rect = pymupdf.Rect(item[1]) if item[0] == "re" else pymupdf.Quad(item[1]).rect
+                # Thin rectangles are how many generators draw rules; others contribute all four sides
+                if rect.height <= SNAP_TOLERANCE:
+                    horizontal.add(round(rect.y0 / SNAP_TOLERANCE))
+                elif rect.width <= SNAP_TOLERANCE:
+                    vertical.add(round(rect.x0 / SNAP_TOLERANCE))
+                else:
+                    horizontal.update((round(rect.y0 / SNAP_TOLERANCE), round(rect.y1 / SNAP_TOLERANCE)))
+                    vertical.update((round(rect.x0 / SNAP_TOLERANCE), round(rect.x1 / SNAP_TOLERANCE)))
+    return len(horizontal), len(vertical)
+
+
+def count_aligned_rows(page, min_columns):
+    """Text rows split by wide gaps into at least min_columns cells"""
+    rows = {}
+    for word in page.get_text("words"):
+        rows.setdefault(round(word[3] / SNAP_TOLERANCE), []).append(word)
+    aligned = 0
+    for words in rows.values():
+        words.sort(key=lambda word: word[0])
+        cells = 1 + sum(1 for left, right in zip(words, words[1:]) if right[0] - left[2] > COLUMN_GAP)
+        if cells >= min_columns:
+            aligned += 1
+    return aligned
+
+
+def has_table_structure(page, strategy):
+    """Cheap check that page.find_tables could find anything with this strategy.
+
+    With the "lines" prefilter a page needs at least min_edges horizontal and vertical rulings,
+    which PyMuPDF's line-based detection cannot do without. With "text" it needs min_aligned_rows
+    rows of column-separated words. None always runs find_tables.
+    """
+    prefilter = strategy.get("prefilter")
+    if prefilter is None:
+        return True
+    if prefilter == "lines":
+        horizontal, vertical = count_rulings(page)
+        return horizontal >= strategy["min_edges"] and vertical >= strategy["min_edges"]
+    if prefilter == "text":
+        return count_aligned_rows(page, strategy["min_columns"]) >= strategy["min_aligned_rows"]
+    raise ValueError(f"Unknown table prefilter: {prefilter}")
@@ -0,0 +1,322 @@
+import csv
+import json
+import logging
+import os
+import re
+from collections.abc import Mapping
+from pathlib import Path
+
+# pandas and pyarrow are imported inside the functions that need them, so reading an index or
+# extracting a document without tables does not pay for them
+
+logger = logging.getLogger(__name__)
+
+TABLE_STORE_NAME = "tables.parquet"
+TABLE_INDEX_NAME = "tables_index.json"
+TABLE_STORE_VERSION = 1
+
+CSV_NAME = re.compile(r"page_(\d+)_table_(\d+)\.csv$")
+DATE_VALUE = re.compile(r"^\d{1,4}[-/. ](?:\d{1,2}|[a-z]{3,9})[-/. ]\d{2,4}(?:[ ,t]+\d{1,2}:\d{2}(?::\d{2})?)?$", re.I)
+AMOUNT_VALUE = re.compile(r"^\(?[-+]?\s*(?:rs\.?|inr|₹|\$|€|£)?\s*[-+]?\d[\d,]*(?:\.\d+)?\)?\s*(?:cr|dr)?\.?$", re.I)
+DECIMAL_AMOUNT = re.compile(r"\d\.\d{1,2}\b")
+
+# Header patterns for the columns a statement table is built from
+ROLE_PATTERNS = {
+    "date": re.compile(r"date", re.I),
+    "debit": re.compile(r"debit|withdrawal|\bdr\b|paid out", re.I),
+    "credit": re.compile(r"credit|deposit|\bcr\b|paid in", re.I),
+    "balance": re.compile(r"balance", re.I),
+    "amount": re.compile(r"amount|\bamt\b|value|\binr\b|\brs\b|price|fare|total", re.I),
+    "description": re.compile(r"description|narration|particular|detail|merchant|remark|transaction", re.I),
+}
+AMOUNT_ROLES = ("debit", "credit", "balance", "amount")
+
+
+def column_name(header, position):
+    """snake_case column name from a table header cell"""
+    name = re.sub(r"[^0-9a-z]+", "_", str(header).lower()).strip("_")[:64].rstrip("_")
+    return name or f"column_{position + 1}"
+
+
+def parse_amounts(values):
+    """Vectorized amount parsing: strips currency and separators, reads (x)/-x as negative and a Cr/Dr suffix as direction"""
+    import pandas as pd
+    text = values.fillna("").astype(str).str.strip()
+    suffix = text.str.extract(r"(cr|dr)\.?$", flags=re.I)[0].str.lower()
+    negative = text.str.startswith("(") | text.str.contains(r"^\(?\s*-|\s-\d", regex=True)
+    digits = text.str.replace(r"(?i)cr\.?$|dr\.?$", "", regex=True).str.replace(r"[^\d.]", "", regex=True)
+    amounts = pd.to_numeric(digits.where(digits != ""), errors="coerce")
+    amounts = amounts.where(~negative, -amounts)
+    direction = suffix.map({"cr": "credit", "dr": "debit"})
+    return amounts, direction
+
+
+def parse_dates(values):
+    import pandas as pd
+    text = values.fillna("").astype(str).str.strip()
+    return pd.to_datetime(text.where(text != ""), dayfirst=True, errors="coerce", format="mixed")
+
+
+def _looks_like_header(row):
+    cells = [cell.strip() for cell in row if cell and cell.strip()]
+    if len(cells) < max(1, len(row) // 2):
+        return False
+    return not any(DATE_VALUE.match(cell) or AMOUNT_VALUE.match(cell) for cell in cells)
+
+
+def _normalized_row(row):
+    return [re.sub(r"\s+", " ", cell).strip().lower() for cell in row]
+
+
+def read_csv_tables(tables_dir):
+    """Raw tables from the per-page CSVs as dicts of page, number, rows, in page order"""
+    tables = []
+    for csv_file in Path(tables_dir).glob("page_*_table_*.csv"):
+        match = CSV_NAME.search(csv_file.name)
+        if not match:
+            continue
+        with open(csv_file, "r", newline="", encoding="utf-8") as f:
+            rows = [row for row in csv.reader(f) if any(cell.strip() for cell in row)]
+        if rows:
+            tables.append({"page": int(match.group(1)), "number": int(match.group(2)),
+                           "rows": rows, "source": csv_file.name})
+    return sorted(tables, key=lambda table: (table["page"], table["number"]))
+
+
+def merge_continued_tables(tables):
+    """Join tables that continue on the next page: same column count and either a repeated header or no header"""
+    last_on_page = {}
+    for table in tables:
+        last_on_page[table["page"]] = table["number"]
+
+    merged = []
+    for table in tables:
+        previous = merged[-1] if merged else None
+        rows = table["rows"]
+        continues = (
+            previous is not None
+            and table["number"] == 1
+            and previous["last_page"] == table["page"] - 1
+            and previous["last_number"] == last_on_page[previous["last_page"]]
+            and len(rows[0]) == len(previous["header"])
+        )
+        if continues:
+            if _normalized_row(rows[0]) == _normalized_row(previous["header"]):
+                rows = rows[1:]
+            elif _looks_like_header(rows[0]):
+                continues = False
+        if continues:
+            previous["rows"].extend(rows)
+            previous["pages"].extend([table["page"]] * len(rows))
+            previous["last_page"] = table["page"]
+            previous["last_number"] = table["number"]
+            previous["sources"].append(table["source"])
+            continue
+        header, body = (rows[0], rows[1:]) if len(rows) > 1 else ([f"column_{i + 1}" for i in range(len(rows[0]))], rows)
+        merged.append({
+            "header": header,
+            "rows": list(body),
+            "pages": [table["page"]] * len(body),
+            "last_page": table["page"],
+            "last_number": table["number"],
+            "sources": [table["source"]],
+        })
+    return merged
+
+
+def _typed_frame(table):
+    """DataFrame for one merged table with dates and amounts parsed into real dtypes"""
+    import pandas as pd
+    names = []
+    for position, header in enumerate(table["header"]):
+        name = column_name(header, position)
+        while name in names or name in ("table_id", "page"):
+            name = f"{name}_{position + 1}"
+        names.append(name)
+    width = len(names)
+    rows = [(row + [""] * width)[:width] for row in table["rows"]]
+    df = pd.DataFrame(rows, columns=names, dtype="object")
+
+    roles = {}
+    for name, header in zip(names, table["header"]):
+        values = df[name].replace("", pd.NA).dropna().astype(str).str.strip()
+        if values.empty:
+            continue
+        if ROLE_PATTERNS["date"].search(str(header)) or values.str.match(DATE_VALUE).mean() >= 0.8:
+            parsed = parse_dates(df[name])
+            if parsed.notna().sum() >= 0.8 * len(values):
+                df[name] = parsed
+                roles.setdefault("date", name)
+                continue
+        amount_header = next((role for role in AMOUNT_ROLES if ROLE_PATTERNS[role].search(str(header))), None)
+        amount_like = values.str.match(AMOUNT_VALUE).mean() >= 0.8
+        if amount_like and (amount_header or values.str.contains(DECIMAL_AMOUNT).mean() >= 0.5):
+            amounts, direction = parse_amounts(df[name])
+            df[name] = amounts
+            if direction.notna().any():
+                df[f"{name}_direction"] = direction
+            roles.setdefault(amount_header or "amount", name)
+            continue
+        if ROLE_PATTERNS["description"].search(str(header)):
+            roles.setdefault("description", name)
+
+    if "description" not in roles:
+        text_columns = [name for name in names if df[name].dtype == object]
+        if text_columns:
+            roles["description"] = max(text_columns, key=lambda name: df[name].fillna("").astype(str).str.len().mean())
+    for name in df.columns:
+        if df[name].dtype == object:
+            df[name] = df[name].fillna("").astype(str)
+    return df, roles
+
+
+def _unify_dtypes(frames):
+    """Columns that are typed differently in different tables fall back to strings"""
+    kinds = {}
+    for df in frames:
+        for name in df.columns:
+            kinds.setdefault(name, set()).add(df[name].dtype.kind)
+    mixed = {name for name, seen in kinds.items() if len(seen) > 1}
+    for df in frames:
+        for name in mixed & set(df.columns):
+            df[name] = df[name].astype(str).where(df[name].notna(), "")
+    return mixed
+
+
+def build_table_store(output_dir):
+    """Merge the per-page CSVs into one typed Parquet file, one row group per table, plus a JSON index"""
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    tables_dir = Path(output_dir) / "tables"
+    merged = merge_continued_tables(read_csv_tables(tables_dir))
+    frames = []
+    entries = []
+    for table_id, table in enumerate(merged, start=1):
+        df, roles = _typed_frame(table)
+        columns = list(df.columns)
+        df.insert(0, "page", pd.Series(table["pages"], dtype="int32"))
+        df.insert(0, "table_id", pd.Series([table_id] * len(df), dtype="int32"))
+        frames.append(df)
+        first_page = table["pages"][0] if table["pages"] else table["last_page"]
+        last_page = table["last_page"]
+        entries.append({
+            "table_id": table_id,
+            "name": f"table_{table_id}_page_{first_page}" if first_page == last_page
+                    else f"table_{table_id}_pages_{first_page}-{last_page}",
+            "pages": [first_page, last_page],
+            "columns": columns,
+            "roles": roles,
+            "rows": len(df),
+            "sources": table["sources"],
+        })
+    _unify_dtypes(frames)
+
+    store_file = tables_dir / TABLE_STORE_NAME
+    if frames:
+        combined = pa.Table.from_pandas(pd.concat(frames, ignore_index=True, sort=False), preserve_index=False)
+        with pq.ParquetWriter(store_file, combined.schema) as writer:
+            offset = 0
+            for df in frames:
+                writer.write_table(combined.slice(offset, len(df)))
+                offset += len(df)
+    index_file = tables_dir / TABLE_INDEX_NAME
+    tmp_file = index_file.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump({"version": TABLE_STORE_VERSION, "store": TABLE_STORE_NAME if frames else None, "tables": entries}, f)
+    os.replace(tmp_file, index_file)
+    logger.info(f"Stored {len(entries)} tables ({sum(entry['rows'] for entry in entries)} rows) in {store_file}")
+    return entries
+
+
+class TableStore:
+    """Reader for the per-document Parquet table store; rows are only read when a table is requested"""
+
+    def __init__(self, tables_dir):
+        self.tables_dir = Path(tables_dir)
+        with open(self.tables_dir / TABLE_INDEX_NAME, "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        self.tables = {entry["name"]: entry for entry in self.index["tables"]}
+
+    @staticmethod
+    def exists(tables_dir):
+        return (Path(tables_dir) / TABLE_INDEX_NAME).exists()
+
+    @property
+    def store_file(self):
+        return self.tables_dir / self.index["store"] if self.index.get("store") else None
+
+    def read_table(self, name):
+        import pandas as pd
+        entry = self.tables[name]
+        df = pd.read_parquet(self.store_file, columns=entry["columns"], filters=[("table_id", "==", entry["table_id"])])
+        return df.reset_index(drop=True)
+
+    def read_transactions(self):
+        """All rows of tables that have a date and an amount, normalized to date/description/amount, in one read"""
+        import pandas as pd
+        statement_tables = [entry for entry in self.index["tables"]
+                            if "date" in entry["roles"] and any(role in entry["roles"] for role in ("debit", "credit", "amount"))]
+        empty = pd.DataFrame({"date": pd.Series(dtype="datetime64[ns]"), "description": pd.Series(dtype=str),
+                              "amount": pd.Series(dtype=float), "balance": pd.Series(dtype=float),
+                              "page": pd.Series(dtype="int32"), "table_id": pd.Series(dtype="int32")})
+        if not statement_tables or self.store_file is None:
+            return empty
+        wanted = {"table_id", "page"}
+        for entry in statement_tables:
+            wanted.update(entry["roles"].values())
+            wanted.update(f"{column}_direction" for column in entry["roles"].values()
+                          if f"{column}_direction" in entry["columns"])
+        ids = [entry["table_id"] for entry in statement_tables]
+        data = pd.read_parquet(self.store_file, columns=sorted(wanted), filters=[("table_id", "in", ids)])
+
+        parts = []
+        for entry in statement_tables:
+            rows = data[data["table_id"] == entry["table_id"]].copy()
+            roles = entry["roles"]
+            # A column name shared with another table of a different type is stored as strings (see _unify_dtypes)
+            for role, column in roles.items():
+                if role in AMOUNT_ROLES and rows[column].dtype == object:
+                    rows[column] = pd.to_numeric(rows[column].replace("", None), errors="coerce")
+                elif role == "date" and rows[column].dtype == object:
+                    rows[column] = pd.to_datetime(rows[column].replace("", None), errors="coerce", format="ISO8601")
+            if "debit" in roles or "credit" in roles:
+                debit = rows[roles["debit"]].abs().fillna(0) if "debit" in roles else 0
+                credit = rows[roles["credit"]].abs().fillna(0) if "credit" in roles else 0
+                amount = credit - debit
+            else:
+                amount = rows[roles["amount"]]
+                direction_column = f"{roles['amount']}_direction"
+                if direction_column in rows:
+                    direction = rows[direction_column]
+                    amount = amount.mask(direction == "debit", -amount.abs()).mask(direction == "credit", amount.abs())
+            parts.append(pd.DataFrame({
+                "date": rows[roles["date"]],
+                "description": rows[roles["description"]].astype(str) if "description" in roles else "",
+                "amount": amount.astype(float),
+                "balance": rows[roles["balance"]].astype(float) if "balance" in roles else float("nan"),
+                "page": rows["page"],
+                "table_id": rows["table_id"],
+            }))
+        transactions = pd.concat(parts, ignore_index=True)
+        return transactions.dropna(subset=["date", "amount"]).reset_index(drop=True)
+
+
+class LazyTableMapping(Mapping):
+    """Read-only mapping of table name to {'dataframe', 'summary'} that loads each table on first access"""
+
+    def __init__(self, store, load):
+        self._store = store
+        self._load = load
+
+    def __getitem__(self, name):
+        if name not in self._store.tables:
+            raise KeyError(name)
+        return self._load(name)
+
+    def __iter__(self):
+        return iter(self._store.tables)
+
+    def __len__(self):
+        return len(self._store.tables)
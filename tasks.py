@@ -1,13 +1,21 @@
-from crewai import Task
 from agent import DocumentAgents
+from document_digest import INSUFFICIENT_ANSWER
+
+
+def _task(**options):
+    # crewai is imported on first use, like the agents in agent.py, so extraction-only runs never load it
+    from crewai import Task
+    return Task(**options)
+
 
 class DocumentTasks:
-    def __init__(self, extraction_path):
+    def __init__(self, extraction_path=None, llm=None, agents=None):
         self.extraction_path = extraction_path
-        self.agents = DocumentAgents.create_all_agents()
+        # Pass existing agents to share them between task sets instead of building new ones
+        self.agents = agents if agents is not None else DocumentAgents.create_all_agents(llm)
 
     def create_contextualization_task(self, document_content):
-        return Task(
+        return _task(
             description=f"""
             Analyze the following document content to determine its type and purpose.
             Identify key entities and provide a brief, high-level summary. Do not extract all details yet, just identify the document.
@@ -21,7 +29,7 @@ class DocumentTasks:
         )
 
     def create_data_extraction_task(self, context_task):
-        return Task(
+        return _task(
             description="""
             Based on the initial document context, perform a detailed extraction of all relevant information.
             Organize the extracted data into a clear, structured format. For example, if it's a ticket, extract passenger details,
@@ -33,7 +41,7 @@ class DocumentTasks:
         )
 
     def create_reporting_task(self, extraction_task):
-        return Task(
+        return _task(
             description="""
             Synthesize the extracted data into a comprehensive and user-friendly report.
             The final report should be well-structured, easy to read, and summarize all the important findings from the document.
@@ -43,8 +51,63 @@ class DocumentTasks:
             context=[extraction_task]
         )
 
+    def create_chunk_extraction_task(self, chunk_content, pages):
+        return _task(
+            description=f"""
+            The following text is one part ({pages}) of a longer document that is being processed part by part.
+            Extract all relevant information that appears in this part, organized in a clear, structured format.
+            For example, account holders and statement periods, individual transactions or line items with their dates and amounts,
+            balances and totals. Note the page each item comes from, and do not guess at anything outside this part.
+
+            Document Part:
+            --------------
+            {chunk_content}
+            """,
+            agent=self.agents['analyst_agent'],
+            expected_output="A structured, itemized list of the key data points in this part of the document, with page numbers."
+        )
+
+    def create_merge_extraction_task(self, partial_results):
+        return _task(
+            description=f"""
+            A long document was read in parts, and the data in each part was extracted separately.
+            Merge the partial extractions below into one structured extraction for the whole document.
+            Combine details that repeat across parts (such as the account holder or statement period) into one entry,
+            keep every distinct transaction or line item exactly as extracted, and keep the page references.
+
+            Partial Extractions:
+            --------------------
+            {partial_results}
+            """,
+            agent=self.agents['analyst_agent'],
+            expected_output="A structured, itemized list of all key data points extracted from the document."
+        )
+
+    def create_fast_analysis_task(self, document_content):
+        return _task(
+            description=f"""
+            Analyze the following document in a single pass and write a complete report with these three sections:
+
+            ## Document Overview
+            The document type (e.g., 'Train Ticket', 'Invoice', 'Bank Statement'), its purpose, and its key entities.
+
+            ## Extracted Data
+            A structured, itemized list of all relevant information. For example, if it's a ticket, extract passenger details,
+            journey information, PNR, train number, dates, and times. If it's an invoice, extract vendor, client, line items, and totals.
+
+            ## Report
+            A comprehensive, user-friendly summary of all the important findings from the document.
+
+            Document Content:
+            -----------------
+            {document_content}
+            """,
+            agent=self.agents['reporting_agent'],
+            expected_output="A clean, final report with the sections Document Overview, Extracted Data and Report."
+        )
+
     def create_specific_question_task(self, question, document_content):
-        return Task(
+        return _task(
             description=f"""
             Answer the user's specific question based on the provided document content.
 
@@ -58,4 +121,58 @@ class DocumentTasks:
             """,
             agent=self.agents['reporting_agent'],
             expected_output="A direct, accurate answer to the user's question, citing information from the document."
-        )
\ No newline at end of file
+        )
+
+    def create_excerpt_question_task(self, question, excerpts):
+        return _task(
+            description=f"""
+            Answer the user's specific question based on the provided excerpts from the document.
+            Each excerpt is labelled with the page and lines it was taken from.
+
+            User Question: {question}
+            
+            Document Excerpts:
+            ------------------
+            {excerpts}
+
+            Provide a direct and accurate answer based only on the information in these excerpts,
+            and cite the page numbers you used. If the excerpts do not contain the answer, say so.
+            """,
+            agent=self.agents['reporting_agent'],
+            expected_output="A direct, accurate answer to the user's question, citing the pages it is based on."
+        )
+
+    def create_digest_question_task(self, question, digest):
+        return _task(
+            description=f"""
+            Answer the user's question from the digest of an earlier analysis of the document:
+            its context and the data extracted from it.
+
+            User Question: {question}
+            
+            Document Digest:
+            ----------------
+            {digest}
+
+            Provide a direct and accurate answer based only on the digest. If the digest does not contain
+            the information needed, reply with exactly "{INSUFFICIENT_ANSWER}" and nothing else.
+            """,
+            agent=self.agents['reporting_agent'],
+            expected_output=f"A direct, accurate answer to the user's question, or exactly \"{INSUFFICIENT_ANSWER}\"."
+        )
+
+    def create_phrasing_task(self, question, computed_result):
+        return _task(
+            description=f"""
+            The user's question has already been answered by an exact calculation over the statement's transactions.
+            Present that result as a clear, friendly answer. Do not recalculate, add or change any figures.
+
+            User Question: {question}
+            
+            Computed Result:
+            ----------------
+            {computed_result}
+            """,
+            agent=self.agents['reporting_agent'],
+            expected_output="A short answer to the user's question that presents the computed figures exactly as given."
+        )
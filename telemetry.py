@@ -0,0 +1,452 @@
+import atexit
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+
+from config import Config
+from token_utils import estimate_tokens
+
+try:
+    import fcntl
+except ImportError:
+    # Windows: appends from several processes are not serialized
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (seconds) of the span duration histogram buckets
+DURATION_BUCKETS = (0.005, 0.025, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Numeric span attributes that are also summed into finsight_<name>_total{span=...} counters
+COUNTED_ATTRIBUTES = ("pages", "bytes")
+
+# The span operations started in this context are children of
+_current_span = contextvars.ContextVar("finsight_span", default=None)
+# Token estimate accumulator of the crew kickoff running in this context
+_current_crew = contextvars.ContextVar("finsight_crew", default=None)
+
+
+class Span:
+    """One timed operation; spans sharing a trace_id make up one request"""
+
+    def __init__(self, name, trace_id, parent_id, attributes):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes = attributes
+        self.start = time.time()
+        self.duration = None
+        self.error = None
+        self._started = time.perf_counter()
+
+    def set(self, **attributes):
+        self.attributes.update(attributes)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start, 6),
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "status": "error" if self.error else "ok",
+            "error": self.error,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """Collects spans per trace, appends finished traces to a JSON lines file and keeps Prometheus counters.
+
+    Spans nest through contextvars, so a span opened inside another (including in
+    asyncio.to_thread or a context copied onto a worker thread) becomes its child.
+    Processes sharing the trace log (e.g. batch workers) append and rotate it under a file lock.
+    """
+
+    def __init__(self, log_path=None, metrics_path=None, enabled=None, max_traces=50):
+        self.enabled = Config.TRACING_ENABLED if enabled is None else enabled
+        self.log_path = log_path or Config.TRACE_LOG_PATH
+        self.metrics_path = metrics_path or Config.METRICS_PATH
+        self._lock = threading.Lock()
+        self._export_lock = threading.Lock()
+        self._metrics_written = 0.0
+        self._metrics_dirty = False
+        # trace id -> finished spans of traces whose root is still open
+        self._open = {}
+        self._traces = deque(maxlen=max_traces)
+        self._counters = {}
+        self._histograms = {}
+        self._server = None
+
+    def current(self):
+        """The innermost open span in this context, if any"""
+        return _current_span.get()
+
+    def start(self, name, **attributes):
+        """Open a span as a child of the current one; returns (span, token) for finish()"""
+        parent = _current_span.get()
+        if not self.enabled:
+            return Span(name, None, None, attributes), None
+        if parent is None:
+            span = Span(name, uuid.uuid4().hex, None, attributes)
+            with self._lock:
+                self._open[span.trace_id] = []
+        else:
+            span = Span(name, parent.trace_id, parent.span_id, attributes)
+        return span, _current_span.set(span)
+
+    def finish(self, span, token=None, error=None, duration=None):
+        span.duration = time.perf_counter() - span._started if duration is None else duration
+        if error is not None:
+            span.error = str(error) or type(error).__name__
+        if token is not None:
+            try:
+                _current_span.reset(token)
+            except ValueError:
+                # Finished from another context, e.g. a generator closed by the garbage collector
+                pass
+        if span.trace_id is not None:
+            self._record_span(span)
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """Time the body as a span; exceptions mark it failed and propagate"""
+        span, token = self.start(name, **attributes)
+        try:
+            yield span
+        except BaseException as e:
+            self.finish(span, token, error=e)
+            raise
+        self.finish(span, token)
+
+    def record(self, name, seconds, **attributes):
+        """Add an already measured child span, e.g. a stage timed across many pages"""
+        span, token = self.start(name, **attributes)
+        span.start -= seconds
+        self.finish(span, token, duration=seconds)
+
+    def count(self, metric, value=1, **labels):
+        """Increment the finsight_<metric>_total counter"""
+        key = (f"finsight_{metric}_total", tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+
+    def _record_span(self, span):
+        with self._lock:
+            histogram = self._histograms.setdefault(span.name, [0, 0.0, [0] * len(DURATION_BUCKETS)])
+            histogram[0] += 1
+            histogram[1] += span.duration
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if span.duration <= bound:
+                    histogram[2][index] += 1
+            for attribute in COUNTED_ATTRIBUTES:
+                value = span.attributes.get(attribute)
+                if isinstance(value, (int, float)):
+                    key = (f"finsight_{attribute}_total", (("span", span.name),))
+                    self._counters[key] = self._counters.get(key, 0) + value
+            if span.error:
+                key = ("finsight_span_errors_total", (("span", span.name),))
+                self._counters[key] = self._counters.get(key, 0) + 1
+            spans = self._open.get(span.trace_id)
+            finished = None
+            if spans is not None:
+                spans.append(span.to_dict())
+                if span.parent_id is None:
+                    finished = self._open.pop(span.trace_id)
+                    self._traces.append(finished)
+        if finished is not None:
+            self._export(finished)
+        elif spans is None:
+            # A span that outlived its trace (e.g. a crew still running after its stream was abandoned)
+            self._export([span.to_dict()])
+
+    def _export(self, spans):
+        if not self.log_path:
+            return
+        try:
+            self.log_path.parent.mkdir(parents=True, exist_ok=True)
+            payload = "".join(json.dumps(span, default=str) + "\n" for span in spans)
+            with self._export_lock, open(self.log_path.with_name(f".{self.log_path.name}.lock"), "a") as lock_file:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX)
+                self._rotate_log()
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(payload)
+        except OSError as e:
+            logger.warning(f"Could not export trace: {e}")
+        self._metrics_dirty = True
+        if self.metrics_path and time.monotonic() - self._metrics_written >= Config.METRICS_WRITE_INTERVAL_SECONDS:
+            self.flush_metrics()
+
+    def _rotate_log(self):
+        # Called with the trace log lock held
+        try:
+            if self.log_path.stat().st_size < Config.TRACE_LOG_MAX_BYTES:
+                return
+        except FileNotFoundError:
+            return
+        backups = Config.TRACE_LOG_BACKUPS
+        for index in range(backups - 1, 0, -1):
+            older = self.log_path.with_name(f"{self.log_path.name}.{index}")
+            if older.exists():
+                os.replace(older, self.log_path.with_name(f"{self.log_path.name}.{index + 1}"))
+        if backups > 0:
+            os.replace(self.log_path, self.log_path.with_name(f"{self.log_path.name}.1"))
+        else:
+            self.log_path.unlink()
+
+    def flush_metrics(self):
+        """Write the metrics file if spans finished since it was last written (also run at exit)"""
+        if not (self.metrics_path and self._metrics_dirty):
+            return
+        self._metrics_dirty = False
+        self._metrics_written = time.monotonic()
+        try:
+            self.write_prometheus()
+        except OSError as e:
+            logger.warning(f"Could not write metrics: {e}")
+
+    def latest_trace(self, trace_id=None):
+        """Spans of the most recently finished trace (or of trace_id), depth first with children in start order"""
+        with self._lock:
+            traces = list(self._traces)
+        for spans in reversed(traces):
+            if trace_id is None or spans[-1]["trace_id"] == trace_id:
+                children = {}
+                for span in sorted(spans, key=lambda span: span["start"]):
+                    children.setdefault(span["parent_id"], []).append(span)
+                ordered = []
+                pending = list(reversed(children.get(None, [])))
+                while pending:
+                    span = pending.pop()
+                    ordered.append(span)
+                    pending.extend(reversed(children.get(span["span_id"], [])))
+                return ordered
+        return []
+
+    def render_prometheus(self):
+        """All counters and span duration histograms in the Prometheus text exposition format"""
+        with self._lock:
+            counters = dict(self._counters)
+            histograms = {name: (count, total, list(buckets)) for name, (count, total, buckets) in self._histograms.items()}
+        lines = []
+        for metric in sorted({metric for metric, _ in counters}):
+            lines.append(f"# TYPE {metric} counter")
+            for (name, labels), value in sorted(counters.items()):
+                if name == metric:
+                    lines.append(f"{metric}{_labels(labels)} {_number(value)}")
+        if histograms:
+            metric = "finsight_span_duration_seconds"
+            lines.append(f"# TYPE {metric} histogram")
+            for name, (count, total, buckets) in sorted(histograms.items()):
+                for bound, value in zip(DURATION_BUCKETS, buckets):
+                    lines.append(f"{metric}_bucket{_labels((('span', name), ('le', str(bound))))} {value}")
+                lines.append(f"{metric}_bucket{_labels((('span', name), ('le', '+Inf')))} {count}")
+                lines.append(f"{metric}_sum{_labels((('span', name),))} {_number(total)}")
+                lines.append(f"{metric}_count{_labels((('span', name),))} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path=None):
+        """Write the metrics for a node_exporter textfile collector (or anything else that scrapes files)"""
+        path = path or self.metrics_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(self.render_prometheus(), encoding="utf-8")
+        tmp_path.replace(path)
+        return path
+
+    def serve_prometheus(self, port=None, host="127.0.0.1"):
+        """Serve the metrics over HTTP at /metrics from a daemon thread; returns the bound port"""
+        from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+        with self._lock:
+            if self._server is not None:
+                return self._server.server_address[1]
+            tracer = self
+
+            class Handler(BaseHTTPRequestHandler):
+                def log_message(self, format, *args):
+                    pass
+
+                def do_GET(self):
+                    if self.path.rstrip("/") != "/metrics":
+                        self.send_error(404)
+                        return
+                    payload = tracer.render_prometheus().encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/plain; version=0.0.4")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+
+            self._server = ThreadingHTTPServer((host, port if port is not None else Config.METRICS_PORT), Handler)
+            self._server.daemon_threads = True
+            threading.Thread(target=self._server.serve_forever, name="finsight-metrics", daemon=True).start()
+            logger.info(f"Serving metrics on http://{host}:{self._server.server_address[1]}/metrics")
+            return self._server.server_address[1]
+
+
+def _labels(labels):
+    if not labels:
+        return ""
+    escaped = (str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, value in labels)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(labels, escaped)) + "}"
+
+
+def _number(value):
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+def llm_cost(model, prompt_tokens, completion_tokens):
+    """USD cost of a call from Config.LLM_PRICING, or None for models without a price"""
+    price = Config.LLM_PRICING.get(str(model or "").split("/")[-1])
+    if price is None:
+        return None
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+def _message_text(messages):
+    if messages is None:
+        return ""
+    if isinstance(messages, str):
+        return messages
+    return "\n".join(str(message.get("content", "")) for message in messages)
+
+
+def _crew_model(crew):
+    for agent in crew.agents:
+        model = getattr(agent.llm, "model", None)
+        if model:
+            return str(model)
+    return None
+
+
+@contextmanager
+def trace_crew(kind, crew):
+    """Span around one crew kickoff, with its prompt/completion tokens and cost.
+
+    Tokens are the provider-reported usage of the crew's agents when there is any,
+    otherwise the estimates of its LLM call spans (e.g. custom LLMs without usage).
+    """
+    model = _crew_model(crew)
+    before = crew.calculate_usage_metrics()
+    estimate = {"prompt_tokens": 0, "completion_tokens": 0, "llm_calls": 0}
+    crew_token = _current_crew.set(estimate)
+    try:
+        with tracer.span(f"crew.{kind}", model=model, tasks=len(crew.tasks)) as span:
+            try:
+                yield span
+            finally:
+                after = crew.calculate_usage_metrics()
+                prompt_tokens = after.prompt_tokens - before.prompt_tokens
+                completion_tokens = after.completion_tokens - before.completion_tokens
+                source = "provider"
+                if not prompt_tokens and not completion_tokens:
+                    prompt_tokens, completion_tokens = estimate["prompt_tokens"], estimate["completion_tokens"]
+                    source = "estimate"
+                cost = llm_cost(model, prompt_tokens, completion_tokens)
+                span.set(prompt_tokens=prompt_tokens, completion_tokens=completion_tokens,
+                         tokens_source=source, llm_calls=estimate["llm_calls"], cost_usd=cost)
+                tracer.count("llm_prompt_tokens", prompt_tokens, model=model, source=source)
+                tracer.count("llm_completion_tokens", completion_tokens, model=model, source=source)
+                if cost is not None:
+                    tracer.count("llm_cost_usd", cost, model=model)
+    finally:
+        _current_crew.reset(crew_token)
+
+
+# CrewAI events of one task or LLM call start and finish on the same thread
+_event_spans = {}
+_event_lock = threading.Lock()
+_installed = False
+
+
+def _open_event_span(key, name, **attributes):
+    with _event_lock:
+        _event_spans.setdefault(key, []).append(tracer.start(name, **attributes))
+
+
+def _close_event_span(key, error=None, **attributes):
+    with _event_lock:
+        stack = _event_spans.get(key)
+        if not stack:
+            return None
+        span, token = stack.pop()
+        if not stack:
+            del _event_spans[key]
+    span.set(**attributes)
+    tracer.finish(span, token, error=error)
+    return span
+
+
+def _task_key(event):
+    return ("task", str(event.task.id) if event.task else None, threading.get_ident())
+
+
+def _on_task_started(source, event):
+    name = getattr(event.task, "name", None) or " ".join(str(getattr(event.task, "description", "")).split())[:60]
+    _open_event_span(_task_key(event), "task", task=name, agent=getattr(event.task.agent, "role", None) if event.task else None)
+
+
+def _on_task_completed(source, event):
+    _close_event_span(_task_key(event), output_chars=len(event.output.raw) if event.output else 0)
+
+
+def _on_task_failed(source, event):
+    _close_event_span(_task_key(event), error=event.error)
+
+
+def _on_llm_started(source, event):
+    prompt_tokens = estimate_tokens(_message_text(event.messages))
+    _open_event_span(("llm", threading.get_ident()), "llm.call", model=event.model, prompt_tokens=prompt_tokens)
+
+
+def _on_llm_completed(source, event):
+    span = _close_event_span(("llm", threading.get_ident()), completion_tokens=estimate_tokens(str(event.response or "")),
+                             tokens_source="estimate")
+    estimate = _current_crew.get()
+    if span is not None and estimate is not None:
+        estimate["prompt_tokens"] += span.attributes.get("prompt_tokens", 0)
+        estimate["completion_tokens"] += span.attributes["completion_tokens"]
+        estimate["llm_calls"] += 1
+    tracer.count("llm_calls", model=event.model, status="ok")
+
+
+def _on_llm_failed(source, event):
+    _close_event_span(("llm", threading.get_ident()), error=event.error)
+    tracer.count("llm_calls", status="error")
+
+
+def install_crew_handlers():
+    """Register the CrewAI event handlers that turn task and LLM call events into spans (once per process)"""
+    global _installed
+    from crewai.events import (
+        LLMCallCompletedEvent,
+        LLMCallFailedEvent,
+        LLMCallStartedEvent,
+        TaskCompletedEvent,
+        TaskFailedEvent,
+        TaskStartedEvent,
+        crewai_event_bus,
+    )
+    with _event_lock:
+        if _installed or not tracer.enabled:
+            return
+        crewai_event_bus.on(TaskStartedEvent)(_on_task_started)
+        crewai_event_bus.on(TaskCompletedEvent)(_on_task_completed)
+        crewai_event_bus.on(TaskFailedEvent)(_on_task_failed)
+        crewai_event_bus.on(LLMCallStartedEvent)(_on_llm_started)
+        crewai_event_bus.on(LLMCallCompletedEvent)(_on_llm_completed)
+        crewai_event_bus.on(LLMCallFailedEvent)(_on_llm_failed)
+        _installed = True
+
+
+# Shared by every FinSight instance, loader and extractor in the process
+tracer = Tracer()
+atexit.register(tracer.flush_metrics)
@@ -0,0 +1,66 @@
+import unittest
+
+import pandas as pd
+
+import analytics
+
+
+def statement():
+    dates = pd.to_datetime(["2025-01-05", "2025-02-05", "2025-03-05", "2025-03-10", "2025-03-20"])
+    return pd.DataFrame({
+        "date": dates,
+        "description": ["UPI/NETFLIX/123", "UPI/NETFLIX/456", "UPI/NETFLIX/789", "POS AMAZON 4411", "SALARY MARCH"],
+        "amount": [-649.0, -649.0, -649.0, -12500.0, 85000.0],
+        "balance": [None] * 5,
+        "page": [1, 1, 2, 2, 2],
+    })
+
+
+class DetectIntentTest(unittest.TestCase):
+    def test_questions_without_spend_words_go_to_the_llm(self):
+        for question in [
+            "What is the monthly interest rate?",
+            "What category of document is this?",
+            "Which merchant issued this card?",
+            "Is there a subscription fee?",
+            "What is the repeat delivery schedule?",
+            "When is the minimum amount due each month?",
+        ]:
+            with self.subTest(question=question):
+                self.assertIsNone(analytics.detect_intent(question))
+
+    def test_reasoning_questions_go_to_the_llm(self):
+        self.assertIsNone(analytics.detect_intent("Why are my monthly payments so high?"))
+        self.assertIsNone(analytics.detect_intent("Should I cancel any recurring payments?"))
+
+    def test_spend_questions_are_detected(self):
+        for question, intent in [
+            ("Show my recurring payments", "recurring"),
+            ("Which subscriptions am I paying charges for?", "recurring"),
+            ("Break down my spending by category", "category"),
+            ("Which merchants did I spend the most at?", "merchant"),
+            ("Where did I spend my money?", "merchant"),
+            ("What are my top 5 transactions?", "large"),
+            ("List transactions above 10,000", "large"),
+            ("How much did I spend each month?", "monthly"),
+            ("Show monthly spending", "monthly"),
+        ]:
+            with self.subTest(question=question):
+                self.assertEqual(analytics.detect_intent(question), intent)
+
+
+class AnswerQuestionTest(unittest.TestCase):
+    def test_answers_from_the_table(self):
+        result = analytics.answer_question("Show my recurring payments", statement())
+        self.assertEqual(result.intent, "recurring")
+        self.assertEqual(result.table["merchant"].tolist(), ["netflix"])
+
+    def test_empty_result_falls_back_to_the_llm(self):
+        self.assertIsNone(analytics.answer_question("List transactions above 1,00,000", statement()))
+
+    def test_negative_questions_are_not_answered_locally(self):
+        self.assertIsNone(analytics.answer_question("What is the monthly interest rate?", statement()))
+
+
+if __name__ == "__main__":
+    unittest.main()
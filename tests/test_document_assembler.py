@@ -0,0 +1,47 @@
+import unittest
+
+from document_assembler import assemble_document, chunk_document
+
+MERCHANTS = {1: "alpha", 2: "bravo", 3: "charlie"}
+PAGES = [
+    (page, f"ACME BANK LTD\nStatement page {page} of 3\n\n" + "\n".join(f"Purchase {index} at {merchant} store"
+                                                                         for index in range(4)) +
+     "\nCustomer care 1800 123 456")
+    for page, merchant in MERCHANTS.items()
+]
+
+
+class FakeLoader:
+    def iter_page_texts(self, layout="text"):
+        return iter(PAGES)
+
+    def text_bytes(self):
+        return sum(len(text.encode("utf-8")) for _, text in PAGES) * 2
+
+    def load_text_data(self):
+        raise AssertionError("assembly must not load the whole document")
+
+
+class AssembleDocumentTest(unittest.TestCase):
+    def test_repeated_letterhead_is_kept_on_the_first_page_only(self):
+        document = assemble_document(FakeLoader(), layout="sorted")
+        self.assertEqual(document.text.count("ACME BANK LTD"), 1)
+        self.assertEqual(document.repeated_lines_removed, 6)
+        self.assertIn("Purchase 3 at charlie store", document.text)
+
+    def test_savings_are_sized_without_reading_the_texts(self):
+        document = assemble_document(FakeLoader(), layout="sorted")
+        self.assertGreater(document.saved_tokens, 0)
+
+    def test_token_budget_omits_later_pages(self):
+        document = assemble_document(FakeLoader(), layout="sorted", token_budget=40)
+        self.assertTrue(document.truncated)
+        self.assertIn("further pages omitted", document.text)
+
+    def test_chunks_cover_every_page_once(self):
+        chunks = chunk_document(FakeLoader(), chunk_tokens=40, layout="sorted")
+        self.assertEqual([(chunk.first_page, chunk.last_page) for chunk in chunks], [(1, 1), (2, 2), (3, 3)])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,115 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import extraction_catalog
+from extraction_cache import EXTRACTION_STAGES, new_manifest, write_manifest
+from extraction_catalog import EVICTING_MARKER, STAGING_MARKER, ExtractionCatalog
+
+
+def make_extraction(root, name, size, complete=True):
+    extraction_dir = Path(root) / name
+    extraction_dir.mkdir()
+    manifest = new_manifest(name, f"hash-{name}", f"{name}.pdf", {}, 1)
+    if complete:
+        manifest["stages"] = {stage: True for stage in EXTRACTION_STAGES}
+        manifest["complete"] = True
+    write_manifest(extraction_dir, manifest)
+    (extraction_dir / "pages.bin").write_bytes(b"x" * size)
+    return extraction_dir
+
+
+class ExtractionCatalogTest(unittest.TestCase):
+    def setUp(self):
+        self.root = Path(tempfile.mkdtemp())
+        self.now = time.time()
+
+    def catalog(self, **limits):
+        limits = {"max_bytes": 10_000, "max_age_seconds": 3600, "min_idle_seconds": 60, **limits}
+        catalog = ExtractionCatalog(self.root, **limits)
+        self.addCleanup(catalog._conn.close)
+        return catalog
+
+    def record_at(self, catalog, extraction_dir, seconds_ago):
+        with mock.patch.object(extraction_catalog.time, "time", return_value=self.now - seconds_ago):
+            catalog.record(extraction_dir)
+
+    def evict(self, catalog, keep=()):
+        with mock.patch.object(extraction_catalog.time, "time", return_value=self.now):
+            return catalog.evict(keep)
+
+    def test_record_counts_size_and_lists_most_recent_first(self):
+        catalog = self.catalog()
+        self.record_at(catalog, make_extraction(self.root, "old", 1000), 300)
+        self.record_at(catalog, make_extraction(self.root, "new", 2000), 100)
+        count, total = catalog.totals()
+        self.assertEqual(count, 2)
+        self.assertGreater(total, 3000)
+        entries = catalog.entries()
+        self.assertEqual([entry["name"] for entry in entries], ["new", "old"])
+        self.assertEqual(entries[0]["source_name"], "new.pdf")
+        self.assertEqual(entries[0]["path"], self.root / "new")
+
+    def test_least_recently_used_are_evicted_until_under_the_limit(self):
+        catalog = self.catalog(max_bytes=5000)
+        for name, seconds_ago in (("a", 400), ("b", 300), ("c", 200), ("d", 100)):
+            self.record_at(catalog, make_extraction(self.root, name, 2000), seconds_ago)
+        removed = self.evict(catalog)
+        self.assertEqual([name for name, _ in removed], ["a", "b"])
+        self.assertFalse((self.root / "a").exists())
+        self.assertTrue((self.root / "c").exists())
+        self.assertEqual([entry["name"] for entry in catalog.entries()], ["d", "c"])
+        self.assertEqual(catalog.stats["evicted"], 2)
+
+    def test_recently_used_and_kept_extractions_are_not_evicted(self):
+        catalog = self.catalog(max_bytes=0)
+        self.record_at(catalog, make_extraction(self.root, "kept", 2000), 400)
+        self.record_at(catalog, make_extraction(self.root, "busy", 2000), 10)
+        self.record_at(catalog, make_extraction(self.root, "idle", 2000), 300)
+        removed = self.evict(catalog, keep=[self.root / "kept"])
+        self.assertEqual([name for name, _ in removed], ["idle"])
+        self.assertEqual(catalog.totals()[0], 2)
+
+    def test_idle_extractions_expire_by_age(self):
+        catalog = self.catalog(max_age_seconds=1000)
+        self.record_at(catalog, make_extraction(self.root, "stale", 100), 2000)
+        self.record_at(catalog, make_extraction(self.root, "fresh", 100), 500)
+        self.assertEqual([name for name, _ in self.evict(catalog)], ["stale"])
+
+    def test_max_age_of_zero_expires_every_idle_extraction(self):
+        catalog = self.catalog(max_age_seconds=0, min_idle_seconds=0)
+        self.record_at(catalog, make_extraction(self.root, "a", 100), 1)
+        self.assertEqual([name for name, _ in self.evict(catalog)], ["a"])
+
+    def test_sync_catalogs_complete_extractions_only(self):
+        catalog = self.catalog()
+        make_extraction(self.root, "done", 100)
+        make_extraction(self.root, "unfinished", 100, complete=False)
+        self.record_at(catalog, make_extraction(self.root, "deleted", 100), 10)
+        shutil.rmtree(self.root / "deleted")
+        catalog.sync()
+        self.assertEqual({entry["name"] for entry in catalog.entries()}, {"done"})
+
+    def test_old_staging_and_evicting_directories_are_removed(self):
+        catalog = self.catalog()
+        staging = self.root / f".abc{STAGING_MARKER}1234"
+        evicting = self.root / f".def{EVICTING_MARKER}5678"
+        hidden = self.root / ".cache"
+        for directory in (staging, evicting, hidden):
+            directory.mkdir()
+        self.assertEqual(catalog.remove_leftovers(3600), 0)
+        old = self.now - 7200
+        os.utime(staging, (old, old))
+        self.assertEqual(catalog.remove_leftovers(3600), 1)
+        self.assertFalse(staging.exists())
+        self.assertEqual(catalog.remove_leftovers(0), 1)
+        self.assertFalse(evicting.exists())
+        self.assertTrue(hidden.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
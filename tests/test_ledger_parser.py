@@ -0,0 +1,132 @@
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+import ledger_parser
+
+
+def words(line_cells, y):
+    """page.get_text("words") tuples for one line; each cell is (x0, text) and its words are 4 points apart"""
+    result = []
+    for x0, text in line_cells:
+        for word in text.split():
+            x1 = x0 + 6 * len(word)
+            result.append((x0, y, x1, y + 10, word, 0, 0, len(result)))
+            x0 = x1 + 4
+    return result
+
+
+HEADER = [(50, "Date"), (120, "Description"), (300, "Debit"), (380, "Credit"), (460, "Balance")]
+
+
+def statement_page(header=True):
+    page = words(HEADER, 100) if header else []
+    page += words([(50, "01/04/2024"), (120, "Coffee shop"), (300, "250.00"), (460, "9,750.00")], 120)
+    page += words([(120, "Chennai")], 132)
+    page += words([(50, "02/04/2024"), (120, "Salary"), (380, "5,000.00"), (460, "14,750.00")], 150)
+    page += words([(50, "Page 1 of 2")], 300)
+    return page
+
+
+class PageLinesTest(unittest.TestCase):
+    def test_words_group_into_lines_and_cells(self):
+        page = words([(50, "01/04/2024"), (130, "Coffee shop"), (300, "250.00")], 120)
+        # A word a little lower on the same line still belongs to it
+        page.append((380, 121, 416, 131, "9,750.00", 0, 0, 9))
+        page += words([(50, "Total")], 160)
+        lines = ledger_parser.page_lines(page)
+        self.assertEqual(len(lines), 2)
+        self.assertEqual([text for _, _, text in lines[0][2]], ["01/04/2024", "Coffee shop", "250.00", "9,750.00"])
+        self.assertEqual(lines[1][2][0][2], "Total")
+
+    def test_no_words_means_no_lines(self):
+        self.assertEqual(ledger_parser.page_lines([]), [])
+
+
+class ParsePageWordsTest(unittest.TestCase):
+    def test_dated_lines_with_amounts_become_rows(self):
+        page = ledger_parser.parse_page_words(statement_page())
+        self.assertEqual([row["date"] for row in page["rows"]], ["01/04/2024", "02/04/2024"])
+        # The wrapped line below the first row continues its description
+        self.assertEqual(page["rows"][0]["description"], "Coffee shop Chennai")
+        self.assertEqual([text for _, _, text in page["rows"][1]["amounts"]], ["5,000.00", "14,750.00"])
+        self.assertEqual([cell[2] for cell in page["header"]], [text for _, text in HEADER])
+
+    def test_pages_without_enough_ledger_lines_are_skipped(self):
+        page = words([(50, "01/04/2024"), (120, "Opening balance"), (460, "10,000.00")], 120)
+        page += words([(50, "Customer ID 2024"), (300, "Branch 0042")], 140)
+        self.assertIsNone(ledger_parser.parse_page_words(page))
+
+
+class AmountColumnsTest(unittest.TestCase):
+    def test_right_aligned_amounts_of_different_widths_share_a_column(self):
+        columns = ledger_parser.amount_columns([(312, 330), (300, 330), (400, 430), (388, 430)])
+        self.assertEqual(columns.tolist(), [[300, 330], [388, 430]])
+
+    def test_left_aligned_amounts_share_a_column(self):
+        columns = ledger_parser.amount_columns([(300, 318), (300, 330), (400, 442), (400, 420)])
+        self.assertEqual(columns.tolist(), [[300, 330], [400, 442]])
+
+    def test_no_amounts_means_no_columns(self):
+        self.assertEqual(len(ledger_parser.amount_columns([])), 0)
+
+
+class AssignRolesTest(unittest.TestCase):
+    def test_header_of_the_first_page_carries_over(self):
+        first = ledger_parser.parse_page_words(statement_page())
+        second = ledger_parser.parse_page_words(statement_page(header=False))
+        self.assertIsNone(second["header"])
+        rows = ledger_parser.assign_roles([(1, first), (2, second)])
+        self.assertEqual(len(rows), 4)
+        for row in (rows[0], rows[2]):
+            self.assertEqual((row["debit"], row["balance"]), ("250.00", "9,750.00"))
+            self.assertNotIn("credit", row)
+        self.assertEqual((rows[3]["page"], rows[3]["credit"]), (2, "5,000.00"))
+
+    def test_columns_without_a_header_get_default_roles(self):
+        page = ledger_parser.parse_page_words(statement_page(header=False))
+        rows = ledger_parser.assign_roles([(1, page)])
+        # Three amount columns read as debit, credit and balance
+        self.assertEqual(rows[0]["debit"], "250.00")
+        self.assertEqual(rows[1]["credit"], "5,000.00")
+
+
+class LedgerFrameTest(unittest.TestCase):
+    def test_debits_are_negative_and_credits_positive(self):
+        ledger = ledger_parser.ledger_frame([
+            {"page": 1, "date": "01/04/2024", "description": "Coffee", "debit": "250.00", "balance": "9,750.00"},
+            {"page": 1, "date": "02/04/2024", "description": "Salary", "credit": "5,000.00", "balance": "14,750.00"},
+            {"page": 1, "date": "not a date", "description": "Total", "debit": "250.00"},
+        ])
+        self.assertEqual(ledger["amount"].tolist(), [-250.0, 5000.0])
+        self.assertEqual(ledger["balance"].tolist(), [9750.0, 14750.0])
+        self.assertEqual(ledger["date"].dt.day.tolist(), [1, 2])
+
+    def test_single_amount_column_uses_the_direction_suffix(self):
+        ledger = ledger_parser.ledger_frame([
+            {"page": 1, "date": "01/04/2024", "description": "Coffee", "amount": "250.00 Dr"},
+            {"page": 1, "date": "02/04/2024", "description": "Refund", "amount": "80.00 Cr"},
+        ])
+        self.assertEqual(ledger["amount"].tolist(), [-250.0, 80.0])
+
+
+class BuildLedgerTest(unittest.TestCase):
+    def test_pages_merge_into_one_stored_ledger(self):
+        output_dir = Path(tempfile.mkdtemp())
+        ledger_dir = output_dir / ledger_parser.LEDGER_DIR_NAME
+        for page_number, header in ((2, False), (1, True)):
+            ledger_parser.write_page_ledger(ledger_dir, page_number, ledger_parser.parse_page_words(statement_page(header)))
+        self.assertEqual(ledger_parser.build_ledger(output_dir), 4)
+        ledger = ledger_parser.read_ledger(output_dir)
+        self.assertEqual(ledger["page"].tolist(), [1, 1, 2, 2])
+        self.assertEqual(ledger["amount"].tolist(), [-250.0, 5000.0, -250.0, 5000.0])
+
+    def test_extraction_without_ledger_pages(self):
+        output_dir = Path(tempfile.mkdtemp())
+        self.assertIsNone(ledger_parser.build_ledger(output_dir))
+        self.assertIsNone(ledger_parser.read_ledger(output_dir))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,78 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import pymupdf
+
+from benchmark import make_synthetic_statement
+from config import Config
+from data_loader import FinancialDataLoader
+from extraction_cache import ExtractionCache
+from pdf_extractor import PDFExtractor
+from text_store import read_image_refs, read_markers
+
+
+def make_pdf_with_image(path, pages=2):
+    """A PDF showing the same small image on every page"""
+    image = pymupdf.Pixmap(pymupdf.csRGB, pymupdf.IRect(0, 0, 8, 8), False)
+    image.set_rect(image.irect, (200, 30, 30))
+    doc = pymupdf.open()
+    for _ in range(pages):
+        page = doc.new_page()
+        page.insert_text((72, 72), "Logo page")
+        page.insert_image(pymupdf.Rect(72, 100, 144, 172), stream=image.tobytes("png"))
+    doc.save(path)
+    doc.close()
+
+
+class ExtractionTest(unittest.TestCase):
+    def setUp(self):
+        self.work_dir = Path(tempfile.mkdtemp())
+        self.extractor = PDFExtractor(ExtractionCache(self.work_dir / "extractions"))
+
+    def extract(self, pdf_path, name="out"):
+        return Path(self.extractor.extract_pdf_content(str(pdf_path), workers=1, use_cache=False,
+                                                       output_dir=self.work_dir / name))
+
+    def test_borderless_statement_is_parsed_into_transactions(self):
+        pdf_path = self.work_dir / "borderless.pdf"
+        make_synthetic_statement(pdf_path, 3, ruled=False)
+        transactions = FinancialDataLoader(self.extract(pdf_path)).load_transactions()
+
+        self.assertGreater(len(transactions), 0)
+        self.assertEqual(transactions["page"].min(), 1)
+        # Every amount moves the running balance by exactly that amount
+        changes = transactions["balance"].diff().iloc[1:].round(2)
+        self.assertTrue((changes == transactions["amount"].iloc[1:].round(2)).all())
+
+    def test_ledger_errors_are_markers_in_the_files_layout(self):
+        pdf_path = self.work_dir / "borderless.pdf"
+        make_synthetic_statement(pdf_path, 1, ruled=False)
+        with mock.patch.object(Config, "TEXT_STORE_FORMAT", "files"), \
+                mock.patch("pdf_extractor.parse_page_words", side_effect=ValueError("bad words")):
+            extraction_path = self.extract(pdf_path)
+
+        self.assertIn("bad words", read_markers(extraction_path, 1)["ledger_error"])
+        self.assertTrue((extraction_path / "text" / "page_1_text.txt").exists())
+
+
+    def test_materialized_images_are_written_back_to_the_index(self):
+        pdf_path = self.work_dir / "images.pdf"
+        make_pdf_with_image(pdf_path)
+        for text_format in ("packed", "files"):
+            with self.subTest(text_format=text_format), mock.patch.object(Config, "TEXT_STORE_FORMAT", text_format), \
+                    mock.patch.object(Config, "IMAGE_MODE", "lazy"):
+                extraction_path = self.extract(pdf_path, text_format)
+                self.assertEqual([ref["file"] for ref in read_image_refs(extraction_path)[1]], [None])
+
+                self.extractor.materialize_images(extraction_path, str(pdf_path))
+                files = {ref["file"] for refs in read_image_refs(extraction_path).values() for ref in refs}
+                self.assertEqual(len(files), 1)
+                self.assertTrue((extraction_path / files.pop()).exists())
+                with mock.patch.object(PDFExtractor, "_save_image", side_effect=AssertionError("extracted again")):
+                    self.extractor.materialize_images(extraction_path, str(pdf_path))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+import asyncio
+import unittest
+from unittest import mock
+
+import httpx
+import openai
+
+import rate_limiter
+from rate_limiter import RateLimiter, TokenBucket, is_rate_limit_error, retry_after
+from stub_llm_server import StubLLMServer
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def openai_error(status_code, headers=None):
+    request = httpx.Request("POST", "http://127.0.0.1/v1/chat/completions")
+    response = httpx.Response(status_code, headers=headers, request=request)
+    error_type = openai.RateLimitError if status_code == 429 else openai.InternalServerError
+    return error_type("Error code", response=response, body=None)
+
+
+class TokenBucketTest(unittest.TestCase):
+    def setUp(self):
+        self.clock = Clock()
+        patcher = mock.patch.object(rate_limiter.time, "monotonic", self.clock)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_reservations_go_into_debt_and_wait_it_off(self):
+        bucket = TokenBucket(60)
+        self.assertEqual(bucket.reserve(60), 0.0)
+        self.assertAlmostEqual(bucket.reserve(3), 3.0)
+        # Every later reservation queues behind the debt already taken on
+        self.assertAlmostEqual(bucket.reserve(1), 4.0)
+        self.clock.now += 4
+        self.assertEqual(bucket.reserve(0), 0.0)
+
+    def test_bucket_refills_up_to_capacity(self):
+        bucket = TokenBucket(60, capacity=10)
+        bucket.reserve(10)
+        self.clock.now += 3600
+        self.assertEqual(bucket.reserve(10), 0.0)
+        self.assertAlmostEqual(bucket.reserve(1), 1.0)
+
+    def test_reservation_larger_than_the_bucket_is_clamped(self):
+        bucket = TokenBucket(600)
+        self.assertEqual(bucket.reserve(10_000), 0.0)
+        self.assertAlmostEqual(bucket.reserve(10), 1.0)
+
+
+class IsRateLimitErrorTest(unittest.TestCase):
+    def test_rate_limit_errors_are_recognised(self):
+        self.assertTrue(is_rate_limit_error(openai_error(429)))
+        status_error = RuntimeError("Too many requests")
+        status_error.status_code = 429
+        self.assertTrue(is_rate_limit_error(status_error))
+
+    def test_wrapped_errors_are_followed_to_their_cause(self):
+        try:
+            try:
+                raise openai_error(429)
+            except Exception as e:
+                raise RuntimeError("Agent execution failed") from e
+        except RuntimeError as e:
+            wrapped = e
+        self.assertTrue(is_rate_limit_error(wrapped))
+
+    def test_digits_in_the_message_do_not_count(self):
+        self.assertFalse(is_rate_limit_error(ValueError("prompt has 4290 tokens")))
+        self.assertFalse(is_rate_limit_error(ValueError("HTTP 429 mentioned in a document")))
+        self.assertFalse(is_rate_limit_error(openai_error(500)))
+        self.assertFalse(is_rate_limit_error(None))
+
+    def test_retry_after_header_is_read(self):
+        self.assertEqual(retry_after(openai_error(429, {"Retry-After": "2.5"})), 2.5)
+        self.assertIsNone(retry_after(openai_error(429)))
+
+
+class RateLimiterTest(unittest.TestCase):
+    def limiter(self, max_retries=3):
+        return RateLimiter(requests_per_minute=6000, tokens_per_minute=1_000_000, max_concurrency=2,
+                           max_retries=max_retries, base_delay=0.01, max_delay=0.05)
+
+    def test_provider_429s_are_retried_after_retry_after(self):
+        limiter = self.limiter()
+        with StubLLMServer(fail_first=2, retry_after=0.05) as server:
+            client = openai.AsyncOpenAI(base_url=server.url, api_key="stub", max_retries=0)
+
+            async def call():
+                return await client.chat.completions.create(model="stub", messages=[{"role": "user", "content": "Hi"}])
+
+            response = asyncio.run(limiter.run(call, tokens=10))
+        self.assertIn("Final Answer", response.choices[0].message.content)
+        self.assertEqual(limiter.stats["retries"], 2)
+        self.assertEqual(limiter.stats["calls"], 3)
+        self.assertEqual((server.stats["rejected"], server.stats["completed"]), (2, 1))
+
+    def test_litellm_429s_are_retried(self):
+        # The path CrewAI agents take to the provider
+        import litellm
+        limiter = self.limiter()
+        with StubLLMServer(fail_first=2, retry_after=0.05) as server:
+            async def call():
+                return await litellm.acompletion(model="openai/stub", api_base=server.url, api_key="stub",
+                                                 messages=[{"role": "user", "content": "Hi"}], num_retries=0, max_retries=0)
+
+            response = asyncio.run(limiter.run(call))
+        self.assertIn("Final Answer", response.choices[0].message.content)
+        self.assertEqual(limiter.stats["retries"], 2)
+        self.assertEqual((server.stats["rejected"], server.stats["completed"]), (2, 1))
+
+    def test_retries_stop_at_max_retries(self):
+        limiter = self.limiter(max_retries=1)
+        with StubLLMServer(fail_first=5, retry_after=0.01) as server:
+            client = openai.AsyncOpenAI(base_url=server.url, api_key="stub", max_retries=0)
+
+            async def call():
+                return await client.chat.completions.create(model="stub", messages=[{"role": "user", "content": "Hi"}])
+
+            with self.assertRaises(openai.RateLimitError):
+                asyncio.run(limiter.run(call))
+        self.assertEqual(server.stats["requests"], 2)
+
+    def test_other_errors_are_not_retried(self):
+        limiter = self.limiter()
+        calls = []
+
+        async def call():
+            calls.append(1)
+            raise ValueError("prompt has 4290 tokens")
+
+        with self.assertRaises(ValueError):
+            asyncio.run(limiter.run(call))
+        self.assertEqual((len(calls), limiter.stats["retries"]), (1, 0))
+
+    def test_concurrency_is_capped(self):
+        limiter = self.limiter()
+        in_flight = []
+
+        async def call():
+            in_flight.append(limiter._in_flight)
+            await asyncio.sleep(0.01)
+
+        async def main():
+            await asyncio.gather(*(limiter.run(call) for _ in range(6)))
+
+        asyncio.run(main())
+        self.assertEqual(max(in_flight), 2)
+        self.assertEqual(limiter.stats["max_in_flight"], 2)
+        self.assertEqual(limiter._in_flight, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,54 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from extraction_cache import write_manifest
+from retrieval import INDEX_NAME, RetrievalIndex, tokenize
+
+PAGES = [
+    (1, "Statement of account\nOpening balance 10,000.00\nCustomer care 1800 123 456"),
+    (2, "Payment due date 15 Feb 2025\nTotal amount due 4,321.50\nMinimum amount due 216.00"),
+]
+
+
+class FakeLoader:
+    def iter_page_texts(self, layout="text"):
+        return iter(PAGES)
+
+
+class RetrievalIndexTest(unittest.TestCase):
+    def setUp(self):
+        self.extraction_path = Path(tempfile.mkdtemp())
+        write_manifest(self.extraction_path, {"cache_key": "first"})
+
+    def test_amounts_stay_one_token(self):
+        self.assertEqual(tokenize("Total due 4,321.50"), ["total", "due", "4,321.50"])
+
+    def test_search_ranks_the_matching_chunk_first(self):
+        index = RetrievalIndex.build(PAGES, chunk_lines=1)
+        _, best = index.search("when is the payment due date")[0]
+        self.assertEqual((best["page"], best["lines"]), (2, [1, 1]))
+
+    def test_retrieve_keeps_document_order_within_the_budget(self):
+        chunks = RetrievalIndex.build(PAGES, chunk_lines=1).retrieve("balance due", top_k=3, token_budget=1000)
+        self.assertEqual([(chunk["page"], chunk["lines"][0]) for chunk in chunks],
+                         sorted((chunk["page"], chunk["lines"][0]) for chunk in chunks))
+
+    def test_saved_index_is_parsed_once_per_extraction(self):
+        index = RetrievalIndex.load_or_build(self.extraction_path, FakeLoader())
+        self.assertTrue((self.extraction_path / INDEX_NAME).exists())
+        with mock.patch.object(RetrievalIndex, "load", wraps=RetrievalIndex.load) as load:
+            self.assertIs(RetrievalIndex.load_or_build(self.extraction_path, FakeLoader()), index)
+            self.assertEqual(load.call_count, 0)
+
+    def test_a_new_extraction_rebuilds_the_index(self):
+        first = RetrievalIndex.load_or_build(self.extraction_path, FakeLoader())
+        write_manifest(self.extraction_path, {"cache_key": "second"})
+        second = RetrievalIndex.load_or_build(self.extraction_path, FakeLoader())
+        self.assertIsNot(second, first)
+        self.assertEqual(second.source_key, "second")
+
+
+if __name__ == "__main__":
+    unittest.main()
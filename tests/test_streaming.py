@@ -0,0 +1,63 @@
+import os
+import unittest
+
+# CrewAI's first-run trace prompt would block on input; set before anything imports crewai
+for name, value in (("CREWAI_DISABLE_TELEMETRY", "true"), ("CREWAI_TRACING_ENABLED", "false"), ("OTEL_SDK_DISABLED", "true")):
+    os.environ.setdefault(name, value)
+
+from crewai import Agent, Crew, Process, Task
+
+import streaming
+from fake_llm import FakeLLM
+
+
+def make_crew(llm):
+    agent = Agent(role="Analyst", goal="Summarize statements", backstory="Reads bank statements.", llm=llm, verbose=False)
+    tasks = [
+        Task(description=f"{step} the statement {{document}}", expected_output="A short answer", agent=agent)
+        for step in ("Summarize", "Review")
+    ]
+    return Crew(agents=[agent], tasks=tasks, process=Process.sequential, verbose=False)
+
+
+class StreamCrewTest(unittest.TestCase):
+    def test_events_are_routed_to_their_task_in_order(self):
+        llm = FakeLLM(response=lambda prompt: "Reviewed" if "Review the statement" in prompt else "Summary", stream=True, chunk_size=4)
+        events = list(streaming.stream_crew(make_crew(llm), ["summary", "review"], {"document": "text"}))
+
+        milestones = [(event["type"], event.get("task")) for event in events if event["type"] != "token"]
+        self.assertEqual(milestones, [
+            ("task_started", "summary"), ("task_completed", "summary"),
+            ("task_started", "review"), ("task_completed", "review"),
+            ("result", None),
+        ])
+        started = [event for event in events if event["type"] == "task_started"]
+        self.assertEqual([(event["index"], event["total"]) for event in started], [(1, 2), (2, 2)])
+
+        for label, answer in (("summary", "Summary"), ("review", "Reviewed")):
+            tokens = "".join(event["text"] for event in events if event["type"] == "token" and event["task"] == label)
+            self.assertIn(f"Final Answer: {answer}", tokens)
+        completed = [event["output"] for event in events if event["type"] == "task_completed"]
+        self.assertEqual(completed, ["Summary", "Reviewed"])
+        self.assertEqual(events[-1]["text"], "Reviewed")
+        self.assertEqual(streaming._routes, {})
+
+    def test_failed_crew_ends_with_an_error(self):
+        def fail(prompt):
+            raise RuntimeError("provider unavailable")
+
+        events = list(streaming.stream_crew(make_crew(FakeLLM(response=fail)), ["summary", "review"], {"document": "text"}))
+        self.assertEqual(events[-1]["type"], "error")
+        self.assertIn("provider unavailable", events[-1]["error"])
+        self.assertEqual(streaming._routes, {})
+
+    def test_collect_text_returns_the_final_text(self):
+        seen = []
+        text = streaming.collect_text(iter([{"type": "token", "text": "Hi"}, {"type": "result", "text": "Done"}]), seen.append)
+        self.assertEqual(text, "Done")
+        self.assertEqual(len(seen), 2)
+        self.assertEqual(streaming.collect_text(iter([{"type": "error", "error": "boom"}])), "Error: boom")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,69 @@
+import csv
+import tempfile
+import unittest
+from pathlib import Path
+
+import pandas as pd
+
+from table_store import TableStore, build_table_store, merge_continued_tables
+
+
+def write_table(tables_dir, page, number, rows):
+    with open(tables_dir / f"page_{page}_table_{number}.csv", "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(rows)
+
+
+class TableStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = Path(tempfile.mkdtemp())
+        self.tables_dir = self.output_dir / "tables"
+        self.tables_dir.mkdir()
+
+    def test_mixed_dtype_columns_keep_numeric_transactions(self):
+        write_table(self.tables_dir, 1, 1, [["Date", "Description", "Debit", "Credit"],
+                                            ["05/01/2025", "UPI/SWIGGY", "450.00", ""],
+                                            ["07/01/2025", "SALARY", "", "85,000.00"]])
+        # A rewards summary whose "Debit" and "Amount" columns are not money
+        write_table(self.tables_dir, 2, 1, [["Category", "Debit", "Amount"],
+                                            ["Dining", "Auto", "5X points"], ["Travel", "Manual", "2X points"]])
+        write_table(self.tables_dir, 3, 1, [["Date", "Description", "Amount"],
+                                            ["09/01/2025", "UPI/UBER", "-120.50"], ["10/01/2025", "REFUND", ""]])
+        build_table_store(self.output_dir)
+
+        transactions = TableStore(self.tables_dir).read_transactions()
+        self.assertEqual(transactions["amount"].tolist(), [-450.0, 85000.0, -120.5])
+        self.assertEqual(transactions["date"].tolist(), [pd.Timestamp("2025-01-05"), pd.Timestamp("2025-01-07"),
+                                                         pd.Timestamp("2025-01-09")])
+
+    def test_tables_with_only_typed_columns_read_back(self):
+        write_table(self.tables_dir, 1, 1, [["Date", "Narration", "Debit", "Credit", "Balance"],
+                                            ["01/02/2025", "ATM", "1,000.00", "", "9,000.00"],
+                                            ["02/02/2025", "REFUND", "", "250.00", "9,250.00"]])
+        build_table_store(self.output_dir)
+
+        transactions = TableStore(self.tables_dir).read_transactions()
+        self.assertEqual(transactions["amount"].tolist(), [-1000.0, 250.0])
+        self.assertEqual(transactions["balance"].tolist(), [9000.0, 9250.0])
+
+
+class MergeContinuedTablesTest(unittest.TestCase):
+    def test_repeated_header_on_the_next_page_is_merged(self):
+        header = ["Date", "Description", "Amount"]
+        tables = [
+            {"page": 1, "number": 1, "rows": [header, ["01/01/2025", "A", "1.00"]], "source": "page_1_table_1.csv"},
+            {"page": 2, "number": 1, "rows": [header, ["02/01/2025", "B", "2.00"]], "source": "page_2_table_1.csv"},
+        ]
+        merged = merge_continued_tables(tables)
+        self.assertEqual(len(merged), 1)
+        self.assertEqual(merged[0]["pages"], [1, 2])
+
+    def test_a_different_header_starts_a_new_table(self):
+        tables = [
+            {"page": 1, "number": 1, "rows": [["Date", "Amount"], ["01/01/2025", "1.00"]], "source": "a.csv"},
+            {"page": 2, "number": 1, "rows": [["Category", "Points"], ["Dining", "10"]], "source": "b.csv"},
+        ]
+        self.assertEqual(len(merge_continued_tables(tables)), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+import tempfile
+import unittest
+from pathlib import Path
+
+from text_store import PackedTextReader, PageBuffer, open_text_store, read_image_refs, read_markers, write_image_refs
+
+
+def fill(store):
+    store.add_page(0, "First page ₹1,000", "First page sorted")
+    store.add_page(1, "", "")
+    store.add_marker(1, "no_tables", "No tables detected on this page.")
+    store.add_images(0, [{"xref": 7, "file": None}])
+    store.set_metadata({"title": "Statement"}, 2, False)
+    store.close()
+
+
+class PackedTextStoreTest(unittest.TestCase):
+    def setUp(self):
+        self.output_dir = Path(tempfile.mkdtemp())
+
+    def test_pages_read_back_by_layout(self):
+        fill(open_text_store(self.output_dir, "packed"))
+        with PackedTextReader(self.output_dir / "text") as reader:
+            self.assertEqual(reader.page_numbers, [1, 2])
+            self.assertEqual(reader.page_text(1), "First page ₹1,000")
+            self.assertEqual(reader.page_text(1, "sorted"), "First page sorted")
+            self.assertEqual(reader.read_page_text(1), "First page ₹1,000")
+            self.assertEqual(reader.page_text(2), "")
+            self.assertEqual(reader.markers(2), {"no_tables": "No tables detected on this page."})
+            self.assertIn("Total pages: 2", reader.metadata_text())
+            with self.assertRaises(ValueError):
+                reader.page_text(1, "raw")
+
+    def test_document_without_text_opens_without_a_memory_map(self):
+        store = open_text_store(self.output_dir, "packed")
+        store.add_page(0, "", "")
+        store.close()
+        with PackedTextReader(self.output_dir / "text") as reader:
+            self.assertEqual(reader.page_text(1), "")
+
+    def test_page_buffer_replays_into_a_store(self):
+        buffer = PageBuffer()
+        buffer.add_page(0, "First page ₹1,000", "First page sorted")
+        buffer.add_marker(0, "no_images", "No images found on this page.")
+        store = open_text_store(self.output_dir, "packed")
+        buffer.replay(store)
+        store.close()
+        with PackedTextReader(self.output_dir / "text") as reader:
+            self.assertEqual(reader.page_text(1), "First page ₹1,000")
+            self.assertEqual(reader.markers(1), {"no_images": "No images found on this page."})
+
+
+class ImageRefsTest(unittest.TestCase):
+    def test_refs_are_rewritten_in_both_layouts(self):
+        for text_format in ("packed", "files"):
+            with self.subTest(text_format=text_format):
+                output_dir = Path(tempfile.mkdtemp())
+                for directory in ("text", "tables", "images"):
+                    (output_dir / directory).mkdir(exist_ok=True)
+                fill(open_text_store(output_dir, text_format))
+                self.assertEqual(read_image_refs(output_dir), {1: [{"xref": 7, "file": None}]})
+                write_image_refs(output_dir, {1: [{"xref": 7, "file": "images/abc.png"}]})
+                self.assertEqual(read_image_refs(output_dir), {1: [{"xref": 7, "file": "images/abc.png"}]})
+
+    def test_legacy_markers_are_files(self):
+        output_dir = Path(tempfile.mkdtemp())
+        for directory in ("text", "tables", "images"):
+            (output_dir / directory).mkdir()
+        fill(open_text_store(output_dir, "files"))
+        self.assertEqual(read_markers(output_dir, 2), {"no_tables": "No tables detected on this page."})
+        self.assertEqual((output_dir / "text" / "page_1_text.txt").read_text(encoding="utf-8"), "First page ₹1,000")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,284 @@
+import json
+import logging
+import mmap
+import os
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+PACKED_DATA_NAME = "pages.bin"
+PACKED_INDEX_NAME = "index.json"
+PACKED_FORMAT_VERSION = 1
+
+TEXT_LAYOUTS = ("text", "sorted")
+
+# Per-page image references for the legacy layout; the packed layout keeps them in its index
+IMAGE_INDEX_NAME = "index.json"
+
+# Marker kinds and where the legacy layout writes them
+MARKER_FILES = {
+    "no_tables": ("tables", "page_{page}_no_tables.txt"),
+    "table_error": ("tables", "page_{page}_table_error.txt"),
+    "no_images": ("images", "page_{page}_no_images.txt"),
+    "image_error": ("images", "page_{page}_image_error.txt"),
+    "ledger_error": ("ledger", "page_{page}_ledger_error.txt"),
+}
+
+
+def format_metadata(metadata, page_count, is_encrypted):
+    """Render document metadata in the human-readable metadata.txt layout"""
+    lines = ["PDF Metadata:", "=" * 50]
+    lines.extend(f"{key}: {value}" for key, value in metadata.items())
+    lines.extend(["", "Document Properties:", "=" * 50])
+    lines.append(f"Total pages: {page_count}")
+    lines.append(f"PDF is encrypted: {is_encrypted}")
+    return "\n".join(lines) + "\n"
+
+
+class TextFileStore:
+    """Legacy layout: one .txt file per page and layout, plus marker files for empty pages"""
+
+    def __init__(self, output_dir):
+        self.output_dir = Path(output_dir)
+        self.text_dir = self.output_dir / "text"
+        self._images = {}
+
+    def add_page(self, page_num, text, text_sorted):
+        with open(self.text_dir / f"page_{page_num + 1}_text.txt", "w", encoding="utf-8") as f:
+            f.write(text)
+        with open(self.text_dir / f"page_{page_num + 1}_text_sorted.txt", "w", encoding="utf-8") as f:
+            f.write(text_sorted)
+
+    def add_marker(self, page_num, kind, message):
+        directory, pattern = MARKER_FILES[kind]
+        # The ledger directory only exists once a page had ledger lines
+        (self.output_dir / directory).mkdir(parents=True, exist_ok=True)
+        with open(self.output_dir / directory / pattern.format(page=page_num + 1), "w") as f:
+            f.write(message)
+
+    def add_images(self, page_num, refs):
+        self._images[page_num + 1] = refs
+
+    def set_metadata(self, metadata, page_count, is_encrypted):
+        with open(self.text_dir / "metadata.txt", "w", encoding="utf-8") as f:
+            f.write(format_metadata(metadata, page_count, is_encrypted))
+
+    def close(self):
+        if self._images:
+            images_dir = self.output_dir / "images"
+            images_dir.mkdir(parents=True, exist_ok=True)
+            with open(images_dir / IMAGE_INDEX_NAME, "w", encoding="utf-8") as f:
+                json.dump({"pages": {str(page): refs for page, refs in sorted(self._images.items())}}, f)
+
+
+class PackedTextWriter:
+    """Packed layout: every page text in one data file plus a JSON index of byte offsets"""
+
+    def __init__(self, output_dir):
+        self.text_dir = Path(output_dir) / "text"
+        self.text_dir.mkdir(parents=True, exist_ok=True)
+        self._data = open(self.text_dir / PACKED_DATA_NAME, "wb")
+        self._offset = 0
+        self._pages = {}
+        self._metadata = {}
+        self._document = {}
+
+    def _page_entry(self, page_num):
+        return self._pages.setdefault(page_num + 1, {"page": page_num + 1, "markers": {}})
+
+    def _append(self, text):
+        data = text.encode("utf-8")
+        self._data.write(data)
+        span = [self._offset, len(data)]
+        self._offset += len(data)
+        return span
+
+    def add_page(self, page_num, text, text_sorted):
+        entry = self._page_entry(page_num)
+        entry["text"] = self._append(text)
+        entry["sorted"] = self._append(text_sorted)
+
+    def add_marker(self, page_num, kind, message):
+        self._page_entry(page_num)["markers"][kind] = message
+
+    def add_images(self, page_num, refs):
+        self._page_entry(page_num)["images"] = refs
+
+    def set_metadata(self, metadata, page_count, is_encrypted):
+        self._metadata = dict(metadata)
+        self._document = {"page_count": page_count, "is_encrypted": is_encrypted}
+
+    def close(self):
+        """Flush the data file and atomically publish the index"""
+        self._data.close()
+        index = {
+            "format": PACKED_FORMAT_VERSION,
+            "data_file": PACKED_DATA_NAME,
+            "data_bytes": self._offset,
+            "pages": [self._pages[page] for page in sorted(self._pages)],
+            "metadata": self._metadata,
+            "document": self._document,
+        }
+        index_file = self.text_dir / PACKED_INDEX_NAME
+        tmp_file = index_file.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_file, "w", encoding="utf-8") as f:
+            json.dump(index, f)
+        os.replace(tmp_file, index_file)
+        logger.info(f"Packed {len(self._pages)} pages ({self._offset} bytes) into {self.text_dir}")
+
+
+class PageBuffer:
+    """Records store calls in memory so worker processes can hand pages back to the parent"""
+
+    def __init__(self):
+        self.records = []
+
+    def add_page(self, page_num, text, text_sorted):
+        self.records.append(("add_page", (page_num, text, text_sorted)))
+
+    def add_marker(self, page_num, kind, message):
+        self.records.append(("add_marker", (page_num, kind, message)))
+
+    def add_images(self, page_num, refs):
+        self.records.append(("add_images", (page_num, refs)))
+
+    def replay(self, store):
+        self.replay_records(self.records, store)
+
+    @staticmethod
+    def replay_records(records, store):
+        for method, args in records:
+            getattr(store, method)(*args)
+
+
+def open_text_store(output_dir, text_format):
+    """Create the writer for the configured text storage format"""
+    if text_format == "packed":
+        return PackedTextWriter(output_dir)
+    if text_format == "files":
+        return TextFileStore(output_dir)
+    raise ValueError(f"Unknown text storage format: {text_format}")
+
+
+class PackedTextReader:
+    """Memory-mapped reader that slices single pages out of a packed text store"""
+
+    def __init__(self, text_dir):
+        self.text_dir = Path(text_dir)
+        with open(self.text_dir / PACKED_INDEX_NAME, "r", encoding="utf-8") as f:
+            self.index = json.load(f)
+        self._pages = {entry["page"]: entry for entry in self.index["pages"]}
+        self._file = open(self.text_dir / self.index.get("data_file", PACKED_DATA_NAME), "rb")
+        # mmap refuses zero-length files, which is what a document without any text produces
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if self.index["data_bytes"] else None
+
+    @staticmethod
+    def exists(text_dir):
+        return (Path(text_dir) / PACKED_INDEX_NAME).exists()
+
+    @property
+    def page_numbers(self):
+        return sorted(self._pages)
+
+    def page_text(self, page_number, layout="text"):
+        """Return one page's text without reading the rest of the store"""
+        if layout not in TEXT_LAYOUTS:
+            raise ValueError(f"Unknown text layout: {layout}")
+        span = self._pages.get(page_number, {}).get(layout)
+        if not span or self._map is None:
+            return ""
+        offset, length = span
+        return self._map[offset:offset + length].decode("utf-8")
+
+    def iter_pages(self, layout="text"):
+        for page_number in self.page_numbers:
+            yield page_number, self.page_text(page_number, layout)
+
+    def read_page_text(self, page_number, layout="text"):
+        """Like page_text, but read from the file instead of the memory map, so streaming through a long
+        document does not leave every page it passed resident in this process"""
+        if layout not in TEXT_LAYOUTS:
+            raise ValueError(f"Unknown text layout: {layout}")
+        span = self._pages.get(page_number, {}).get(layout)
+        if not span:
+            return ""
+        offset, length = span
+        if hasattr(os, "pread"):
+            return os.pread(self._file.fileno(), length, offset).decode("utf-8")
+        self._file.seek(offset)
+        return self._file.read(length).decode("utf-8")
+
+    def markers(self, page_number):
+        return dict(self._pages.get(page_number, {}).get("markers", {}))
+
+    def images(self, page_number):
+        """Image references on a page: xref, size and the deduplicated file (None until extracted)"""
+        return [dict(ref) for ref in self._pages.get(page_number, {}).get("images", [])]
+
+    @property
+    def metadata(self):
+        return dict(self.index.get("metadata", {}))
+
+    def metadata_text(self):
+        document = self.index.get("document", {})
+        return format_metadata(self.metadata, document.get("page_count", len(self._pages)), document.get("is_encrypted"))
+
+    def close(self):
+        if self._map is not None:
+            self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def read_markers(output_dir, page_number):
+    """Markers of one page in the legacy layout, as {kind: message}"""
+    markers = {}
+    for kind, (directory, pattern) in MARKER_FILES.items():
+        marker_file = Path(output_dir) / directory / pattern.format(page=page_number)
+        if marker_file.exists():
+            markers[kind] = marker_file.read_text()
+    return markers
+
+
+def read_image_refs(output_dir):
+    """Per-page image references of an extraction in either layout, as {page number: [refs]}"""
+    output_dir = Path(output_dir)
+    text_dir = output_dir / "text"
+    if PackedTextReader.exists(text_dir):
+        with PackedTextReader(text_dir) as reader:
+            return {page: reader.images(page) for page in reader.page_numbers if reader.images(page)}
+    index_file = output_dir / "images" / IMAGE_INDEX_NAME
+    if not index_file.exists():
+        return {}
+    with open(index_file, "r", encoding="utf-8") as f:
+        return {int(page): refs for page, refs in json.load(f)["pages"].items()}
+
+
+def write_image_refs(output_dir, refs_by_page):
+    """Atomically replace the image references of the given pages in an extraction of either layout,
+    e.g. once lazily indexed images have been extracted"""
+    output_dir = Path(output_dir)
+    text_dir = output_dir / "text"
+    if PackedTextReader.exists(text_dir):
+        index_file = text_dir / PACKED_INDEX_NAME
+        with open(index_file, "r", encoding="utf-8") as f:
+            index = json.load(f)
+        for entry in index["pages"]:
+            if entry["page"] in refs_by_page:
+                entry["images"] = refs_by_page[entry["page"]]
+    else:
+        index_file = output_dir / "images" / IMAGE_INDEX_NAME
+        index = {"pages": {}}
+        if index_file.exists():
+            with open(index_file, "r", encoding="utf-8") as f:
+                index = json.load(f)
+        index["pages"].update({str(page): refs for page, refs in refs_by_page.items()})
+    tmp_file = index_file.with_suffix(f".{os.getpid()}.tmp")
+    with open(tmp_file, "w", encoding="utf-8") as f:
+        json.dump(index, f)
+    os.replace(tmp_file, index_file)
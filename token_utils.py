@@ -0,0 +1,12 @@
+import math
+
+# Rough characters-per-token ratio for English prose and statement tables with OpenAI tokenizers.
+# A real tokenizer would need its vocabulary downloaded, and budgets only need to be approximate.
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    """Estimate the number of LLM tokens in a piece of text without a tokenizer"""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)